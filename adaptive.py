@@ -0,0 +1,208 @@
+# adaptive.py
+#
+# Frecuencia de consulta adaptativa por DNI: cada cuenta se consulta según
+# la actividad observada (novedades nuevas por hora), dentro de un mínimo y
+# un máximo, y el reloj corre más lento fuera del horario judicial para
+# concentrar las consultas en las horas en que aparecen novedades.
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, time, timedelta, timezone
+
+from normalize import sanitize_text
+
+logger = logging.getLogger(__name__)
+
+# Argentina no usa horario de verano: UTC-3 fijo, sin depender de tzdata
+ARGENTINA_TZ = timezone(timedelta(hours=-3), "ART")
+
+
+def parse_hours_range(value):
+    """Convierte ``"07:30-13:30"`` en ``(time(7, 30), time(13, 30))``."""
+    try:
+        start, end = (datetime.strptime(part.strip(), "%H:%M").time() for part in value.split("-"))
+    except ValueError:
+        raise ValueError(f"Horario inválido {value!r}; se espera HH:MM-HH:MM") from None
+    if start >= end:
+        raise ValueError(f"Horario inválido {value!r}: el inicio debe ser anterior al fin")
+    return start, end
+
+
+class BusinessHours:
+    """Horario judicial: las horas hábiles pesan 1 y el resto ``off_weight``."""
+
+    def __init__(self, start=time(7, 30), end=time(13, 30), weekdays=(0, 1, 2, 3, 4), off_weight=0.25, tz=ARGENTINA_TZ):
+        if not 0 < off_weight <= 1:
+            raise ValueError("off_weight debe estar entre 0 (exclusivo) y 1")
+        self.start = start
+        self.end = end
+        self.weekdays = frozenset(weekdays)
+        self.off_weight = off_weight
+        self.tz = tz
+
+    def _segment(self, moment):
+        """Peso vigente en ``moment`` y hasta cuándo dura (siguiente borde)."""
+        day = moment.date()
+        start = datetime.combine(day, self.start, self.tz)
+        end = datetime.combine(day, self.end, self.tz)
+        midnight = datetime.combine(day + timedelta(days=1), time(0), self.tz)
+        if day.weekday() not in self.weekdays:
+            return self.off_weight, midnight
+        if moment < start:
+            return self.off_weight, start
+        if moment < end:
+            return 1.0, end
+        return self.off_weight, midnight
+
+    def weighted_hours(self, since, until):
+        """Horas ponderadas entre dos instantes."""
+        since, until = since.astimezone(self.tz), until.astimezone(self.tz)
+        total = 0.0
+        while since < until:
+            weight, boundary = self._segment(since)
+            boundary = min(boundary, until)
+            total += (boundary - since).total_seconds() / 3600 * weight
+            since = boundary
+        return total
+
+    def advance(self, since, weighted, limit):
+        """Instante en que se acumulan ``weighted`` horas ponderadas desde ``since`` (a lo sumo ``limit``)."""
+        current = since.astimezone(self.tz)
+        stop = current + limit
+        remaining = weighted
+        while current < stop:
+            weight, boundary = self._segment(current)
+            available = (boundary - current).total_seconds() / 3600 * weight
+            if available >= remaining:
+                return min(current + timedelta(hours=remaining / weight), stop)
+            remaining -= available
+            current = boundary
+        return stop
+
+
+class ActivityTracker:
+    """Estima novedades nuevas por hora hábil de cada DNI y elige su próximo intervalo.
+
+    La tasa es un promedio móvil exponencial (``alpha``) de las filas nuevas
+    observadas en cada consulta. El intervalo apunta a encontrar ``target_rows``
+    filas nuevas por consulta, acotado a ``[min_interval, max_interval]``
+    segundos. El estado se guarda en ``path`` (JSON) para sobrevivir reinicios.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        business_hours=None,
+        min_interval=300,
+        max_interval=4 * 3600,
+        default_interval=900,
+        target_rows=1.0,
+        alpha=0.3,
+    ):
+        if min_interval > max_interval:
+            raise ValueError("min_interval no puede superar a max_interval")
+        self.path = path
+        self.hours = business_hours or BusinessHours()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = min(max(default_interval, min_interval), max_interval)
+        self.target_rows = target_rows
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._state = {}  # dni -> {"rate", "last_poll", "polls", "new_rows"}
+        self._seen = {}  # dni -> doc_ids vistos (solo si no hay índice de cambios)
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("No se pudo leer el estado de actividad %s: %s", path, e)
+
+    def _now(self):
+        return datetime.now(self.hours.tz)
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def warm_from_firestore(self, db, names_to_dni, days=30, collection="novedades"):
+        """Tasa inicial de los DNIs sin historial a partir de las ``Fecha`` de los últimos ``days`` días."""
+        # El Perito se guarda escapado (build_rows): se compara con el nombre escapado igual
+        missing = {sanitize_text(name): dni for name, dni in names_to_dni.items() if dni not in self._state}
+        if not missing:
+            return 0
+        now = self._now()
+        since = now - timedelta(days=days)
+        counts = dict.fromkeys(missing.values(), 0)
+        query = db.collection(collection).where("Fecha", ">=", since.replace(tzinfo=None))
+        for snapshot in query.select(["Perito"]).stream():
+            dni = missing.get(snapshot.get("Perito"))
+            if dni is not None:
+                counts[dni] += 1
+        hours = self.hours.weighted_hours(since, now)
+        with self._lock:
+            for dni, count in counts.items():
+                self._state[dni] = {"rate": count / hours, "last_poll": None, "polls": 0, "new_rows": 0}
+            self._save_locked()
+        logger.info("Actividad inicial estimada para %d DNIs con las novedades de %d días.", len(counts), days)
+        return len(counts)
+
+    def observe(self, dni, doc_ids, is_known=None):
+        """Registra una consulta del DNI; ``is_known(doc_id)`` dice si una fila ya estaba guardada.
+
+        Sin ``is_known`` se recuerdan los doc_ids vistos en este proceso y la
+        primera consulta de cada DNI solo sirve de referencia.
+        """
+        now = self._now()
+        with self._lock:
+            if is_known is not None:
+                new_rows = sum(1 for doc_id in doc_ids if not is_known(doc_id))
+            else:
+                seen = self._seen.get(dni)
+                self._seen[dni] = set(doc_ids) | (seen or set())
+                new_rows = None if seen is None else len(set(doc_ids) - seen)
+
+            state = self._state.setdefault(dni, {"rate": None, "last_poll": None, "polls": 0, "new_rows": 0})
+            last_poll = datetime.fromisoformat(state["last_poll"]) if state["last_poll"] else None
+            state["last_poll"] = now.isoformat()
+            state["polls"] += 1
+            if new_rows is None or last_poll is None:
+                self._save_locked()
+                return new_rows
+
+            state["new_rows"] += new_rows
+            elapsed = self.hours.weighted_hours(last_poll, now)
+            if elapsed > 0:
+                observed = new_rows / elapsed
+                rate = state["rate"]
+                if rate is None:
+                    # Sin historial se parte de la tasa que corresponde al intervalo por defecto
+                    rate = self.target_rows / (self.default_interval / 3600)
+                state["rate"] = self.alpha * observed + (1 - self.alpha) * rate
+            self._save_locked()
+            return new_rows
+
+    def next_interval(self, dni):
+        """Segundos hasta la próxima consulta del DNI."""
+        with self._lock:
+            rate = (self._state.get(dni) or {}).get("rate")
+        if rate is None:
+            return self.default_interval
+        now = self._now()
+        limit = timedelta(seconds=self.max_interval)
+        if rate <= 0:
+            target = now + limit
+        else:
+            target = self.hours.advance(now, self.target_rows / rate, limit)
+        seconds = (target - now).total_seconds()
+        return min(max(seconds, self.min_interval), self.max_interval)
+
+    def snapshot(self):
+        with self._lock:
+            return {dni: dict(state) for dni, state in self._state.items()}
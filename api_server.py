@@ -0,0 +1,233 @@
+# api_server.py
+#
+# API HTTP del dashboard (frontend/): GET /data devuelve las novedades
+# paginadas y filtradas desde Firestore, con caché y ETag (ver read_api.py);
+# POST /scrape encola un scraping y su progreso se sigue por SSE en
+# GET /scrape/<id>/events (ver jobs.py). GET /metrics expone las métricas
+# por etapa en formato Prometheus (ver metrics.py).
+#
+#   python api_server.py --port 8000 --engine browser --interval 15
+
+import argparse
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+import scraping_backend as backend
+from jobs import ScrapeJobManager
+from read_api import NovedadesReader, PageQuery, QueryError, etag_matches
+
+logger = logging.getLogger(__name__)
+
+# Origen permitido para CORS (el frontend puede estar en GitHub Pages)
+CORS_ORIGIN = os.getenv("API_CORS_ORIGIN", "*")
+# Cada cuánto se manda un comentario SSE para mantener viva la conexión
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def make_handler(reader, jobs):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            logger.debug("%s - %s", self.address_string(), fmt % args)
+
+        def _cors_headers(self):
+            self.send_header("Access-Control-Allow-Origin", CORS_ORIGIN)
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match")
+            self.send_header("Access-Control-Expose-Headers", "ETag")
+
+        def _send(self, status, body=b"", content_type="application/json; charset=utf-8", headers=None):
+            self.send_response(status)
+            self._cors_headers()
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if status != 304:
+                self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _send_json(self, status, payload):
+            self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+        def do_OPTIONS(self):
+            self._send(204)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/data":
+                return self._get_data(url)
+            if url.path == "/metrics":
+                return self._send(200, metrics.render().encode("utf-8"), metrics.CONTENT_TYPE)
+            parts = url.path.strip("/").split("/")
+            if len(parts) in (2, 3) and parts[0] == "scrape":
+                job = jobs.get(parts[1])
+                if job is None:
+                    return self._send_json(404, {"error": "Trabajo de scraping no encontrado."})
+                if len(parts) == 2:
+                    return self._send_json(200, job.to_dict())
+                if parts[2] == "events":
+                    return self._stream_events(job)
+            self._send_json(404, {"error": "Ruta no encontrada."})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/scrape":
+                return self._send_json(404, {"error": "Ruta no encontrada."})
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                try:
+                    params.update(json.loads(self.rfile.read(length) or b"{}"))
+                except (ValueError, TypeError):
+                    return self._send_json(400, {"error": "El cuerpo debe ser JSON."})
+            dni = str(params["dni"]).strip() if params.get("dni") else None
+            try:
+                job, merged = jobs.submit(dni)
+            except KeyError:
+                return self._send_json(404, {"error": f"No se encontró el DNI {dni} en la lista de usuarios."})
+            payload = {"job_id": job.id, "merged": merged, "status": job.status, "scope": job.scope}
+            self._send(
+                202,
+                json.dumps(payload).encode("utf-8"),
+                headers={"Location": f"/scrape/{job.id}"},
+            )
+
+        def _stream_events(self, job):
+            """Transmite los eventos del trabajo como Server-Sent Events hasta que termine."""
+            self.send_response(200)
+            self._cors_headers()
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            # EventSource reenvía Last-Event-ID al reconectarse
+            try:
+                last_seq = int(self.headers.get("Last-Event-ID") or 0)
+            except ValueError:
+                last_seq = 0
+            try:
+                while True:
+                    events = job.wait_events(last_seq, SSE_KEEPALIVE_SECONDS)
+                    if not events:
+                        self.wfile.write(b": keepalive\n\n")
+                    for seq, kind, data in events:
+                        message = f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                        self.wfile.write(message.encode("utf-8"))
+                        last_seq = seq
+                        if kind == "finished":
+                            self.wfile.flush()
+                            return
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                logger.debug("Cliente SSE desconectado del trabajo %s.", job.id)
+
+        def _get_data(self, url):
+            if reader.db is None:
+                reader.db = backend.get_db()  # Firestore se inicializa con el primer pedido de datos
+            if not reader.db:
+                return self._send_json(503, {"error": "Cliente Firestore no disponible."})
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                query = PageQuery.from_params(params, reader.max_limit)
+                etag, body = reader.get_page(query)
+            except QueryError as e:
+                return self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                logger.error("Error consultando novedades: %s", e)
+                return self._send_json(500, {"error": "Error consultando novedades."})
+
+            # El navegador revalida con If-None-Match y recibe 304 sin cuerpo
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if etag_matches(self.headers.get("If-None-Match"), etag):
+                return self._send(304, headers=headers)
+            self._send(200, body, headers=headers)
+
+    return Handler
+
+
+def create_server(host="127.0.0.1", port=8000, cache_ttl=60.0, engine="browser", max_workers=None, per_minute=None):
+    """Crea el servidor y registra la invalidación de la caché tras cada escritura."""
+    reader = NovedadesReader(None, ttl=cache_ttl)
+    backend.add_write_listener(reader.invalidate)
+
+    def run_scrape(dnis, on_progress):
+        return backend.run_all_scraping_concurrently(
+            engine, max_workers, per_minute, dnis=dnis, on_progress=on_progress
+        )
+
+    jobs = ScrapeJobManager(run_scrape, lambda: list(backend.usuarios_contrasenas))
+    server = ThreadingHTTPServer((host, port), make_handler(reader, jobs))
+    server.daemon_threads = True
+    return server, reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP del dashboard de novedades")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=60.0,
+        help="Segundos que una página de /data se sirve desde la caché.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=backend.positive_int,
+        help="Si se indica, también corre el scraping periódico (en minutos) en este proceso; "
+        "los pedidos de /scrape nunca duplican un DNI que ya se está scrapeando.",
+    )
+    backend.add_runtime_arguments(parser)
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
+
+    if args.profile_startup:
+        backend.profile_startup()
+        return
+
+    # Sin Firestore se puede scrapear igual si las filas esperan en el buffer local
+    can_scrape = not args.no_wal or backend.get_db()
+    if can_scrape:
+        backend.configure_runtime(args)
+    server, reader = create_server(
+        args.host, args.port, args.cache_ttl, args.engine, args.max_workers, args.rate_limit
+    )
+    if args.interval and can_scrape:
+        threading.Thread(
+            target=backend.run_periodic_scraping,
+            args=(args.interval, args.engine, args.max_workers, args.rate_limit),
+            name="scraping-periodico",
+            daemon=True,
+        ).start()
+    logger.info("API escuchando en http://%s:%d/", args.host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("API detenida por el usuario.")
+    finally:
+        logger.info("Caché de /data: %s", reader.stats())
+        server.server_close()
+        backend.shutdown_driver_pool()
+        backend.shutdown_process_workers()
+        backend.shutdown_sharding()
+        backend.shutdown_wal()
+        backend.shutdown_history()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# benchmarks/bench_delta.py
+#
+# Scraping incremental con marca de agua por DNI (watermark.py) contra el
+# stub local del PJN (stub_pjn.py) y el Firestore en memoria. Cada ciclo
+# agrega --new novedades arriba de un historial de --history novedades
+# (ordenadas de la más nueva a la más vieja, como las lista el portal) y
+# corre run_all_scraping_concurrently con el motor 'http' en tres modos:
+# tabla completa, marca de agua y marca de agua más el filtro por fecha del
+# endpoint. Mide páginas pedidas, filas procesadas y escrituras por ciclo y
+# verifica que los tres modos terminan con los mismos documentos en
+# Firestore. Al final mide el recorrido de la tabla HTML (motor 'browser')
+# con y sin marca.
+#
+#   python benchmarks/bench_delta.py --dnis 5 --history 1000 --new 5 --cycles 4
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_firestore import InMemoryFirestore  # noqa: E402
+from stub_pjn import DESDE_PARAM, render_portal_rows, start_stub_server  # noqa: E402
+
+MODES = ("completa", "marca", "marca+filtro")
+TODAY = datetime(2025, 3, 3)
+
+
+def item(n, day, prefix="CIV"):
+    return {
+        "tipo": "d" if n % 3 else "n",
+        "fecha": day.strftime("%d/%m/%Y"),
+        "causa": f"{prefix} {10000 + n}/2024",
+        "caratula": f"PEREZ, JUAN C/ EMPRESA {n} S.A. S/ DAÑOS Y PERJUICIOS",
+        "link": f"/causa/{prefix.lower()}-{10000 + n}",
+    }
+
+
+def history_items(count):
+    """Historial de la más nueva a la más vieja, unas cuatro novedades por día."""
+    return [item(i, TODAY - timedelta(days=i // 4)) for i in range(count)]
+
+
+def new_items(cycle, count):
+    """Novedades del ciclo, con fecha posterior a todo lo anterior."""
+    day = TODAY + timedelta(days=cycle)
+    return [item(cycle * 1000 + i, day, prefix="COM") for i in range(count)]
+
+
+def synthetic_users(count):
+    return {
+        str(30000000 + i): {"contrasena": "bench", "nombre": f"Perito Bench {i:02d}"}
+        for i in range(count)
+    }
+
+
+def run_mode(sb, http_engine, state, args, mode, workdir):
+    """Corre los ciclos de un modo y devuelve ``(documentos, mediciones por ciclo)``."""
+    db = InMemoryFirestore()
+    sb.db = db
+    sb.usuarios_contrasenas = synthetic_users(args.dnis)
+    sb.configure_batch_committer(args.commit_workers)
+    sb.configure_http_engine("oidc")
+    if sb._change_index is not None:
+        sb._change_index.close()
+    sb.configure_change_index(os.path.join(workdir, f"index_{mode}.sqlite3"))
+    sb._watermarks = None
+    if mode != "completa":
+        sb.configure_watermarks(os.path.join(workdir, f"marcas_{mode}.json"))
+    http_engine.PJN_NOVEDADES_DESDE_PARAM = DESDE_PARAM if mode == "marca+filtro" else ""
+
+    state.items = history_items(args.history)  # Todos los DNIs ven la misma tabla
+    results = []
+    for cycle in range(args.cycles + 1):  # El ciclo 0 es la primera lectura (siempre completa)
+        if cycle:
+            state.items[:0] = new_items(cycle, args.new)
+        pages_before = state.hits.get("/api/novedades", 0)
+        writes_before = db.writes
+        start = time.perf_counter()
+        totals = sb.run_all_scraping_concurrently("http", args.max_workers)
+        elapsed = time.perf_counter() - start
+        result = {
+            "cycle": cycle,
+            "pages": state.hits.get("/api/novedades", 0) - pages_before,
+            "rows": totals["rows"],
+            "writes": db.writes - writes_before,
+            "seconds": elapsed,
+        }
+        results.append(result)
+        print(
+            f"{mode:<13} {cycle:>5} {result['pages']:>8} {result['rows']:>8} "
+            f"{result['writes']:>8} {elapsed:>8.2f}"
+        )
+    docs = {
+        doc_id: {k: v for k, v in data.items() if k != "ScrapedAt"}
+        for doc_id, data in db.data.get("novedades", {}).items()
+    }
+    return docs, results
+
+
+def bench_table(args):
+    """Recorrido de la tabla HTML del motor 'browser' (lxml) con y sin marca de agua."""
+    from extractor import extract_row, find_rows
+    from normalize import build_rows
+    from watermark import NEW, STOP, Cutoff, DeltaScan, row_key
+
+    history = history_items(args.history)
+    table = new_items(1, args.new) + history
+    elements = find_rows(render_portal_rows(table))
+    newest = row_key(history[0]["tipo"], history[0]["fecha"], history[0]["causa"])
+    same_day = [row_key(i["tipo"], i["fecha"], i["causa"]) for i in history if i["fecha"] == history[0]["fecha"]]
+    cutoff = Cutoff(newest[0], newest[1], newest[2], [(causa, tipo) for _, causa, tipo in same_day])
+
+    def walk(cutoff):
+        scan = DeltaScan(cutoff)
+        raw_rows = []
+        for element in elements:
+            raw_row = extract_row(element)
+            verdict = scan.check(raw_row)
+            if verdict is STOP:
+                break
+            if verdict is NEW:
+                raw_rows.append(raw_row)
+        return build_rows("PERITO BENCH", raw_rows)
+
+    print(f"Tabla HTML de {len(elements)} filas (extracción + armado, mejor de {args.repeat}):")
+    timings = {}
+    for label, value in (("completa", None), ("marca", cutoff)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rows = walk(value)
+            best = min(best, time.perf_counter() - start)
+        timings[label] = best
+        print(f"  {label:<10} {best * 1000:8.2f} ms  {len(rows)} filas")
+    return timings, len(walk(cutoff))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del scraping incremental con marca de agua")
+    parser.add_argument("--dnis", type=int, default=5)
+    parser.add_argument("--history", type=int, default=1000, help="Novedades ya existentes en la tabla")
+    parser.add_argument("--new", type=int, default=5, help="Novedades nuevas por ciclo")
+    parser.add_argument("--cycles", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Latencia del stub por request")
+    parser.add_argument("--max-workers", type=int, help="Scrapings simultáneos (por defecto, automático)")
+    parser.add_argument("--commit-workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+
+    server, state = start_stub_server([], latency=args.latency_ms / 1000)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    # scraping_backend y http_engine leen las URLs al importarse: hay que definirlas antes
+    os.environ["PJN_SSO_REALM_URL"] = f"{base}/auth/realms/pjn"
+    os.environ["PJN_REDIRECT_URI"] = f"{base}/"
+    os.environ["PJN_NOVEDADES_API_URL"] = f"{base}/api/novedades"
+    import http_engine
+    import scraping_backend as sb
+
+    print(f"{'modo':<13} {'ciclo':>5} {'páginas':>8} {'filas':>8} {'escrit.':>8} {'seg':>8}")
+    documents = {}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_delta_") as workdir:
+        try:
+            for mode in MODES:
+                documents[mode], results[mode] = run_mode(sb, http_engine, state, args, mode, workdir)
+        finally:
+            if sb._change_index is not None:
+                sb._change_index.close()
+                sb._change_index = None
+            server.shutdown()
+    timings, table_rows = bench_table(args)
+
+    failures = []
+    for mode in MODES[1:]:
+        if documents[mode] != documents["completa"]:
+            missing = len(set(documents["completa"]) - set(documents[mode]))
+            failures.append(f"'{mode}' terminó con otros documentos ({missing} faltantes)")
+        for result in results[mode][1:]:
+            if result["rows"] != args.new * args.dnis:
+                failures.append(f"'{mode}' procesó {result['rows']} filas en el ciclo {result['cycle']}")
+    if table_rows != args.new:
+        failures.append(f"la tabla HTML con marca devolvió {table_rows} filas en lugar de {args.new}")
+    if failures:
+        sys.exit("FALLÓ: " + "; ".join(failures))
+    delta_cycles = results["marca"][1:]
+    full_cycles = results["completa"][1:]
+    print(
+        f"OK: mismos {len(documents['completa'])} documentos en los tres modos. Por ciclo, con marca: "
+        f"{sum(r['pages'] for r in delta_cycles) / len(delta_cycles):.0f} páginas y "
+        f"{sum(r['rows'] for r in delta_cycles) / len(delta_cycles):.0f} filas "
+        f"(tabla completa: {sum(r['pages'] for r in full_cycles) / len(full_cycles):.0f} y "
+        f"{sum(r['rows'] for r in full_cycles) / len(full_cycles):.0f}); "
+        f"tabla HTML {timings['completa'] / timings['marca']:.0f}x más rápida."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_extractor.py
+#
+# Compara el extractor lxml (extractor.py) con el recorrido original basado
+# en BeautifulSoup: primero verifica que ambos producen exactamente los mismos
+# valores sobre los fixtures HTML y luego mide el tiempo por página.
+#
+#   python benchmarks/bench_extractor.py --rows 200 --repeat 20
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extractor import RowFormatError, extract_row, find_rows, row_text  # noqa: E402
+from stub_pjn import render_portal_rows, synthetic_items  # noqa: E402
+
+
+def legacy_extract(html_code):
+    """Recorrido original de scrapingPJN con BeautifulSoup (antes de extractor.py)."""
+    soup = BeautifulSoup(html_code, "lxml")
+    results = []
+    for element_tr in soup.select("tr.MuiBox-root"):
+        td_tags = element_tr.find_all("td")
+        if len(td_tags) < 3:
+            results.append(("skip", element_tr.get_text(strip=True, separator=" | ")))
+            continue
+        tipo_raw = td_tags[0].text.strip()
+        fecha_str = td_tags[2].text.strip()
+        causa_elem = element_tr.select_one("p.MuiTypography-root.MuiTypography-body1.w-full.css-11dlpbt")
+        nombre_elem = element_tr.select_one("p.MuiTypography-root.MuiTypography-body1.w-full.italic.css-4icvzy")
+        if causa_elem is None or nombre_elem is None:
+            results.append(("skip", element_tr.get_text(strip=True, separator=" | ")))
+            continue
+        link_elem = element_tr.find("a", attrs={"aria-label": "Ver Causa"})
+        link_raw = link_elem.get("href", "") if link_elem else ""
+        results.append(
+            (tipo_raw, fecha_str, causa_elem.text.strip(), nombre_elem.text.strip(), link_raw)
+        )
+    return results
+
+
+def lxml_extract(html_code):
+    results = []
+    for element_tr in find_rows(html_code):
+        try:
+            results.append(extract_row(element_tr))
+        except RowFormatError:
+            results.append(("skip", row_text(element_tr)))
+    return results
+
+
+def check_equivalence(pages):
+    for name, html_code in pages:
+        legacy = legacy_extract(html_code)
+        fast = lxml_extract(html_code)
+        if legacy != fast:
+            for i, (a, b) in enumerate(zip(legacy, fast)):
+                if a != b:
+                    print(f"  fila {i}: bs4={a!r}\n          lxml={b!r}")
+            sys.exit(f"Diferencias entre extractores en {name} ({len(legacy)} vs {len(fast)} filas)")
+        print(f"OK {name}: {len(fast)} filas idénticas")
+
+
+def timeit(fn, html_code, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html_code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark del extractor de filas")
+    parser.add_argument("--rows", type=int, default=200, help="Filas de la página sintética")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(BENCH_DIR, "fixtures", "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    pages.append((f"sintética ({args.rows} filas)", render_portal_rows(synthetic_items(args.rows))))
+
+    check_equivalence(pages)
+
+    print(f"\n{'página':<28} {'bs4 ms':>9} {'lxml ms':>9} {'aceleración':>12}")
+    for name, html_code in pages:
+        t_legacy = timeit(legacy_extract, html_code, args.repeat)
+        t_fast = timeit(lxml_extract, html_code, args.repeat)
+        print(f"{name:<28} {t_legacy * 1000:>9.2f} {t_fast * 1000:>9.2f} {t_legacy / t_fast:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
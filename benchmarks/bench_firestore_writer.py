@@ -0,0 +1,92 @@
+# benchmarks/bench_firestore_writer.py
+#
+# Throughput del BatchCommitter escribiendo N filas (10k por defecto), con
+# commits secuenciales vs. en paralelo. Usa el Firestore en memoria con
+# latencia simulada o, con --emulator, el emulador apuntado por
+# FIRESTORE_EMULATOR_HOST.
+#
+#   python benchmarks/bench_firestore_writer.py --rows 10000 --latency-ms 80
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_firestore import InMemoryFirestore  # noqa: E402
+from firestore_writer import BatchCommitter  # noqa: E402
+
+
+def synthetic_documents(count):
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        doc = {
+            "Perito": f"Perito {i % 9}",
+            "Tipo": "NOVEDAD" if i % 3 else "NOTIFICACION",
+            "Causa": f"CIV {10000 + i}/2024",
+            "Nombre": f"PEREZ, JUAN C/ EMPRESA {i} S.A. S/ DAÑOS Y PERJUICIOS",
+            "Fecha": base + timedelta(days=i % 365),
+            "Link": f"/causa/{10000 + i}",
+            "ScrapedAt": datetime.now(),
+            "Aceptada": False,
+            "EscritoPresentado": False,
+            "Resumen": "",
+        }
+        yield f"bench_{i}", doc
+
+
+def make_db(args):
+    if args.emulator:
+        if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+            sys.exit("Definí FIRESTORE_EMULATOR_HOST (ej. localhost:8080) para usar el emulador.")
+        from google.cloud import firestore
+
+        return firestore.Client(project=os.getenv("GCLOUD_PROJECT", "peritos-bench"))
+    return InMemoryFirestore(args.latency_ms / 1000, args.failure_rate, seed=1)
+
+
+def run(args, workers):
+    db = make_db(args)
+    documents = list(synthetic_documents(args.rows))
+    committer = BatchCommitter(db, "bench_novedades", max_workers=workers, base_delay=0.05)
+    start = time.perf_counter()
+    outcomes = committer.commit(documents)
+    elapsed = time.perf_counter() - start
+    committer.close()
+    ok = sum(1 for o in outcomes.values() if o.ok)
+    return {
+        "workers": workers,
+        "rows": args.rows,
+        "ok": ok,
+        "failed": len(outcomes) - ok,
+        "commits": committer.commits,
+        "retries": committer.retries,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(ok / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del escritor de batches de Firestore")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Latencia simulada por commit")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Proporción de commits con error transitorio")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--emulator", action="store_true", help="Usar el emulador de Firestore")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)  # Los reintentos se cuentan en la tabla
+
+    print(f"{'workers':>7} {'filas ok':>9} {'fallidas':>8} {'commits':>7} {'reintentos':>10} {'seg':>8} {'filas/s':>10}")
+    for workers in args.workers:
+        r = run(args, workers)
+        print(
+            f"{r['workers']:>7} {r['ok']:>9} {r['failed']:>8} {r['commits']:>7} "
+            f"{r['retries']:>10} {r['seconds']:>8} {r['rows_per_second']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
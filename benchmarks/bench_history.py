@@ -0,0 +1,122 @@
+# benchmarks/bench_history.py
+#
+# Prueba del historial columnar (history.py): exporta un año de novedades
+# sintéticas de varios peritos, ciclo por ciclo como lo hace el scraping, y
+# mide el tamaño en disco y la latencia de consultas típicas de reportes.
+# Verifica además que reexportar las mismas filas no agrega nada y que las
+# consultas devuelven exactamente lo exportado.
+#
+#   python benchmarks/bench_history.py --peritos 20 --per-day 15 --days 365
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from history import HistoryExporter, HistoryReader  # noqa: E402
+
+
+def synthetic_day(day, peritos, per_day, rng):
+    """Filas de un día con la forma de las que arma scrapingPJN."""
+    rows = []
+    for perito in peritos:
+        for _ in range(rng.randint(0, per_day * 2)):
+            n = rng.randint(1, 5000)
+            rows.append(
+                {
+                    "Perito": perito,
+                    "Tipo": "NOVEDAD" if rng.random() < 0.7 else "NOTIFICACION",
+                    "Causa": f"CIV {10000 + n}/2024",
+                    "Nombre": f"PEREZ, JUAN C/ EMPRESA {n} S.A. S/ DAÑOS Y PERJUICIOS",
+                    "Fecha": datetime(day.year, day.month, day.day),
+                    "Link": f"https://portalpjn.pjn.gov.ar/causa/{10000 + n}",
+                    "ScrapedAt": datetime(day.year, day.month, day.day, 18) + timedelta(seconds=rng.randint(0, 3600)),
+                }
+            )
+    return rows
+
+
+def doc_id(row):
+    return f"{row['Perito']}_{row['Tipo']}_{row['Fecha']:%d-%m-%Y}_{row['Causa']}".replace(" ", "_").lower()
+
+
+def timed(label, fn, repeat):
+    fn()  # Primera lectura: arma el dataset y calienta la caché de páginas
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<44} {elapsed * 1000:8.1f} ms  ({result.num_rows} filas)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del historial columnar de novedades")
+    parser.add_argument("--peritos", type=int, default=20)
+    parser.add_argument("--per-day", type=int, default=15, help="Novedades promedio por perito y día")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", help="Directorio donde dejar el historial (por defecto uno temporal)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    peritos = [f"PERITO {i:03d}" for i in range(args.peritos)]
+    root = args.keep or tempfile.mkdtemp(prefix="history-bench-")
+    exporter = HistoryExporter(root, doc_id)
+    start_day = date(2024, 1, 1)
+
+    expected = {}
+    export_seconds = 0.0
+    for offset in range(args.days):
+        rows = synthetic_day(start_day + timedelta(days=offset), peritos, args.per_day, rng)
+        for row in rows:
+            expected.setdefault(doc_id(row), row)
+        start = time.perf_counter()
+        # Cada ciclo vuelve a traer las novedades del día anterior: no se repiten
+        exporter.export(rows + (previous if offset else []))
+        export_seconds += time.perf_counter() - start
+        previous = rows
+    replaced = exporter.compact()
+    again = exporter.export(previous)
+    exporter.close()
+
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+    print(
+        f"Exportadas {len(expected)} novedades en {exporter.files_written} archivos "
+        f"({export_seconds:.2f}s; {replaced} archivos compactados); {size / 1e6:.1f} MB en disco."
+    )
+
+    reader = HistoryReader(root)
+    print("Consultas:")
+    total = timed("año completo, conteo por Perito y Tipo", lambda: reader.count_by("Perito", "Tipo"), args.repeat)
+    timed(
+        "un perito, un mes",
+        lambda: reader.query(desde=date(2024, 6, 1), hasta=date(2024, 6, 30), perito=peritos[0]),
+        args.repeat,
+    )
+    timed("NOTIFICACION del último trimestre", lambda: reader.query(desde=date(2024, 10, 1), tipo="NOTIFICACION"), args.repeat)
+    everything = reader.query(columns=["doc_id"])
+
+    failures = []
+    if again:
+        failures.append(f"reexportar agregó {again} filas")
+    if sorted(everything.column("doc_id").to_pylist()) != sorted(expected):
+        failures.append("el historial no coincide con las filas exportadas")
+    if sum(total.column("count").to_pylist()) != len(expected):
+        failures.append("el conteo por Perito y Tipo no suma el total")
+    if not args.keep:
+        shutil.rmtree(root)
+    if failures:
+        sys.exit("FALLÓ: " + "; ".join(failures))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
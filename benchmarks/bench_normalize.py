@@ -0,0 +1,191 @@
+# benchmarks/bench_normalize.py
+#
+# Compara el armado de filas por lotes (normalize.py) con el camino original
+# fila por fila de scraping_backend (_build_row + build_doc_id +
+# _prepare_document, copiados abajo tal como estaban; el documento nuevo se
+# arma con el _prepare_document actual del backend). Primero verifica que
+# los doc_ids y los valores de cada fila son exactamente los mismos y que los
+# documentos solo difieren en el doble escape que se corrigió; después mide
+# tiempo y memoria sobre --rows filas sintéticas.
+#
+#   python benchmarks/bench_normalize.py --rows 100000
+
+import argparse
+import gc
+import html
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from normalize import build_doc_id, build_rows  # noqa: E402
+from scraping_backend import _prepare_document as prepare_document  # noqa: E402
+from stub_pjn import synthetic_items  # noqa: E402
+
+PERITO = "GÓMEZ, ANA & ASOC."
+
+
+########################################
+# Camino original (antes de normalize.py)
+########################################
+def legacy_sanitize_text(value):
+    if not isinstance(value, str):
+        return value
+    return html.escape(value)
+
+
+def legacy_parse_fecha(value_str):
+    if not isinstance(value_str, str):
+        return None
+    try:
+        return datetime.strptime(value_str, "%d/%m/%Y")
+    except ValueError:
+        return None
+
+
+def legacy_normalize_causa(causa_str):
+    if not isinstance(causa_str, str):
+        return "unknown_causa"
+    return causa_str.replace(" ", "").replace("/", "_").replace("-", "_").lower()
+
+
+def legacy_build_row(perito_nombre, tipo_raw, fecha_str, causa_raw, nombre_raw, link_raw):
+    causa = legacy_sanitize_text(causa_raw)
+    nombre = legacy_sanitize_text(nombre_raw)
+    link = legacy_sanitize_text(link_raw)
+    tipo_mapeado = "NOVEDAD"
+    if tipo_raw.lower() == "d":
+        tipo_mapeado = "NOVEDAD"
+    elif tipo_raw.lower() == "n":
+        tipo_mapeado = "NOTIFICACION"
+    else:
+        tipo_mapeado = tipo_raw if tipo_raw else "DESCONOCIDO"
+    return {
+        "Perito": legacy_sanitize_text(perito_nombre),
+        "Tipo": legacy_sanitize_text(tipo_mapeado),
+        "Causa": causa,
+        "Nombre": nombre,
+        "Fecha": legacy_parse_fecha(fecha_str),
+        "Link": link,
+        "ScrapedAt": datetime.now(),
+    }
+
+
+def legacy_build_doc_id(row):
+    fecha_dt = row.get("Fecha")
+    if isinstance(fecha_dt, datetime):
+        fecha_key_str = fecha_dt.strftime("%d-%m-%Y")
+    else:
+        fecha_key_str = "unknown_date"
+    norm_causa_str = legacy_normalize_causa(row.get("Causa", ""))
+    doc_id = f"{row.get('Perito', 'unknown_perito')}_{row.get('Tipo', 'unknown_type')}_{fecha_key_str}_{norm_causa_str}"
+    return doc_id.replace(" ", "_").lower()
+
+
+def legacy_prepare_document(row):
+    data_to_save = row.copy()
+    for k, v in list(data_to_save.items()):
+        if isinstance(v, str):
+            data_to_save[k] = legacy_sanitize_text(v)
+    data_to_save.setdefault("Aceptada", False)
+    data_to_save.setdefault("EscritoPresentado", False)
+    data_to_save.setdefault("Resumen", "")
+    return data_to_save
+
+
+########################################
+# Datos
+########################################
+def raw_rows(count):
+    """Tuplas crudas como las de extract_row, con casos borde mezclados."""
+    rows = []
+    for i, item in enumerate(synthetic_items(count)):
+        fecha, tipo, causa = item["fecha"], item["tipo"], item["causa"]
+        if i % 97 == 0:
+            fecha = "31/02/2024"  # Fecha inválida
+        if i % 89 == 0:
+            tipo = "X <b>" if i % 2 else ""  # Tipo desconocido o vacío
+        if i % 53 == 0:
+            causa = f"COM - {i} / 2024 <script>"  # Espacios, guiones y HTML
+        rows.append((tipo, fecha, causa, item["caratula"] + ' "Q" & <i>', item["link"] + "?a=1&b=2"))
+    return rows
+
+
+def legacy_pipeline(raw):
+    rows = [legacy_build_row(PERITO, *values) for values in raw]
+    return rows, [legacy_build_doc_id(row) for row in rows], [legacy_prepare_document(row) for row in rows]
+
+
+def batch_pipeline(raw):
+    rows = build_rows(PERITO, raw)
+    return rows, [build_doc_id(row) for row in rows], [prepare_document(row) for row in rows]
+
+
+########################################
+# Verificación y medición
+########################################
+def check_equivalence(raw):
+    legacy_rows, legacy_ids, legacy_docs = legacy_pipeline(raw)
+    rows, doc_ids, docs = batch_pipeline(raw)
+    mismatches = []
+    for i, (old, new) in enumerate(zip(legacy_rows, rows)):
+        old_values = {k: v for k, v in old.items() if k != "ScrapedAt"}
+        new_values = {k: v for k, v in dict(new).items() if k != "ScrapedAt"}
+        if old_values != new_values:
+            mismatches.append((i, "fila", old_values, new_values))
+        if legacy_ids[i] != doc_ids[i] or legacy_build_doc_id(dict(new)) != doc_ids[i]:
+            mismatches.append((i, "doc_id", legacy_ids[i], doc_ids[i]))
+        # El documento viejo tenía los textos escapados dos veces; el nuevo, una
+        expected = {k: html.escape(v) if isinstance(v, str) else v for k, v in docs[i].items() if k != "ScrapedAt"}
+        if {k: v for k, v in legacy_docs[i].items() if k != "ScrapedAt"} != expected:
+            mismatches.append((i, "documento", legacy_docs[i], docs[i]))
+    if len(rows) != len(legacy_rows) or len(set(doc_ids)) != len(set(legacy_ids)):
+        mismatches.append((None, "cantidad", len(legacy_rows), len(rows)))
+    return mismatches
+
+
+def measure(label, fn, raw, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(raw)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    result = fn(raw)
+    rows_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    print(f"  {label:<10} {best * 1000:9.1f} ms  {len(raw) / best:12,.0f} filas/s  {rows_bytes / 1e6:7.1f} MB retenidos")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del armado de filas por lotes")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # Las fechas inválidas a propósito no llenan la salida
+    raw = raw_rows(args.rows)
+    mismatches = check_equivalence(raw)
+    if mismatches:
+        for mismatch in mismatches[:10]:
+            print("Diferencia:", mismatch)
+        sys.exit(f"FALLÓ: {len(mismatches)} diferencias con el camino original")
+    print(f"Equivalencia OK: {len(raw)} filas con los mismos valores y doc_ids.")
+
+    print(f"Armado + doc_id + documento para {len(raw)} filas (mejor de {args.repeat}):")
+    legacy = measure("original", legacy_pipeline, raw, args.repeat)
+    batch = measure("lotes", batch_pipeline, raw, args.repeat)
+    print(f"Aceleración: {legacy / batch:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# benchmarks/bench_pipeline.py
+#
+# Benchmark de punta a punta del pipeline scraping -> Firestore contra el
+# stub local del PJN (stub_pjn.py) y el Firestore en memoria (o el emulador).
+# Ejecuta run_all_scraping_concurrently con 1..N DNIs sintéticos y mide, por
+# escala y por ciclo, el tiempo de cada etapa (scrapingPJN / saveToFirestore),
+# filas/s y el pico de memoria. Con --output el resultado se guarda en JSON
+# para comparar versiones:
+#
+#   python benchmarks/bench_pipeline.py --dnis 1 5 10 25 50 --output base.json
+#   python benchmarks/bench_pipeline.py --dnis 1 5 10 25 50 --compare base.json
+#
+# El motor 'browser' necesita Chrome y chromedriver instalados.
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from driver_pool import process_tree_rss  # noqa: E402
+from fake_firestore import InMemoryFirestore  # noqa: E402
+from stub_pjn import start_stub_server, synthetic_items  # noqa: E402
+
+
+########################################
+# Mediciones
+########################################
+class StageTimer:
+    """Acumula duraciones por etapa (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._durations.setdefault(stage, []).append(elapsed)
+
+        return timed
+
+    def summary(self):
+        with self._lock:
+            durations = {stage: sorted(values) for stage, values in self._durations.items()}
+        result = {}
+        for stage, values in durations.items():
+            result[stage] = {
+                "calls": len(values),
+                "total_seconds": round(sum(values), 4),
+                "mean_seconds": round(sum(values) / len(values), 4),
+                "p50_seconds": round(values[len(values) // 2], 4),
+                "p95_seconds": round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+                "max_seconds": round(values[-1], 4),
+            }
+        return result
+
+
+class PeakRssSampler:
+    """Muestrea la memoria del proceso y sus hijos (Chrome incluido)."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, process_tree_rss(pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak_bytes:  # Sin /proc ni psutil: pico del proceso (KB en Linux)
+            self.peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+########################################
+# Entorno de prueba
+########################################
+def start_stub(args):
+    portal_html = None
+    if args.portal_html:
+        with open(args.portal_html, encoding="utf-8") as f:
+            portal_html = f.read()
+    server, state = start_stub_server(
+        synthetic_items(args.rows),
+        latency=args.latency_ms / 1000,
+        rows_per_dni=args.rows,
+        portal_html=portal_html,
+    )
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    # scraping_backend lee las URLs al importarse: hay que definirlas antes
+    os.environ["PJN_SSO_REALM_URL"] = f"{base}/auth/realms/pjn"
+    os.environ["PJN_REDIRECT_URI"] = f"{base}/"
+    os.environ["PJN_NOVEDADES_API_URL"] = f"{base}/api/novedades"
+    return server, state
+
+
+def make_db(args):
+    if args.emulator:
+        if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+            sys.exit("Definí FIRESTORE_EMULATOR_HOST (ej. localhost:8080) para usar el emulador.")
+        from google.cloud import firestore
+
+        return firestore.Client(project=os.getenv("GCLOUD_PROJECT", "peritos-bench"))
+    return InMemoryFirestore(args.commit_latency_ms / 1000, args.failure_rate, seed=1)
+
+
+def synthetic_users(count):
+    return {
+        str(30000000 + i): {"contrasena": "bench", "nombre": f"Perito Bench {i:02d}"}
+        for i in range(count)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+########################################
+# Ejecución
+########################################
+def run_scale(sb, args, dni_count, workdir):
+    """Corre ``args.cycles`` ciclos completos con ``dni_count`` DNIs sintéticos."""
+    db = make_db(args)
+    sb.db = db
+    sb.usuarios_contrasenas = synthetic_users(dni_count)
+    sb.configure_batch_committer(args.commit_workers)
+    if args.engine == "http":
+        sb.configure_http_engine("oidc")
+    if sb._change_index is not None:
+        sb._change_index.close()
+        sb._change_index = None
+    if not args.no_change_index:
+        sb.configure_change_index(os.path.join(workdir, f"index_{dni_count}.sqlite3"))
+    if args.engine == "browser" and not args.no_driver_pool:
+        sb.configure_driver_pool(max_sessions=dni_count)
+
+    original_engine = sb.SCRAPING_ENGINES[args.engine]
+    original_save = sb.saveToFirestore
+    results = []
+    try:
+        for cycle in range(1, args.cycles + 1):
+            timer = StageTimer()
+            sb.SCRAPING_ENGINES[args.engine] = timer.wrap("scrape", original_engine)
+            sb.saveToFirestore = timer.wrap("save", original_save)
+            before = db.stats() if hasattr(db, "stats") else {}
+
+            with PeakRssSampler() as rss:
+                start = time.perf_counter()
+                totals = sb.run_all_scraping_concurrently(args.engine, args.max_workers, args.rate_limit)
+                elapsed = time.perf_counter() - start
+
+            after = db.stats() if hasattr(db, "stats") else {}
+            rows = totals["rows"]  # Las que realmente se scrapearon (sin los DNIs que fallaron)
+            result = {
+                "dnis": dni_count,
+                "cycle": cycle,
+                "rows": rows,
+                "rows_expected": args.rows * dni_count,
+                "seconds": round(elapsed, 4),
+                "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+                "peak_rss_mb": round(rss.peak_bytes / (1024 * 1024), 1),
+                "stages": timer.summary(),
+                "firestore": {k: after[k] - before.get(k, 0) for k in after if k != "documents"},
+                "documents": after.get("documents"),
+            }
+            results.append(result)
+            print(
+                f"{dni_count:>5} {cycle:>6} {rows:>7} {result['seconds']:>8.2f} "
+                f"{result['rows_per_second'] or 0:>9.0f} "
+                f"{result['stages'].get('scrape', {}).get('p50_seconds', 0):>10.3f} "
+                f"{result['stages'].get('save', {}).get('total_seconds', 0):>9.3f} "
+                f"{result['firestore'].get('writes', 0):>8} {result['peak_rss_mb']:>8.0f}"
+            )
+    finally:
+        sb.SCRAPING_ENGINES[args.engine] = original_engine
+        sb.saveToFirestore = original_save
+        sb.shutdown_driver_pool()
+    return results
+
+
+def compare(results, previous_path):
+    """Imprime la variación de filas/s respecto de un JSON anterior."""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    old = {(r["dnis"], r["cycle"]): r for r in previous["results"]}
+    print(f"\nComparación con {previous_path} ({previous.get('revision')}):")
+    print(f"{'DNIs':>5} {'ciclo':>6} {'filas/s antes':>14} {'filas/s ahora':>14} {'cambio':>8}")
+    for r in results:
+        before = old.get((r["dnis"], r["cycle"]))
+        if not before or not before["rows_per_second"] or not r["rows_per_second"]:
+            continue
+        change = (r["rows_per_second"] / before["rows_per_second"] - 1) * 100
+        print(
+            f"{r['dnis']:>5} {r['cycle']:>6} {before['rows_per_second']:>14.0f} "
+            f"{r['rows_per_second']:>14.0f} {change:>+7.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta scraping -> Firestore")
+    parser.add_argument("--engine", choices=["http", "browser"], default="http")
+    parser.add_argument("--dnis", type=int, nargs="+", default=[1, 5, 10, 25, 50], help="Escalas a medir")
+    parser.add_argument("--rows", type=int, default=50, help="Novedades por DNI")
+    parser.add_argument("--cycles", type=int, default=2, help="Ciclos por escala (el 2.º mide filas sin cambios)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latencia del stub por request")
+    parser.add_argument("--portal-html", help="HTML grabado del portal (motor 'browser')")
+    parser.add_argument("--commit-latency-ms", type=float, default=40.0, help="Latencia simulada por commit")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Proporción de commits con error transitorio")
+    parser.add_argument("--emulator", action="store_true", help="Usar el emulador de Firestore")
+    parser.add_argument("--max-workers", type=int, help="Scrapings simultáneos (por defecto, automático)")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Inicios por minuto (0 = sin límite)")
+    parser.add_argument("--commit-workers", type=int, default=4)
+    parser.add_argument("--no-change-index", action="store_true")
+    parser.add_argument("--no-driver-pool", action="store_true")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados (por defecto no se guardan)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+
+    server, state = start_stub(args)
+    import scraping_backend as sb  # Después de apuntar las URLs al stub
+
+    print(f"{'DNIs':>5} {'ciclo':>6} {'filas':>7} {'seg':>8} {'filas/s':>9} {'scrape p50':>10} {'save seg':>9} {'escrit.':>8} {'RSS MB':>8}")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+        try:
+            for dni_count in args.dnis:
+                results.extend(run_scale(sb, args, dni_count, workdir))
+        finally:
+            if sb._change_index is not None:
+                sb._change_index.close()
+                sb._change_index = None
+            server.shutdown()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": vars(args),
+        "stub_requests": state.hits,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# benchmarks/bench_sharding.py
+#
+# Prueba del modo distribuido (sharding.py): levanta varios nodos que se
+# reparten DNIs sintéticos con leases, simula cada scraping con una espera y
+# a mitad de la corrida mata un nodo sin liberar sus leases. Verifica que:
+#
+#   - nunca hay dos scrapings simultáneos del mismo DNI,
+#   - los DNIs del nodo caído pasan a otro nodo en menos de un TTL y medio,
+#   - al final todos los DNIs tienen dueño y el reparto es parejo.
+#
+# Sin opciones los nodos son hilos sobre el Firestore en memoria; con
+# --emulator son procesos separados contra el emulador de Firestore:
+#
+#   python benchmarks/bench_sharding.py --nodes 3 --dnis 20
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmarks/bench_sharding.py --emulator --nodes 4
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_firestore import InMemoryFirestore  # noqa: E402
+from sharding import LeaseManager  # noqa: E402
+
+
+def emulator_client():
+    from google.cloud import firestore
+
+    return firestore.Client(project=os.getenv("GCLOUD_PROJECT", "peritos-bench"))
+
+
+def run_node(db, node_id, dnis, args, records, crash):
+    """Un nodo: cada ``--interval`` segundos "scrapea" los DNIs de los que tiene el lease."""
+    manager = LeaseManager(db, dnis, node_id=node_id, collection=args.collection, ttl=args.ttl)
+    manager.start(settle=args.settle)
+    rng = random.Random(node_id)
+    while not crash.is_set():
+        cycle_start = time.monotonic()
+        for dni in dnis:
+            with manager.hold(dni) as leased:
+                if not leased or manager.scraped_elsewhere_within(dni, args.interval):
+                    continue
+                start = time.time()
+                time.sleep(rng.uniform(0.5, 1.5) * args.scrape_seconds)
+                manager.mark_scraped(dni)
+                records.put(("scrape", node_id, dni, start, time.time()))
+        records.put(("owned", node_id, manager.owned(), time.time(), None))
+        crash.wait(max(0.0, args.interval - (time.monotonic() - cycle_start)))
+    manager.close(release=False)  # Caída simulada: los leases tienen que vencer solos
+
+
+def run_node_process(node_id, dnis, args, records):
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+    run_node(emulator_client(), node_id, dnis, args, records, multiprocessing.Event())
+
+
+########################################
+# Verificaciones
+########################################
+def check_overlaps(scrapes):
+    """Pares de scrapings del mismo DNI que se solapan en el tiempo."""
+    overlaps = []
+    by_dni = {}
+    for node, dni, start, end in scrapes:
+        by_dni.setdefault(dni, []).append((start, end, node))
+    for dni, runs in by_dni.items():
+        runs.sort()
+        for (s1, e1, n1), (s2, e2, n2) in zip(runs, runs[1:]):
+            if s2 < e1:
+                overlaps.append((dni, n1, n2, round(e1 - s2, 3)))
+    return overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de reparto de DNIs entre nodos con leases")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--dnis", type=int, default=20)
+    parser.add_argument("--ttl", type=float, default=6.0, help="TTL de los leases (segundos)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Segundos entre ciclos de cada nodo")
+    parser.add_argument("--scrape-seconds", type=float, default=0.05, help="Duración media de un scraping simulado")
+    parser.add_argument("--settle", type=float, default=1.0, help="Espera inicial de cada nodo a los demás")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duración total de la prueba")
+    parser.add_argument("--emulator", action="store_true", help="Nodos como procesos contra el emulador")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+    args.collection = f"bench_leases_{uuid.uuid4().hex[:8]}"
+
+    dnis = [str(30000000 + i) for i in range(args.dnis)]
+    node_ids = [f"nodo-{i}" for i in range(args.nodes)]
+    if args.emulator:
+        if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+            sys.exit("Definí FIRESTORE_EMULATOR_HOST (ej. localhost:8080) para usar el emulador.")
+        ctx = multiprocessing.get_context("spawn")
+        records = ctx.Queue()
+        nodes = {n: ctx.Process(target=run_node_process, args=(n, dnis, args, records)) for n in node_ids}
+        for proc in nodes.values():
+            proc.start()
+
+        def kill(node_id):
+            nodes[node_id].kill()
+
+        def stop_all():
+            for proc in nodes.values():
+                proc.kill()
+    else:
+        db = InMemoryFirestore()
+        records = queue.Queue()
+        crashes = {n: threading.Event() for n in node_ids}
+        for n in node_ids:
+            threading.Thread(target=run_node, args=(db, n, dnis, args, records, crashes[n]), daemon=True).start()
+
+        def kill(node_id):
+            crashes[node_id].set()
+
+        def stop_all():
+            for event in crashes.values():
+                event.set()
+
+    victim = node_ids[0]
+    killed_at = None
+    deadline = time.time() + args.duration
+    scrapes = []
+    owners = {}  # nodo -> (DNIs, instante) del último reporte
+    takeover = {}  # dni del nodo caído -> instante en que lo scrapeó otro nodo
+    victim_dnis = set()
+    while time.time() < deadline:
+        if killed_at is None and time.time() > deadline - args.duration / 2:
+            victim_dnis = set(owners.get(victim, ([], 0))[0])
+            kill(victim)
+            killed_at = time.time()
+            print(f"Nodo {victim} detenido sin liberar {len(victim_dnis)} leases.")
+        try:
+            kind, node, value, start, end = records.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if kind == "owned":
+            owners[node] = (value, start)
+            continue
+        scrapes.append((node, value, start, end))
+        if killed_at is not None and node != victim and value in victim_dnis and value not in takeover:
+            takeover[value] = start - killed_at
+    stop_all()
+
+    alive = {n: dnis_ for n, (dnis_, _) in owners.items() if n != victim}
+    assigned = [dni for owned in alive.values() for dni in owned]
+    overlaps = check_overlaps(scrapes)
+    print(f"Scrapings simulados: {len(scrapes)}; solapamientos del mismo DNI: {len(overlaps)}")
+    for dni, n1, n2, seconds in overlaps[:10]:
+        print(f"  DNI {dni}: {n1} y {n2} se solaparon {seconds}s")
+    print("Reparto final: " + ", ".join(f"{n}={len(d)}" for n, d in sorted(alive.items())))
+    if takeover:
+        print(
+            f"Toma de leases del nodo caído: {len(takeover)}/{len(victim_dnis)} DNIs, "
+            f"el último a los {max(takeover.values()):.1f}s (TTL {args.ttl:.0f}s)."
+        )
+
+    failures = []
+    if overlaps:
+        failures.append("hubo scrapings simultáneos del mismo DNI")
+    if sorted(assigned) != sorted(dnis):
+        failures.append(f"{len(set(dnis) - set(assigned))} DNIs sin dueño o con dueño repetido al final")
+    if len(takeover) < len(victim_dnis) or (takeover and max(takeover.values()) > args.ttl * 1.5 + args.interval):
+        failures.append("los DNIs del nodo caído no se tomaron a tiempo")
+    if failures:
+        sys.exit("FALLÓ: " + "; ".join(failures))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# benchmarks/fake_firestore.py
+#
+# Cliente Firestore en memoria con la API mínima que usa el backend
+# (collection/document/batch/set/commit, select/where/order_by/stream y
+# create/update/delete con precondición de update_time para los leases).
+# Permite simular latencia por commit y errores transitorios.
+
+import random
+import threading
+import time
+
+try:
+    from google.api_core.exceptions import ServiceUnavailable as TransientError
+except ImportError:  # Sin google-api-core instalado
+    TransientError = ConnectionError
+
+try:
+    from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+except ImportError:  # Sin google-api-core: la misma excepción que espera sharding.py
+    from sharding import LeaseConflict as AlreadyExists, LeaseConflict as FailedPrecondition, LeaseConflict as NotFound
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, update_time=None):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+        self.update_time = update_time
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self.collection_name = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        with self._db.lock:
+            data = self._db.data.get(self.collection_name, {}).get(self.id)
+            update_time = self._db.update_times.get((self.collection_name, self.id))
+            return FakeSnapshot(self.id, dict(data) if data is not None else None, update_time)
+
+    def set(self, data, merge=False):
+        self._db._apply([(self, data, merge)])
+
+    def create(self, data):
+        """Como ``set`` pero falla con AlreadyExists si el documento existe."""
+        with self._db.lock:
+            if self.id in self._db.data.get(self.collection_name, {}):
+                raise AlreadyExists(f"El documento {self.id} ya existe")
+            self._db._apply_locked([(self, data, False)])
+
+    def _check_option(self, option):
+        key = (self.collection_name, self.id)
+        if key not in self._db.update_times:
+            raise NotFound(f"El documento {self.id} no existe")
+        if option is not None and self._db.update_times[key] != option["last_update_time"]:
+            raise FailedPrecondition(f"El documento {self.id} cambió desde la última lectura")
+
+    def update(self, data, option=None):
+        with self._db.lock:
+            self._check_option(option)
+            self._db._apply_locked([(self, data, True)])
+
+    def delete(self, option=None):
+        with self._db.lock:
+            if option is not None:
+                self._check_option(option)
+            self._db.data.get(self.collection_name, {}).pop(self.id, None)
+            self._db.update_times.pop((self.collection_name, self.id), None)
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), order=(), limit=None, fields=None, start_after=None):
+        self._db = db
+        self._collection = collection
+        self._filters = list(filters)
+        self._order = list(order)
+        self._limit = limit
+        self._fields = fields
+        self._start_after = start_after
+
+    def _copy(self, **kwargs):
+        params = dict(
+            filters=self._filters,
+            order=self._order,
+            limit=self._limit,
+            fields=self._fields,
+            start_after=self._start_after,
+        )
+        params.update(kwargs)
+        return FakeQuery(self._db, self._collection, **params)
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(order=self._order + [(field, direction)])
+
+    def start_after(self, values):
+        """Cursor como dict ``{campo_de_orden: valor}`` (``__name__`` = ID del documento)."""
+        return self._copy(start_after=dict(values))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def stream(self):
+        ops = {
+            "==": lambda a, b: a == b,
+            ">=": lambda a, b: a is not None and a >= b,
+            "<=": lambda a, b: a is not None and a <= b,
+            ">": lambda a, b: a is not None and a > b,
+            "<": lambda a, b: a is not None and a < b,
+        }
+        with self._db.lock:
+            docs = [(k, dict(v)) for k, v in self._db.data.get(self._collection, {}).items()]
+            update_times = {k: self._db.update_times.get((self._collection, k)) for k, _ in docs}
+        self._db.reads += len(docs)
+        docs = [
+            (k, v) for k, v in docs if all(ops[op](v.get(f), val) for f, op, val in self._filters)
+        ]
+        def value(doc_id, data, field):
+            return doc_id if field == "__name__" else data.get(field)
+
+        # Firestore ordena null antes que cualquier valor
+        def sort_key(value):
+            return (value is not None, value)
+
+        # Orden estable: se aplica del último criterio al primero
+        for field, direction in reversed(self._order):
+            docs.sort(
+                key=lambda kv: sort_key(value(kv[0], kv[1], field)),
+                reverse=direction == "DESCENDING",
+            )
+        if self._start_after is not None:
+            cursor = tuple(
+                (sort_key(self._start_after.get(f)), d == "DESCENDING") for f, d in self._order
+            )
+
+            def after_cursor(kv):
+                for (field, _), (cursor_value, descending) in zip(self._order, cursor):
+                    current = sort_key(value(kv[0], kv[1], field))
+                    if current != cursor_value:
+                        return current < cursor_value if descending else current > cursor_value
+                return False
+
+            docs = [kv for kv in docs if after_cursor(kv)]
+        if self._limit is not None:
+            docs = docs[: self._limit]
+        for doc_id, data in docs:
+            if self._fields is not None:
+                data = {f: data[f] for f in self._fields if f in data}
+            yield FakeSnapshot(doc_id, data, update_times[doc_id])
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeDocumentReference(self._db, self.name, doc_id)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        if len(self._ops) >= 500:
+            raise ValueError("Un batch de Firestore admite como máximo 500 operaciones")
+        self._ops.append((ref, data, merge))
+
+    def commit(self):
+        self._db._commit(self._ops)
+
+
+class InMemoryFirestore:
+    """Firestore falso: ``commit_latency`` en segundos y ``failure_rate`` de errores transitorios."""
+
+    def __init__(self, commit_latency=0.0, failure_rate=0.0, seed=None):
+        self.data = {}
+        self.update_times = {}  # (colección, doc_id) -> versión (entero creciente)
+        self._version = 0
+        self.lock = threading.RLock()
+        self.commit_latency = commit_latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.commits = 0
+        self.failed_commits = 0
+        self.writes = 0
+        self.reads = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def write_option(self, last_update_time):
+        """Precondición para update/delete, como ``Client.write_option``."""
+        return {"last_update_time": last_update_time}
+
+    def _commit(self, ops):
+        if self.commit_latency:
+            time.sleep(self.commit_latency)
+        with self.lock:
+            if self._random.random() < self.failure_rate:
+                self.failed_commits += 1
+                raise TransientError("Fallo transitorio simulado")
+        self._apply(ops)
+
+    def _apply(self, ops):
+        with self.lock:
+            self._apply_locked(ops)
+
+    def _apply_locked(self, ops):
+        for ref, data, merge in ops:
+            docs = self.data.setdefault(ref.collection_name, {})
+            if merge and ref.id in docs:
+                docs[ref.id].update(data)
+            else:
+                docs[ref.id] = dict(data)
+            self._version += 1
+            self.update_times[(ref.collection_name, ref.id)] = self._version
+        self.commits += 1
+        self.writes += len(ops)
+
+    def stats(self):
+        """Contadores de operaciones, para los reportes de benchmarks."""
+        with self.lock:
+            return {
+                "documents": sum(len(docs) for docs in self.data.values()),
+                "commits": self.commits,
+                "failed_commits": self.failed_commits,
+                "writes": self.writes,
+                "reads": self.reads,
+            }
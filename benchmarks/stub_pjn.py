@@ -0,0 +1,301 @@
+# benchmarks/stub_pjn.py
+#
+# Servidor local que imita el SSO de Keycloak y el portal de novedades del
+# PJN. Sirve respuestas grabadas (JSON) o sintéticas, para probar los motores
+# 'browser' y 'http' sin tocar los servidores reales.
+#
+# Uso:
+#   python benchmarks/stub_pjn.py --port 8089 --rows 50
+#   export PJN_SSO_REALM_URL=http://127.0.0.1:8089/auth/realms/pjn
+#   export PJN_REDIRECT_URI=http://127.0.0.1:8089/
+#   export PJN_NOVEDADES_API_URL=http://127.0.0.1:8089/api/novedades
+#   python scraping_backend.py --once --engine http
+
+import argparse
+import html
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+REALM_PATH = "/auth/realms/pjn"
+LOGIN_ACTION_PATH = f"{REALM_PATH}/login-actions/authenticate"
+# Filtro opcional del endpoint de novedades (YYYY-MM-DD, inclusive), como PJN_NOVEDADES_DESDE_PARAM
+DESDE_PARAM = "fechaDesde"
+
+
+def synthetic_items(count, seed=0):
+    """Genera novedades sintéticas con la forma del endpoint JSON."""
+    base = datetime(2024, 1, 1)
+    items = []
+    for i in range(count):
+        n = seed * 100000 + i
+        items.append(
+            {
+                "tipo": "d" if i % 3 else "n",
+                "fecha": (base + timedelta(days=n % 365)).strftime("%d/%m/%Y"),
+                "causa": f"CIV {10000 + n}/2024",
+                "caratula": f"PEREZ, JUAN C/ EMPRESA {n} S.A. S/ DAÑOS Y PERJUICIOS",
+                "link": f"/causa/{10000 + n}",
+            }
+        )
+    return items
+
+
+def render_portal_rows(items):
+    """HTML con la misma estructura MUI que usa el portal para cada fila."""
+    rows = []
+    for item in items:
+        rows.append(
+            '<tr class="MuiTableRow-root MuiBox-root css-1x9b6ks">'
+            f'<td class="MuiTableCell-root">{html.escape(item["tipo"])}</td>'
+            '<td class="MuiTableCell-root"><div class="MuiBox-root">'
+            '<p class="MuiTypography-root MuiTypography-body1 w-full css-11dlpbt">'
+            f'{html.escape(item["causa"])}</p>'
+            '<p class="MuiTypography-root MuiTypography-body1 w-full italic css-4icvzy">'
+            f'{html.escape(item["caratula"])}</p></div></td>'
+            f'<td class="MuiTableCell-root">{html.escape(item["fecha"])}</td>'
+            '<td class="MuiTableCell-root">'
+            f'<a aria-label="Ver Causa" href="{html.escape(item["link"])}">'
+            '<svg class="MuiSvgIcon-root"></svg></a></td>'
+            "</tr>"
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Portal PJN (stub)</title></head><body>"
+        '<div id="root"><table class="MuiTable-root"><tbody class="MuiTableBody-root">'
+        + "".join(rows)
+        + "</tbody></table></div></body></html>"
+    )
+
+
+LOGIN_FORM = """<!DOCTYPE html><html><head><title>Ingreso</title></head><body>
+<form id="kc-form-login" action="{action}" method="post">
+<input id="username" name="username" type="text">
+<input id="password" name="password" type="password">
+<input id="kc-login" name="login" type="submit" value="Ingresar">
+</form></body></html>"""
+
+
+class StubState:
+    """Estado del stub.
+
+    Con ``rows_per_dni`` cada DNI recibe sus propias novedades sintéticas;
+    si no, todos ven ``items``. ``portal_html`` reemplaza la página del
+    portal por un HTML grabado.
+    """
+
+    def __init__(self, items, latency, passwords=None, rows_per_dni=None, portal_html=None):
+        self.items = items
+        self.latency = latency
+        self.rows_per_dni = rows_per_dni
+        self.portal_html = portal_html
+        self._items_by_dni = {}
+        self.passwords = passwords or {}  # dni -> contraseña; vacío = acepta cualquiera
+        self.sso_sessions = {}  # cookie -> dni
+        self.codes = {}  # code -> dni
+        self.tokens = {}  # access_token -> dni
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.queries = {}  # ruta -> parámetros del último request
+        self.login_status = None  # Código con que falla el POST de login (p. ej. 503); None = normal
+
+    def items_for(self, dni):
+        if not self.rows_per_dni or not dni:
+            return self.items
+        with self.lock:
+            items = self._items_by_dni.get(dni)
+            if items is None:
+                seed = int(dni) % 10000 if str(dni).isdigit() else len(self._items_by_dni) + 1
+                items = self._items_by_dni[dni] = synthetic_items(self.rows_per_dni, seed)
+            return items
+
+    def count(self, key, query=None):
+        with self.lock:
+            self.hits[key] = self.hits.get(key, 0) + 1
+            self.queries[key] = query or {}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # Silencioso por defecto
+            pass
+
+        def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+            if isinstance(body, str):
+                body = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _sso_dni(self):
+            for part in self.headers.get("Cookie", "").split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == "KEYCLOAK_SESSION":
+                    return state.sso_sessions.get(value)
+            return None
+
+        def _portal_dni(self):
+            for part in self.headers.get("Cookie", "").split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == "PJN_STUB_DNI":
+                    return value
+            return None
+
+        def _redirect_with_code(self, dni, redirect_uri, query_state, cookies=()):
+            code = secrets.token_urlsafe(12)
+            with state.lock:
+                state.codes[code] = dni
+            fragment = urlencode({"state": query_state, "session_state": "stub", "code": code})
+            self.send_response(302)
+            self.send_header("Location", f"{redirect_uri}#{fragment}")
+            # El portal del stub comparte host con el SSO: esta cookie le dice
+            # qué DNI se logueó, para servirle sus propias novedades.
+            for cookie in (*cookies, f"PJN_STUB_DNI={dni}; Path=/"):
+                self.send_header("Set-Cookie", cookie)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            time.sleep(state.latency)
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            state.count(url.path, query)
+
+            if url.path == f"{REALM_PATH}/protocol/openid-connect/auth":
+                dni = self._sso_dni()
+                if dni:
+                    return self._redirect_with_code(dni, query["redirect_uri"], query.get("state", ""))
+                action = LOGIN_ACTION_PATH + "?" + urlencode(
+                    {"redirect_uri": query["redirect_uri"], "state": query.get("state", "")}
+                )
+                return self._send(200, LOGIN_FORM.format(action=html.escape(action)))
+
+            if url.path == "/api/novedades":
+                if self.headers.get("Authorization", "")[len("Bearer "):] not in state.tokens:
+                    return self._send(401, b"{}", "application/json")
+                items = state.items_for(state.tokens.get(self.headers["Authorization"][len("Bearer "):]))
+                if DESDE_PARAM in query:
+                    desde = datetime.strptime(query[DESDE_PARAM], "%Y-%m-%d")
+                    items = [item for item in items if datetime.strptime(item["fecha"], "%d/%m/%Y") >= desde]
+                page = int(query.get("page", 0))
+                size = int(query.get("size", 100))
+                chunk = items[page * size:(page + 1) * size]
+                payload = {
+                    "content": chunk,
+                    "number": page,
+                    "last": (page + 1) * size >= len(items),
+                }
+                return self._send(200, json.dumps(payload), "application/json")
+
+            if url.path == "/":
+                # Portal: el stub no ejecuta JS, así que las filas vienen en el HTML
+                if state.portal_html is not None:
+                    return self._send(200, state.portal_html)
+                return self._send(200, render_portal_rows(state.items_for(self._portal_dni())))
+
+            self._send(404, b"not found", "text/plain")
+
+        def do_POST(self):
+            time.sleep(state.latency)
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length", 0))
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+            state.count(url.path)
+
+            if url.path == LOGIN_ACTION_PATH:
+                if state.login_status is not None:
+                    return self._send(state.login_status, b"<html><body>Service Unavailable</body></html>")
+                dni = form.get("username", "")
+                expected = state.passwords.get(dni)
+                if expected is not None and form.get("password") != expected:
+                    return self._send(200, LOGIN_FORM.format(action=html.escape(self.path)))
+                cookie = secrets.token_urlsafe(16)
+                with state.lock:
+                    state.sso_sessions[cookie] = dni
+                return self._redirect_with_code(
+                    dni,
+                    query["redirect_uri"],
+                    query.get("state", ""),
+                    [f"KEYCLOAK_SESSION={cookie}; Path={REALM_PATH}"],
+                )
+
+            if url.path == f"{REALM_PATH}/protocol/openid-connect/token":
+                with state.lock:
+                    if form.get("grant_type") == "refresh_token":
+                        dni = state.tokens.get(form.get("refresh_token", "").removeprefix("r-"))
+                    else:
+                        dni = state.codes.pop(form.get("code", ""), None)
+                    if dni is None:
+                        return self._send(400, b'{"error": "invalid_grant"}', "application/json")
+                    access = secrets.token_urlsafe(16)
+                    state.tokens[access] = dni
+                body = {
+                    "access_token": access,
+                    "refresh_token": f"r-{access}",
+                    "expires_in": 300,
+                    "refresh_expires_in": 1800,
+                    "token_type": "Bearer",
+                }
+                return self._send(200, json.dumps(body), "application/json")
+
+            self._send(404, b"not found", "text/plain")
+
+    return Handler
+
+
+def start_stub_server(items, port=0, latency=0.0, passwords=None, rows_per_dni=None, portal_html=None):
+    """Levanta el stub en un hilo y devuelve ``(server, state)``."""
+    state = StubState(items, latency, passwords, rows_per_dni, portal_html)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local del SSO y portal del PJN")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rows", type=int, default=50, help="Cantidad de novedades sintéticas")
+    parser.add_argument("--rows-per-dni", action="store_true", help="Novedades distintas para cada DNI")
+    parser.add_argument("--fixture", help="Archivo JSON con novedades grabadas (lista de objetos)")
+    parser.add_argument("--portal-html", help="HTML grabado del portal de novedades (motor 'browser')")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia artificial por request")
+    args = parser.parse_args()
+
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as f:
+            items = json.load(f)
+    else:
+        items = synthetic_items(args.rows)
+
+    portal_html = None
+    if args.portal_html:
+        with open(args.portal_html, encoding="utf-8") as f:
+            portal_html = f.read()
+
+    server, _ = start_stub_server(
+        items,
+        args.port,
+        args.latency_ms / 1000,
+        rows_per_dni=args.rows if args.rows_per_dni else None,
+        portal_html=portal_html,
+    )
+    print(f"Stub PJN escuchando en http://127.0.0.1:{server.server_address[1]}/ ({len(items)} novedades)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
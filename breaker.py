@@ -0,0 +1,207 @@
+# breaker.py
+#
+# Capa de fallas del scraping: un circuit breaker global para el portal del
+# PJN y un backoff exponencial por DNI para las credenciales rechazadas.
+#
+# El breaker del portal se abre tras ``threshold`` fallas seguidas de red o
+# del navegador (timeouts, WebDriverException, conexión): mientras está
+# abierto no se lanzan navegadores y, al vencer la espera, un solo DNI sondea
+# el portal. Si el sondeo falla la espera se duplica (hasta ``max_cooldown``);
+# si anda, el breaker se cierra y el resto vuelve a scrapear. Solo lo cierran
+# los resultados que llegaron al portal (éxito o credenciales rechazadas);
+# las fallas ajenas al portal (FAILURE_OTHER) no cuentan para ningún lado.
+#
+# Las esperas se guardan en JSON para sobrevivir reinicios.
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Tipos de falla de un scraping (None = sin falla)
+FAILURE_PORTAL = "portal"  # Timeout, error de WebDriver o de red: el portal no responde
+FAILURE_CREDENTIALS = "credentials"  # El SSO rechazó usuario o contraseña
+# Cualquier otro error (DNI sin credenciales, HTML inesperado, bug, worker abortado...). No dice
+# nada del portal: no suma fallas seguidas ni cierra el breaker.
+FAILURE_OTHER = "other"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CredentialsRejected(Exception):
+    """El SSO del PJN rechazó el usuario o la contraseña."""
+
+
+class CircuitBreakers:
+    """Breaker global del portal y backoff de credenciales por DNI, persistidos en ``path``."""
+
+    def __init__(
+        self,
+        path=None,
+        threshold=3,
+        base_cooldown=60,
+        max_cooldown=1800,
+        credentials_backoff=900,
+        max_credentials_backoff=24 * 3600,
+    ):
+        if threshold < 1:
+            raise ValueError("threshold debe ser al menos 1")
+        self.path = path
+        self.threshold = threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.credentials_backoff = credentials_backoff
+        self.max_credentials_backoff = max_credentials_backoff
+        self._lock = threading.Lock()
+        self._portal = {"state": CLOSED, "failures": 0, "cooldown": base_cooldown, "open_until": None}
+        self._dnis = {}  # dni -> {"failures", "blocked_until", "error"}
+        self._probe = None  # DNI que está sondeando el portal (en HALF_OPEN)
+        self.skipped = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                self._portal.update(saved.get("portal", {}))
+                self._dnis = saved.get("dnis", {})
+            except (OSError, ValueError) as e:
+                logger.warning("No se pudo leer el estado de los breakers %s: %s", path, e)
+            if self._portal["state"] == HALF_OPEN:
+                self._portal["state"] = OPEN  # El sondeo quedó a medias: se repite
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"portal": self._portal, "dnis": self._dnis}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _until(value):
+        return datetime.fromisoformat(value) if value else None
+
+    ########################################
+    # Consultas
+    ########################################
+    def blocked_reason(self, dni):
+        """Motivo por el que no conviene scrapear el DNI ahora, o None (no reserva el sondeo)."""
+        now = datetime.now()
+        with self._lock:
+            entry = self._dnis.get(dni)
+            until = self._until(entry["blocked_until"]) if entry else None
+            if until and now < until:
+                return f"credenciales rechazadas {entry['failures']} vez/veces; se reintenta a las {until:%H:%M}"
+            if self._portal["state"] == HALF_OPEN and self._probe is not None:
+                return "portal del PJN en sondeo"
+            open_until = self._until(self._portal["open_until"])
+            if self._portal["state"] == OPEN and open_until and now < open_until:
+                return f"portal del PJN caído; se sondea a las {open_until:%H:%M:%S}"
+        return None
+
+    def acquire(self, dni):
+        """True si el DNI puede scrapearse; con el breaker vencido, el primero que llega es el sondeo."""
+        if self.blocked_reason(dni) is not None:
+            with self._lock:
+                self.skipped += 1
+            return False
+        with self._lock:
+            if self._portal["state"] == OPEN:
+                self._portal["state"] = HALF_OPEN
+                self._probe = dni
+                logger.info("Sondeando el portal del PJN con el DNI %s.", dni)
+            elif self._portal["state"] == HALF_OPEN:
+                if self._probe is not None:
+                    self.skipped += 1
+                    return False
+                self._probe = dni
+            return True
+
+    def state(self):
+        with self._lock:
+            return self._portal["state"]
+
+    def is_closed(self):
+        return self.state() == CLOSED
+
+    ########################################
+    # Resultados
+    ########################################
+    def record(self, dni, failure, error=""):
+        """Registra el resultado de un scraping (``failure`` es None o un FAILURE_*)."""
+        now = datetime.now()
+        with self._lock:
+            portal = self._portal
+            # Solo el resultado del DNI que sondea decide el estado de un breaker abierto: los
+            # scrapings que arrancaron antes de abrirlo pueden terminar en cualquier momento
+            probe = portal["state"] == HALF_OPEN and self._probe == dni
+            if probe:
+                self._probe = None
+
+            if failure == FAILURE_PORTAL:
+                portal["failures"] += 1
+                if probe:
+                    portal["cooldown"] = min(portal["cooldown"] * 2, self.max_cooldown)
+                    self._open_locked(now, "el sondeo falló")
+                elif portal["state"] == CLOSED and portal["failures"] >= self.threshold:
+                    portal["cooldown"] = self.base_cooldown
+                    self._open_locked(now, f"{portal['failures']} fallas seguidas")
+            elif failure is None or failure == FAILURE_CREDENTIALS:
+                # El portal respondió (aunque haya rechazado la cuenta)
+                if probe:
+                    logger.info("El portal del PJN volvió a responder; se reanuda el scraping.")
+                if probe or portal["state"] == CLOSED:
+                    portal.update(state=CLOSED, failures=0, cooldown=self.base_cooldown, open_until=None)
+
+            if failure == FAILURE_CREDENTIALS:
+                entry = self._dnis.setdefault(dni, {"failures": 0, "blocked_until": None, "error": ""})
+                entry["failures"] += 1
+                delay = min(self.credentials_backoff * 2 ** (entry["failures"] - 1), self.max_credentials_backoff)
+                entry["blocked_until"] = (now + timedelta(seconds=delay)).isoformat(timespec="seconds")
+                entry["error"] = error
+                logger.warning(
+                    "Credenciales rechazadas para el DNI %s (%d vez/veces); no se reintenta por %.0f minutos.",
+                    dni,
+                    entry["failures"],
+                    delay / 60,
+                )
+            elif failure is None and dni in self._dnis:
+                del self._dnis[dni]
+            self._save_locked()
+
+    def _open_locked(self, now, reason):
+        portal = self._portal
+        portal["state"] = OPEN
+        portal["open_until"] = (now + timedelta(seconds=portal["cooldown"])).isoformat(timespec="seconds")
+        logger.error(
+            "Breaker del portal abierto (%s): no se lanzan navegadores por %ds.", reason, portal["cooldown"]
+        )
+
+    def reset(self, dni=None):
+        """Olvida el backoff de un DNI (p. ej. tras corregir su contraseña) o, sin DNI, todo."""
+        with self._lock:
+            if dni is None:
+                self._dnis.clear()
+                self._portal.update(state=CLOSED, failures=0, cooldown=self.base_cooldown, open_until=None)
+            else:
+                self._dnis.pop(dni, None)
+            self._save_locked()
+
+    def snapshot(self):
+        with self._lock:
+            return {"portal": dict(self._portal), "dnis": {d: dict(e) for d, e in self._dnis.items()}}
+
+    def log_stats(self):
+        snap = self.snapshot()
+        blocked = [dni for dni, e in snap["dnis"].items() if e["blocked_until"]]
+        logger.info(
+            "Breakers: portal %s (%d fallas seguidas), %d DNIs con credenciales en espera, %d scrapings evitados.",
+            snap["portal"]["state"],
+            snap["portal"]["failures"],
+            len(blocked),
+            self.skipped,
+        )
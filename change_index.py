@@ -0,0 +1,113 @@
+# change_index.py
+#
+# Índice local (SQLite) con un hash del contenido de cada novedad ya guardada
+# en Firestore, indexado por el mismo doc_id que arma saveToFirestore. Permite
+# escribir solo las filas nuevas o modificadas.
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Campos que provienen del portal. ScrapedAt cambia en cada ciclo y los campos
+# de control (Aceptada, EscritoPresentado, Resumen) los edita la aplicación.
+CONTENT_FIELDS = ("Perito", "Tipo", "Causa", "Nombre", "Fecha", "Link")
+
+
+def _normalize_value(value):
+    if isinstance(value, datetime):
+        # Firestore devuelve datetimes con zona UTC; los del scraping son "naive"
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    return value
+
+
+def content_hash(document):
+    """Hash estable de los campos de contenido de un documento de novedad."""
+    payload = [_normalize_value(document.get(field)) for field in CONTENT_FIELDS]
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ChangeIndex:
+    """Índice ``doc_id -> hash`` persistido en SQLite y cacheado en memoria."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA mmap_size=67108864")  # Lecturas vía mmap (64 MB)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS novedades_hash (doc_id TEXT PRIMARY KEY, hash TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._hashes = dict(self._conn.execute("SELECT doc_id, hash FROM novedades_hash"))
+        self.written = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def contains(self, doc_id):
+        """True si el documento ya fue guardado alguna vez (no afecta las estadísticas)."""
+        with self._lock:
+            return doc_id in self._hashes
+
+    def has_changed(self, doc_id, digest):
+        """True si el documento no está en el índice o su contenido cambió."""
+        with self._lock:
+            changed = self._hashes.get(doc_id) != digest
+            if not changed:
+                self.skipped += 1
+            return changed
+
+    def record(self, items):
+        """Registra ``(doc_id, hash)`` de documentos ya confirmados en Firestore."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO novedades_hash (doc_id, hash) VALUES (?, ?)", items
+            )
+            self._conn.commit()
+            self._hashes.update(items)
+            self.written += len(items)
+
+    def warm_from_firestore(self, db, collection="novedades"):
+        """Carga en el índice los hashes de los documentos ya existentes en Firestore."""
+        count = 0
+        batch = []
+        for snapshot in db.collection(collection).select(list(CONTENT_FIELDS)).stream():
+            batch.append((snapshot.id, content_hash(snapshot.to_dict() or {})))
+            if len(batch) >= 1000:
+                self.record(batch)
+                count += len(batch)
+                batch = []
+        self.record(batch)
+        count += len(batch)
+        self.reset_stats()
+        logger.info("Índice de cambios precargado con %d documentos de Firestore.", count)
+        return count
+
+    def reset_stats(self):
+        with self._lock:
+            self.written = 0
+            self.skipped = 0
+
+    def log_stats(self):
+        logger.info(
+            "Detección de cambios: %d documentos escritos, %d sin cambios omitidos.",
+            self.written,
+            self.skipped,
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
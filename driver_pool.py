@@ -0,0 +1,326 @@
+# driver_pool.py
+
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+########################################
+# Medición de memoria del árbol de procesos de Chrome
+########################################
+def _children_map():
+    """Devuelve un dict ppid -> [pids] leyendo /proc (solo Linux)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read().decode(errors="replace")
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid):
+    """Suma la memoria residente (bytes) de un proceso y todos sus descendientes."""
+    if not pid:
+        return 0
+    try:
+        import psutil  # Opcional: más preciso y portable que /proc
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+            total = 0
+            for proc in procs:
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total
+        except psutil.Error:
+            return 0
+
+    if not os.path.isdir("/proc"):
+        return 0
+    children = _children_map()
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += _rss_bytes(current)
+        pending.extend(children.get(current, []))
+    return total
+
+
+def driver_rss(driver):
+    """RSS en bytes de chromedriver + Chrome asociado a un WebDriver."""
+    try:
+        pid = driver.service.process.pid
+    except AttributeError:
+        return 0
+    return process_tree_rss(pid)
+
+
+########################################
+# Sesiones del pool
+########################################
+class PoolExhausted(Exception):
+    """Todos los navegadores del pool siguen en uso después de ``acquire_timeout``."""
+
+
+class PooledSession:
+    """Un navegador vivo asociado a un DNI, con sus estadísticas de uso."""
+
+    def __init__(self, dni, driver, startup_seconds):
+        self.dni = dni
+        self.driver = driver
+        self.created_at = datetime.now()
+        self.last_used = time.monotonic()
+        self.uses = 0
+        self.logged_in = False
+        self.in_use = False
+        self.startup_seconds = startup_seconds
+
+
+class DriverPool:
+    """Mantiene un navegador "caliente" por DNI entre ciclos de scraping.
+
+    Cada sesión se reutiliza mientras siga sana; se recicla tras
+    ``max_uses`` usos o cuando el árbol de procesos de Chrome supera
+    ``max_rss_mb``. Como máximo se mantienen ``max_sessions`` navegadores
+    vivos: si hace falta uno nuevo se cierra el inactivo más antiguo y, si
+    todos están en uso, se espera hasta ``acquire_timeout`` segundos a que se
+    libere uno (después, PoolExhausted).
+    """
+
+    def __init__(self, driver_factory, max_sessions=None, max_uses=50, max_rss_mb=None, acquire_timeout=300):
+        self._driver_factory = driver_factory
+        self.max_sessions = max_sessions
+        self.max_uses = max_uses
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.acquire_timeout = acquire_timeout
+        self._sessions = OrderedDict()  # dni -> PooledSession (orden LRU)
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)  # Se libera o se cierra una sesión
+        self._starting = 0  # Navegadores arrancando (ya ocupan su lugar en max_sessions)
+        self._stats = {}  # dni -> dict de contadores acumulados
+
+    def _dni_stats(self, dni):
+        return self._stats.setdefault(
+            dni,
+            {
+                "starts": 0,
+                "reuses": 0,
+                "logins": 0,
+                "relogins": 0,
+                "recycles": 0,
+                "startup_seconds": 0.0,
+                "login_seconds": 0.0,
+                "rss_mb": 0.0,
+            },
+        )
+
+    def _quit(self, session, reason):
+        logger.info(
+            "Cerrando navegador del DNI %s (%s) tras %d usos.",
+            session.dni,
+            reason,
+            session.uses,
+        )
+        try:
+            session.driver.quit()
+        except Exception as e:
+            logger.warning("Error cerrando navegador del DNI %s: %s", session.dni, e)
+
+    def _evict_idle_locked(self):
+        """Cierra sesiones inactivas (LRU) hasta dejar lugar para una nueva."""
+        if not self.max_sessions:
+            return []
+        evicted = []
+        for dni in list(self._sessions):
+            if len(self._sessions) + self._starting < self.max_sessions:
+                break
+            session = self._sessions[dni]
+            if session.in_use:
+                continue
+            del self._sessions[dni]
+            evicted.append(session)
+        return evicted
+
+    def _is_alive(self, session):
+        try:
+            session.driver.current_url  # Falla si el navegador murió
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycle(self, session):
+        if self.max_uses and session.uses >= self.max_uses:
+            return f"alcanzó {self.max_uses} usos"
+        if self.max_rss_bytes:
+            rss = driver_rss(session.driver)
+            self._dni_stats(session.dni)["rss_mb"] = rss / (1024 * 1024)
+            if rss > self.max_rss_bytes:
+                return f"RSS {rss / (1024 * 1024):.0f} MB supera el límite"
+        return None
+
+    def _reserve_slot(self):
+        """Reserva el lugar de un navegador nuevo sin pasar de ``max_sessions``.
+
+        Desaloja sesiones inactivas y, si todas están en uso, espera a que se
+        libere alguna; lanza PoolExhausted si no pasa en ``acquire_timeout``.
+        """
+        deadline = None if self.acquire_timeout is None else time.monotonic() + self.acquire_timeout
+        evicted = []
+        exhausted = False
+        with self._available:
+            while True:
+                evicted += self._evict_idle_locked()
+                if not self.max_sessions or len(self._sessions) + self._starting < self.max_sessions:
+                    self._starting += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    exhausted = True
+                    break
+                self._available.wait(remaining)
+        for old in evicted:
+            self._quit(old, "desalojo LRU")
+        if exhausted:
+            raise PoolExhausted(
+                f"Los {self.max_sessions} navegadores del pool siguen en uso tras {self.acquire_timeout:.0f}s."
+            )
+
+    def acquire(self, dni):
+        """Devuelve la sesión del DNI, creando o reciclando el navegador si hace falta."""
+        with self._lock:
+            session = self._sessions.get(dni)
+            if session is not None:
+                session.in_use = True
+
+        if session is not None:
+            reason = self._needs_recycle(session)
+            if reason is None and not self._is_alive(session):
+                reason = "navegador no responde"
+            if reason:
+                self.discard(session, reason)
+                session = None
+            else:
+                with self._lock:
+                    self._dni_stats(dni)["reuses"] += 1
+                    self._sessions.move_to_end(dni)
+
+        if session is None:
+            self._reserve_slot()
+            start = time.monotonic()
+            try:
+                driver = self._driver_factory(dni)
+            except Exception:
+                with self._available:
+                    self._starting -= 1
+                    self._available.notify()
+                raise
+            elapsed = time.monotonic() - start
+            session = PooledSession(dni, driver, elapsed)
+            session.in_use = True
+            with self._lock:
+                stats = self._dni_stats(dni)
+                stats["starts"] += 1
+                stats["startup_seconds"] += elapsed
+                self._sessions[dni] = session
+                self._starting -= 1
+
+        session.uses += 1
+        session.last_used = time.monotonic()
+        return session
+
+    def record_login(self, session, seconds):
+        """Registra un login SSO completo realizado sobre la sesión."""
+        with self._lock:
+            stats = self._dni_stats(session.dni)
+            stats["logins"] += 1
+            if session.logged_in:
+                # La sesión ya había iniciado sesión antes: el token expiró
+                stats["relogins"] += 1
+            stats["login_seconds"] += seconds
+        session.logged_in = True
+
+    def release(self, session):
+        """Devuelve la sesión al pool para el próximo ciclo."""
+        rss_mb = driver_rss(session.driver) / (1024 * 1024)
+        with self._available:
+            session.in_use = False
+            session.last_used = time.monotonic()
+            self._dni_stats(session.dni)["rss_mb"] = rss_mb
+            self._available.notify()
+
+    def discard(self, session, reason="error"):
+        """Cierra el navegador de una sesión que quedó en estado dudoso."""
+        with self._available:
+            if self._sessions.get(session.dni) is session:
+                del self._sessions[session.dni]
+            self._dni_stats(session.dni)["recycles"] += 1
+            self._available.notify()
+        self._quit(session, reason)
+
+    def close_all(self):
+        with self._available:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._available.notify_all()
+        for session in sessions:
+            self._quit(session, "cierre del pool")
+
+    def stats(self):
+        """Estadísticas por DNI, incluyendo una estimación del tiempo ahorrado."""
+        with self._lock:
+            result = {}
+            for dni, s in self._stats.items():
+                avg_start = s["startup_seconds"] / s["starts"] if s["starts"] else 0.0
+                avg_login = s["login_seconds"] / s["logins"] if s["logins"] else 0.0
+                skipped_logins = s["starts"] + s["reuses"] - s["logins"]
+                result[dni] = dict(
+                    s,
+                    alive=dni in self._sessions,
+                    saved_seconds=s["reuses"] * avg_start + max(skipped_logins, 0) * avg_login,
+                )
+            return result
+
+    def log_stats(self):
+        for dni, s in sorted(self.stats().items()):
+            logger.info(
+                "Pool DNI %s: arranques=%d reusos=%d logins=%d relogins=%d "
+                "reciclajes=%d RSS=%.0f MB ahorro estimado=%.1fs",
+                dni,
+                s["starts"],
+                s["reuses"],
+                s["logins"],
+                s["relogins"],
+                s["recycles"],
+                s["rss_mb"],
+                s["saved_seconds"],
+            )
@@ -0,0 +1,87 @@
+# extractor.py
+#
+# Extracción de las filas de novedades directamente con lxml y XPath
+# precompilados, sin construir el árbol completo de BeautifulSoup. Produce
+# los mismos valores crudos que el recorrido original con
+# BeautifulSoup(html, "lxml").select("tr.MuiBox-root").
+
+import lxml.html
+from lxml import etree
+
+
+def _has_classes(*classes):
+    """Predicado XPath equivalente a un selector CSS ``.a.b.c``."""
+    return " and ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')" for cls in classes
+    )
+
+
+# Filas de la tabla: tr.MuiBox-root
+ROWS_XPATH = etree.XPath(f"//tr[{_has_classes('MuiBox-root')}]")
+CELLS_XPATH = etree.XPath(".//td")
+# p.MuiTypography-root.MuiTypography-body1.w-full.css-11dlpbt
+CAUSA_XPATH = etree.XPath(
+    f"(.//p[{_has_classes('MuiTypography-root', 'MuiTypography-body1', 'w-full', 'css-11dlpbt')}])[1]"
+)
+# p.MuiTypography-root.MuiTypography-body1.w-full.italic.css-4icvzy
+NOMBRE_XPATH = etree.XPath(
+    f"(.//p[{_has_classes('MuiTypography-root', 'MuiTypography-body1', 'w-full', 'italic', 'css-4icvzy')}])[1]"
+)
+# a[aria-label='Ver Causa']
+LINK_XPATH = etree.XPath("(.//a[@aria-label='Ver Causa'])[1]")
+# Nodos de texto visibles (sin comentarios), como get_text() de BeautifulSoup
+TEXT_XPATH = etree.XPath(".//text()")
+
+
+class RowFormatError(ValueError):
+    """La fila no tiene la estructura esperada; el mensaje describe qué falta."""
+
+
+def parse_html(html_code):
+    """Parsea el HTML de la página (o solo de la tabla) con lxml."""
+    try:
+        return lxml.html.fromstring(html_code)
+    except ValueError:
+        # lxml rechaza str con declaración de encoding: se parsean los bytes
+        return lxml.html.fromstring(html_code.encode("utf-8"))
+
+
+def find_rows(html_code):
+    """Devuelve los elementos ``tr.MuiBox-root`` del HTML."""
+    return ROWS_XPATH(parse_html(html_code))
+
+
+def row_text(element_tr):
+    """Texto de la fila para los logs, como ``get_text(strip=True, separator=" | ")``."""
+    return " | ".join(t.strip() for t in TEXT_XPATH(element_tr) if t.strip())
+
+
+def extract_row(element_tr):
+    """Extrae ``(tipo, fecha, causa, nombre, link)`` crudos de una fila.
+
+    Lanza RowFormatError si faltan celdas o los párrafos de causa/nombre.
+    """
+    td_tags = CELLS_XPATH(element_tr)  # Buscar 'td' dentro de cada 'tr'
+    if len(td_tags) < 3:  # Verificar que haya suficientes celdas
+        raise RowFormatError("Fila con estructura inesperada")
+
+    tipo_raw = td_tags[0].text_content().strip()
+    # La fecha parece estar en td_tags[2] según el código original
+    fecha_str = td_tags[2].text_content().strip()
+
+    causa_elem = CAUSA_XPATH(element_tr)
+    nombre_elem = NOMBRE_XPATH(element_tr)
+    if not causa_elem or not nombre_elem:
+        raise RowFormatError("No se encontró 'Causa' o 'Nombre' en una fila")
+
+    # Extraer link (aria-label='Ver Causa')
+    link_elem = LINK_XPATH(element_tr)
+    link_raw = link_elem[0].get("href", "") if link_elem else ""
+
+    return (
+        tipo_raw,
+        fecha_str,
+        causa_elem[0].text_content().strip(),
+        nombre_elem[0].text_content().strip(),
+        link_raw,
+    )
@@ -3,53 +3,119 @@ const API_BASE =
   window.API_BASE ||
   ""; // defaults to relative URLs
 
-async function fetchData() {
-  const msg = document.getElementById("message");
-  try {
-    const response = await fetch(`${API_BASE}/data`);
-    if (!response.ok) throw new Error("Network response was not ok");
-    const data = await response.json();
-    const tbody = document.getElementById("data-body");
-    tbody.innerHTML = "";
-    data.forEach((row) => {
-      const tr = document.createElement("tr");
+const PAGE_SIZE = 50;
+let nextCursor = null;
 
-      const tdFecha = document.createElement("td");
-      tdFecha.className = "py-2 px-4 border-b";
-      tdFecha.textContent = row.Fecha || "";
-      tr.appendChild(tdFecha);
+function formatFecha(value) {
+  // La API devuelve fechas ISO (AAAA-MM-DDTHH:MM:SS); se muestran como DD/MM/AAAA
+  if (!value) return "";
+  const [year, month, day] = value.slice(0, 10).split("-");
+  return day && month && year ? `${day}/${month}/${year}` : value;
+}
 
-      const tdCausa = document.createElement("td");
-      tdCausa.className = "py-2 px-4 border-b";
-      tdCausa.textContent = row.Causa || "";
-      tr.appendChild(tdCausa);
+function currentFilters() {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  for (const name of ["perito", "tipo", "desde", "hasta"]) {
+    const value = document.getElementById(`filter-${name}`).value.trim();
+    if (value) params.set(name, value);
+  }
+  return params;
+}
 
-      const tdLink = document.createElement("td");
-      tdLink.className = "py-2 px-4 border-b";
-      const link = document.createElement("a");
-      link.className = "text-blue-500 underline";
-      link.textContent = "Ver";
-      link.setAttribute("href", row.Link || "#");
-      link.setAttribute("target", "_blank");
-      tdLink.appendChild(link);
-      tr.appendChild(tdLink);
+function appendRow(tbody, row) {
+  const tr = document.createElement("tr");
 
-      tbody.appendChild(tr);
-    });
+  const tdFecha = document.createElement("td");
+  tdFecha.className = "py-2 px-4 border-b";
+  tdFecha.textContent = formatFecha(row.Fecha);
+  tr.appendChild(tdFecha);
+
+  const tdCausa = document.createElement("td");
+  tdCausa.className = "py-2 px-4 border-b";
+  tdCausa.textContent = row.Causa || "";
+  tr.appendChild(tdCausa);
+
+  const tdLink = document.createElement("td");
+  tdLink.className = "py-2 px-4 border-b";
+  const link = document.createElement("a");
+  link.className = "text-blue-500 underline";
+  link.textContent = "Ver";
+  link.setAttribute("href", row.Link || "#");
+  link.setAttribute("target", "_blank");
+  tdLink.appendChild(link);
+  tr.appendChild(tdLink);
+
+  tbody.appendChild(tr);
+}
+
+// Trae una página de /data. Sin `append` reemplaza la tabla (primera página
+// con los filtros actuales); con `append` agrega la página siguiente.
+async function fetchData(append = false) {
+  const msg = document.getElementById("message");
+  const loadMore = document.getElementById("load-more");
+  try {
+    const params = currentFilters();
+    if (append && nextCursor) params.set("cursor", nextCursor);
+    // El navegador revalida con If-None-Match: si nada cambió, la API responde 304
+    const response = await fetch(`${API_BASE}/data?${params}`, { cache: "no-cache" });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.error || "Network response was not ok");
+    }
+    const data = await response.json();
+    const tbody = document.getElementById("data-body");
+    if (!append) tbody.innerHTML = "";
+    data.items.forEach((row) => appendRow(tbody, row));
+    nextCursor = data.next_cursor;
+    loadMore.classList.toggle("hidden", !nextCursor);
     msg.textContent = "";
   } catch (error) {
-    msg.textContent = "Error obteniendo datos.";
+    msg.textContent = `Error obteniendo datos. ${error.message}`;
   }
 }
 
+// Sigue el progreso de un trabajo de scraping por SSE y recarga la tabla al terminar
+function followScrapeJob(jobId) {
+  const msg = document.getElementById("message");
+  const events = new EventSource(`${API_BASE}/scrape/${jobId}/events`);
+  events.addEventListener("progress", (event) => {
+    const data = JSON.parse(event.data);
+    msg.textContent = `Scraping en curso: ${data.done}/${data.total} usuarios (DNI ${data.dni}: ${data.status}).`;
+  });
+  events.addEventListener("finished", (event) => {
+    const data = JSON.parse(event.data);
+    events.close();
+    if (data.status === "done") {
+      msg.textContent = `Scraping terminado: ${data.result.rows} filas, ${data.result.saved} guardadas.`;
+      fetchData();
+    } else {
+      msg.textContent = `El scraping falló: ${data.error}`;
+    }
+  });
+  events.onerror = () => {
+    // EventSource reintenta solo; si el servidor cerró definitivamente, se informa
+    if (events.readyState === EventSource.CLOSED) {
+      msg.textContent = "Se perdió la conexión con el progreso del scraping.";
+    }
+  };
+}
+
 async function runScraping() {
   const msg = document.getElementById("message");
+  const dni = document.getElementById("scrape-dni").value.trim();
   msg.textContent = "Ejecutando scraping...";
   try {
-    const response = await fetch(`${API_BASE}/scrape`, { method: "POST" });
+    const response = await fetch(`${API_BASE}/scrape`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(dni ? { dni } : {}),
+    });
     if (response.ok) {
-      msg.textContent = "Scraping iniciado correctamente.";
-      await fetchData();
+      const job = await response.json();
+      msg.textContent = job.merged
+        ? "Ya había un scraping en curso; se sigue su progreso."
+        : "Scraping iniciado correctamente.";
+      followScrapeJob(job.job_id);
     } else {
       msg.textContent = "Error al iniciar scraping.";
     }
@@ -59,7 +125,12 @@ async function runScraping() {
 }
 
 document.getElementById("run-scraping").addEventListener("click", runScraping);
-document.getElementById("refresh-data").addEventListener("click", fetchData);
+document.getElementById("refresh-data").addEventListener("click", () => fetchData());
+document.getElementById("load-more").addEventListener("click", () => fetchData(true));
+document.getElementById("filters").addEventListener("submit", (event) => {
+  event.preventDefault();
+  fetchData();
+});
 
 // Initial load
 fetchData();
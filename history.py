@@ -0,0 +1,345 @@
+# history.py
+#
+# Historial columnar de novedades para análisis local. Cada ciclo agrega sus
+# filas nuevas a archivos Arrow IPC particionados por mes de la novedad y
+# perito (por día quedarían miles de archivos diminutos en un año):
+#
+#   <raíz>/mes=2024-05/perito=Juan%20P%C3%A9rez/part-<ns>-<id>.arrow
+#
+# Perito, Tipo y Causa se guardan con codificación de diccionario (se repiten
+# mucho), y un manifiesto SQLite con los doc_id ya exportados hace que cada
+# exportación agregue solo lo que falta. Las consultas abren los archivos con
+# mmap (sin copiar) y descartan particiones enteras por mes y perito, así un
+# reporte sobre un año de historial no lee Firestore.
+#
+# Requiere pyarrow (opcional: pip install pyarrow).
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, unquote
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_exported.sqlite3"  # Los nombres con "_" no se leen como datos
+UNKNOWN_DATE = "unknown"
+FILE_SUFFIX = ".arrow"
+DICTIONARY_FIELDS = ("Perito", "Tipo", "Causa")
+FIELDS = ("doc_id", "Perito", "Tipo", "Causa", "Nombre", "Fecha", "Link", "ScrapedAt")
+PARTITION_FIELDS = ("mes", "perito")
+
+
+def _pyarrow():
+    """Importa pyarrow al primer uso (es opcional)."""
+    try:
+        import pyarrow
+        import pyarrow.compute  # noqa: F401
+    except ImportError:
+        raise RuntimeError("El historial de novedades requiere pyarrow (pip install pyarrow).") from None
+    return pyarrow
+
+
+def file_schema(pa):
+    """Esquema de cada archivo (las columnas de partición van en la ruta)."""
+    text_dict = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("doc_id", pa.string()),
+            ("Perito", text_dict),
+            ("Tipo", text_dict),
+            ("Causa", text_dict),
+            ("Nombre", pa.string()),
+            ("Fecha", pa.timestamp("us")),
+            ("Link", pa.string()),
+            ("ScrapedAt", pa.timestamp("us")),
+        ]
+    )
+
+
+def _naive_utc(value):
+    # Firestore devuelve datetimes con zona UTC; los del scraping son "naive"
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value if isinstance(value, datetime) else None
+
+
+def partition_of(row):
+    """``(mes "AAAA-MM" o "unknown", perito)`` de una fila."""
+    fecha = _naive_utc(row.get("Fecha"))
+    return (fecha.strftime("%Y-%m") if fecha else UNKNOWN_DATE, row.get("Perito") or "unknown_perito")
+
+
+class HistoryExporter:
+    """Agrega filas al historial en ``root``; ``key_fn(fila)`` da el doc_id (el mismo de Firestore).
+
+    Una partición con más de ``max_files`` archivos se compacta en uno solo.
+    """
+
+    def __init__(self, root, key_fn, max_files=16):
+        self._pa = _pyarrow()
+        self.root = root
+        self._key_fn = key_fn
+        self.max_files = max_files
+        self._schema = file_schema(self._pa)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, MANIFEST_NAME), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS exported (doc_id TEXT PRIMARY KEY, exported_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, rows INTEGER NOT NULL)")
+        self._conn.commit()
+        self._exported = {doc_id for (doc_id,) in self._conn.execute("SELECT doc_id FROM exported")}
+        self.rows_exported = 0
+        self.files_written = 0
+        self._recover()
+
+    def __len__(self):
+        return len(self._exported)
+
+    def _recover(self):
+        """Borra los archivos que no llegaron al manifiesto (exportación o compactación cortada).
+
+        Sus filas no figuran como exportadas, así que se vuelven a exportar en
+        el próximo ciclo; nunca quedan filas repetidas en las consultas.
+        """
+        known = {path for (path,) in self._conn.execute("SELECT path FROM files")}
+        removed = 0
+        for dirpath, _dirs, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                orphan = name.endswith(FILE_SUFFIX) and self._relative(path) not in known
+                if orphan or (name.startswith(".") and name.endswith(".tmp")):
+                    os.remove(path)
+                    removed += 1
+        if removed:
+            logger.warning("Historial %s: %d archivos incompletos descartados.", self.root, removed)
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _partition_dir(self, partition):
+        mes, perito = partition
+        return os.path.join(self.root, f"mes={mes}", f"perito={quote(perito, safe='')}")
+
+    def _table(self, rows, doc_ids):
+        pa = self._pa
+        arrays = [pa.array(doc_ids, pa.string())]
+        for field in list(self._schema)[1:]:
+            if field.name in DICTIONARY_FIELDS:
+                arrays.append(pa.array([row.get(field.name) for row in rows], pa.string()).dictionary_encode())
+            elif pa.types.is_timestamp(field.type):
+                arrays.append(pa.array([_naive_utc(row.get(field.name)) for row in rows], field.type))
+            else:
+                arrays.append(pa.array([row.get(field.name) for row in rows], field.type))
+        return pa.Table.from_arrays(arrays, schema=self._schema)
+
+    def _write_file(self, directory, table):
+        """Escribe la tabla en un archivo nuevo y devuelve ``(ruta relativa, filas)``."""
+        pa = self._pa
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}{FILE_SUFFIX}"
+        tmp = os.path.join(directory, f".{name}.tmp")  # Oculto para las consultas hasta el rename
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        path = os.path.join(directory, name)
+        os.replace(tmp, path)
+        self.files_written += 1
+        return self._relative(path), table.num_rows
+
+    def export(self, rows, doc_ids=None):
+        """Agrega las filas que todavía no están en el historial; devuelve cuántas agregó."""
+        rows = list(rows)
+        if doc_ids is None:
+            doc_ids = []
+            for row in rows:
+                try:
+                    doc_ids.append(self._key_fn(row))
+                except Exception as e:
+                    logger.error("Fila descartada del historial: %s. Error: %s", row, e)
+                    doc_ids.append(None)
+        with self._lock:
+            partitions = {}  # (mes, perito) -> ([filas], [doc_ids])
+            seen = set()
+            for row, doc_id in zip(rows, doc_ids):
+                if doc_id is None or doc_id in self._exported or doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                bucket = partitions.setdefault(partition_of(row), ([], []))
+                bucket[0].append(row)
+                bucket[1].append(doc_id)
+            if not partitions:
+                return 0
+
+            files = [
+                self._write_file(self._partition_dir(partition), self._table(part_rows, part_ids))
+                for partition, (part_rows, part_ids) in partitions.items()
+            ]
+            # Archivos y doc_ids entran al manifiesto en la misma transacción
+            exported_at = time.time()
+            with self._conn:
+                self._conn.executemany("INSERT INTO files (path, rows) VALUES (?, ?)", files)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO exported (doc_id, exported_at) VALUES (?, ?)",
+                    ((doc_id, exported_at) for doc_id in seen),
+                )
+            self._exported.update(seen)
+            self.rows_exported += len(seen)
+            for partition in partitions:
+                directory = self._partition_dir(partition)
+                if len(self._data_files(directory)) > self.max_files:
+                    self._compact_dir(directory)
+            return len(seen)
+
+    ########################################
+    # Compactación
+    ########################################
+    @staticmethod
+    def _data_files(directory):
+        return sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.endswith(FILE_SUFFIX) and not name.startswith(".")
+        )
+
+    def _compact_dir(self, directory):
+        pa = self._pa
+        files = self._data_files(directory)
+        if len(files) < 2:
+            return 0
+        tables = []
+        for path in files:
+            with pa.memory_map(path) as source:
+                tables.append(pa.ipc.open_file(source).read_all())
+        # Un archivo IPC admite un solo diccionario por columna: se unifican antes de escribir
+        merged = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+        written = self._write_file(directory, merged)
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(self._relative(p),) for p in files])
+            self._conn.execute("INSERT INTO files (path, rows) VALUES (?, ?)", written)
+        for path in files:
+            os.remove(path)
+        return len(files)
+
+    def compact(self, min_files=2):
+        """Junta los archivos de cada partición con al menos ``min_files``; devuelve cuántos reemplazó."""
+        replaced = 0
+        with self._lock:
+            for dirpath, _dirs, _files in os.walk(self.root):
+                if os.path.basename(dirpath).startswith("perito=") and len(self._data_files(dirpath)) >= min_files:
+                    replaced += self._compact_dir(dirpath)
+        return replaced
+
+    ########################################
+    # Carga inicial
+    ########################################
+    def backfill_from_firestore(self, db, collection="novedades", chunk_size=5000):
+        """Exporta los documentos de Firestore que no están en el historial (una sola lectura)."""
+        count = 0
+        rows, doc_ids = [], []
+        for snapshot in db.collection(collection).select(list(FIELDS[1:])).stream():
+            if snapshot.id in self._exported:
+                continue
+            rows.append(snapshot.to_dict() or {})
+            doc_ids.append(snapshot.id)
+            if len(rows) >= chunk_size:
+                count += self.export(rows, doc_ids)
+                rows, doc_ids = [], []
+        count += self.export(rows, doc_ids)
+        self.compact()
+        logger.info("Historial %s: %d novedades exportadas desde Firestore.", self.root, count)
+        return count
+
+    def log_stats(self):
+        logger.info(
+            "Historial de novedades: %d filas exportadas en %d archivos (%d en total).",
+            self.rows_exported,
+            self.files_written,
+            len(self),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class HistoryReader:
+    """Consultas sobre el historial en ``root`` con archivos abiertos vía mmap.
+
+    ``query()`` devuelve una ``pyarrow.Table``; los filtros de fecha y perito
+    descartan los meses y peritos que no corresponden sin abrir sus archivos.
+    """
+
+    def __init__(self, root):
+        self._pa = _pyarrow()
+        self.root = root
+        self._schema = file_schema(self._pa)
+
+    @staticmethod
+    def _subdirs(path, key):
+        """``[(valor, ruta)]`` de las particiones ``key=valor`` dentro de ``path``."""
+        prefix = f"{key}="
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return []
+        return [(unquote(e.name[len(prefix):]), e.path) for e in entries if e.is_dir() and e.name.startswith(prefix)]
+
+    def files(self, desde=None, hasta=None, perito=None):
+        """Archivos de las particiones que pueden tener filas del rango y perito pedidos."""
+        paths = []
+        for mes, mes_dir in sorted(self._subdirs(self.root, PARTITION_FIELDS[0])):
+            if (desde or hasta) and mes == UNKNOWN_DATE:
+                continue
+            if (desde and mes < f"{desde:%Y-%m}") or (hasta and mes > f"{hasta:%Y-%m}"):
+                continue
+            for name, perito_dir in sorted(self._subdirs(mes_dir, PARTITION_FIELDS[1])):
+                if perito is None or name == perito:
+                    paths.extend(HistoryExporter._data_files(perito_dir))
+        return paths
+
+    def _filter(self, desde=None, hasta=None, tipo=None):
+        field = self._pa.compute.field
+        conditions = []
+        if desde:
+            conditions.append(field("Fecha") >= datetime(desde.year, desde.month, desde.day))
+        if hasta:
+            # 'hasta' es inclusivo, como en read_api
+            conditions.append(field("Fecha") < datetime(hasta.year, hasta.month, hasta.day) + timedelta(days=1))
+        if tipo:
+            conditions.append(field("Tipo") == tipo)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def query(self, desde=None, hasta=None, perito=None, tipo=None, columns=None):
+        """Novedades del historial (``desde``/``hasta`` son fechas, ambas inclusive)."""
+        pa = self._pa
+        wanted = list(columns) if columns is not None else list(self._schema.names)
+        needed = list(wanted)
+        for name in ("Fecha",) * bool(desde or hasta) + ("Tipo",) * bool(tipo):
+            if name not in needed:
+                needed.append(name)
+        tables = []
+        for path in self.files(desde, hasta, perito):
+            # Sin copias: las columnas apuntan a las páginas del archivo mapeado
+            with pa.memory_map(path) as source:
+                tables.append(pa.ipc.open_file(source).read_all().select(needed))
+        if not tables:
+            return self._schema.empty_table().select(wanted)
+        table = pa.concat_tables(tables)
+        expression = self._filter(desde, hasta, tipo)
+        if expression is not None:
+            table = table.filter(expression)
+        return table.select(wanted)
+
+    def count_by(self, *fields, **filters):
+        """Cantidad de novedades agrupadas por ``fields`` (p. ej. ``"Perito", "Tipo"``)."""
+        table = self.query(columns=list(fields), **filters)
+        # Cada archivo tiene su propio diccionario: se unifican para agrupar por índice
+        table = table.unify_dictionaries().combine_chunks()
+        return table.group_by(list(fields)).aggregate([([], "count_all")]).rename_columns(list(fields) + ["count"])
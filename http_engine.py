@@ -0,0 +1,369 @@
+# http_engine.py
+#
+# Motor de scraping "solo HTTP": obtiene los tokens de Keycloak (con el flujo
+# OIDC directo o a partir de las cookies de un navegador ya logueado) y luego
+# consulta el endpoint JSON que alimenta la tabla de novedades del portal,
+# sin renderizar la página en Chrome.
+
+import base64
+import hashlib
+import html
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from breaker import CredentialsRejected
+from watermark import NEW, STOP, DeltaScan
+
+logger = logging.getLogger(__name__)
+
+
+########################################
+# Configuración (variables de entorno)
+########################################
+PJN_SSO_REALM_URL = os.getenv("PJN_SSO_REALM_URL", "https://sso.pjn.gov.ar/auth/realms/pjn")
+PJN_CLIENT_ID = os.getenv("PJN_CLIENT_ID", "pjn-portal")
+PJN_REDIRECT_URI = os.getenv("PJN_REDIRECT_URI", "https://portalpjn.pjn.gov.ar/")
+# Endpoint JSON que consume la tabla de novedades del portal. Se obtiene de la
+# pestaña Network de DevTools; no tiene valor por defecto a propósito y sin él
+# HttpScraper no se crea (el motor 'http' falla al arrancar, no en cada DNI).
+PJN_NOVEDADES_API_URL = os.getenv("PJN_NOVEDADES_API_URL", "")
+PJN_NOVEDADES_PAGE_SIZE = int(os.getenv("PJN_NOVEDADES_PAGE_SIZE", "100"))
+HTTP_TIMEOUT = float(os.getenv("PJN_HTTP_TIMEOUT", "20"))
+# Filtro por fecha del endpoint, si lo tiene (p. ej. "fechaDesde"): con una
+# marca de agua solo se piden las novedades desde el día de la marca.
+PJN_NOVEDADES_DESDE_PARAM = os.getenv("PJN_NOVEDADES_DESDE_PARAM", "")
+PJN_NOVEDADES_DESDE_FORMAT = os.getenv("PJN_NOVEDADES_DESDE_FORMAT", "%Y-%m-%d")
+
+# Claves candidatas del payload para cada campo de la fila (se usa la primera
+# que exista). Admiten rutas con puntos para objetos anidados.
+FIELD_CANDIDATES = {
+    "tipo": ("tipo", "tipoNovedad", "type"),
+    "fecha": ("fecha", "fechaNovedad", "fechaAlta", "date"),
+    "causa": ("causa", "expediente.clave", "expediente", "numeroExpediente"),
+    "nombre": ("caratula", "nombre", "expediente.caratula", "descripcion"),
+    "link": ("link", "url", "href"),
+}
+
+_FORM_ACTION_RE = re.compile(
+    r'<form[^>]*id="kc-form-login"[^>]*action="([^"]+)"', re.IGNORECASE | re.DOTALL
+)
+# Mensaje de error de Keycloak al rechazar las credenciales (temas nuevos y viejos)
+_LOGIN_ERROR_RE = re.compile(r'id="input-error"|class="[^"]*kc-feedback-text', re.IGNORECASE)
+
+
+class HttpEngineError(Exception):
+    """Error del motor HTTP (login rechazado, endpoint mal configurado, etc.)."""
+
+
+class LoginRejected(HttpEngineError, CredentialsRejected):
+    """Keycloak rechazó el usuario o la contraseña."""
+
+
+class PortalUnavailable(HttpEngineError):
+    """El SSO o el portal respondió con un error del servidor (5xx) o pidió bajar el ritmo (429)."""
+
+
+# Errores de red: el portal o el SSO no responden (cuentan para el breaker del portal)
+NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError, PortalUnavailable)
+
+
+########################################
+# Funciones auxiliares
+########################################
+def _pkce_pair():
+    verifier = secrets.token_urlsafe(48)
+    challenge = base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest())
+    return verifier, challenge.decode().rstrip("=")
+
+
+def _raise_if_unavailable(resp, what):
+    """PortalUnavailable si la respuesta es un 5xx o un 429: el problema es del servidor, no de la cuenta."""
+    if resp.status_code >= 500 or resp.status_code == 429:
+        raise PortalUnavailable(f"{what}: el servidor respondió {resp.status_code}.")
+
+
+def _new_http_session():
+    """Sesión requests con pool de conexiones y reintentos para errores transitorios."""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _lookup(item, path):
+    value = item
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _pick(item, field):
+    for path in FIELD_CANDIDATES[field]:
+        value = _lookup(item, path)
+        if value is not None and not isinstance(value, dict):
+            return value
+    return None
+
+
+def _fecha_to_str(value):
+    """Lleva la fecha del payload al formato DD/MM/YYYY que muestra el portal."""
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):  # epoch en milisegundos
+        return datetime.fromtimestamp(value / 1000).strftime("%d/%m/%Y")
+    value = str(value).strip()
+    if re.match(r"^\d{4}-\d{2}-\d{2}", value):  # ISO 8601
+        return datetime.strptime(value[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
+    return value
+
+
+def _items_from_payload(payload):
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in ("content", "items", "data", "results", "novedades"):
+            if isinstance(payload.get(key), list):
+                return payload[key]
+    raise HttpEngineError(f"Formato de respuesta inesperado: {type(payload).__name__}")
+
+
+def _is_last_page(payload, items):
+    if not isinstance(payload, dict):
+        return True
+    if "last" in payload:  # Paginación estilo Spring
+        return bool(payload["last"])
+    if "totalPages" in payload and "number" in payload:
+        return payload["number"] + 1 >= payload["totalPages"]
+    return len(items) < PJN_NOVEDADES_PAGE_SIZE
+
+
+########################################
+# Tokens de Keycloak
+########################################
+class _Tokens:
+    def __init__(self, payload):
+        now = time.monotonic()
+        self.access_token = payload["access_token"]
+        self.refresh_token = payload.get("refresh_token")
+        # Margen de 30 s para no usar un token a punto de vencer
+        self.expires_at = now + payload.get("expires_in", 300) - 30
+        self.refresh_expires_at = now + payload.get("refresh_expires_in", 1800) - 30
+
+    def valid(self):
+        return time.monotonic() < self.expires_at
+
+    def refreshable(self):
+        return self.refresh_token and time.monotonic() < self.refresh_expires_at
+
+
+class HttpScraper:
+    """Scraper de novedades por HTTP, con una sesión requests por DNI.
+
+    ``usuarios`` es el dict ``dni -> {"contrasena", "nombre"}`` y
+    ``build_rows`` la función que arma las filas de una consulta (la misma
+    del motor con navegador). Si se pasa ``browser_cookies``, el login se hace en un
+    navegador y sus cookies SSO se reutilizan para obtener los tokens.
+    """
+
+    def __init__(self, usuarios, build_rows, browser_cookies=None):
+        if not PJN_NOVEDADES_API_URL:
+            raise HttpEngineError(
+                "Definí PJN_NOVEDADES_API_URL con el endpoint JSON de novedades del portal."
+            )
+        self._usuarios = usuarios
+        self._build_rows = build_rows
+        self._browser_cookies = browser_cookies
+        self._sessions = {}  # dni -> requests.Session
+        self._tokens = {}  # dni -> _Tokens
+        self._lock = threading.Lock()
+        self._auth_url = f"{PJN_SSO_REALM_URL}/protocol/openid-connect/auth"
+        self._token_url = f"{PJN_SSO_REALM_URL}/protocol/openid-connect/token"
+
+    def _session(self, dni):
+        with self._lock:
+            if dni not in self._sessions:
+                self._sessions[dni] = _new_http_session()
+            return self._sessions[dni]
+
+    def _authorization_code(self, session, dni, challenge):
+        """Recorre el flujo de autorización hasta obtener el ``code`` OIDC."""
+        params = {
+            "client_id": PJN_CLIENT_ID,
+            "redirect_uri": PJN_REDIRECT_URI,
+            "response_mode": "fragment",
+            "response_type": "code",
+            "scope": "openid",
+            "state": secrets.token_urlsafe(16),
+            "nonce": secrets.token_urlsafe(16),
+            "code_challenge": challenge,
+            "code_challenge_method": "S256",
+        }
+        resp = session.get(self._auth_url, params=params, allow_redirects=False, timeout=HTTP_TIMEOUT)
+        if resp.status_code not in (301, 302, 303):
+            _raise_if_unavailable(resp, "SSO del PJN")
+            # No hay sesión SSO: completar el formulario de login de Keycloak
+            match = _FORM_ACTION_RE.search(resp.text)
+            if not match:
+                raise HttpEngineError("No se encontró el formulario de login de Keycloak.")
+            usuario = self._usuarios[dni]
+            resp = session.post(
+                urljoin(resp.url, html.unescape(match.group(1))),
+                data={"username": dni, "password": usuario["contrasena"], "credentialId": ""},
+                allow_redirects=False,
+                timeout=HTTP_TIMEOUT,
+            )
+            if resp.status_code not in (301, 302, 303):
+                _raise_if_unavailable(resp, f"Login SSO para DNI {dni}")
+                # Solo es un rechazo si Keycloak vuelve a mostrar el formulario o su mensaje de error
+                if resp.status_code == 200 and (_FORM_ACTION_RE.search(resp.text) or _LOGIN_ERROR_RE.search(resp.text)):
+                    raise LoginRejected(f"Login SSO rechazado para DNI {dni}.")
+                raise HttpEngineError(f"Respuesta inesperada ({resp.status_code}) del login SSO para DNI {dni}.")
+
+        location = urljoin(resp.url, resp.headers.get("Location", ""))
+        parsed = urlparse(location)
+        values = parse_qs(parsed.fragment or parsed.query)
+        if "code" not in values:
+            raise HttpEngineError(f"Keycloak no devolvió un código de autorización para DNI {dni}.")
+        return values["code"][0]
+
+    def _request_tokens(self, session, data):
+        data = dict(data, client_id=PJN_CLIENT_ID)
+        resp = session.post(self._token_url, data=data, timeout=HTTP_TIMEOUT)
+        _raise_if_unavailable(resp, "Tokens de Keycloak")
+        if resp.status_code != 200:
+            raise HttpEngineError(f"Error {resp.status_code} obteniendo tokens de Keycloak.")
+        return _Tokens(resp.json())
+
+    def _login(self, dni):
+        session = self._session(dni)
+        if self._browser_cookies is not None:
+            for cookie in self._browser_cookies(dni):
+                session.cookies.set(
+                    cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/")
+                )
+        verifier, challenge = _pkce_pair()
+        code = self._authorization_code(session, dni, challenge)
+        return self._request_tokens(
+            session,
+            {
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": PJN_REDIRECT_URI,
+                "code_verifier": verifier,
+            },
+        )
+
+    def access_token(self, dni):
+        """Devuelve un access token vigente, refrescándolo o reautenticando si venció."""
+        tokens = self._tokens.get(dni)
+        if tokens is not None and tokens.valid():
+            return tokens.access_token
+        if tokens is not None and tokens.refreshable():
+            try:
+                tokens = self._request_tokens(
+                    self._session(dni),
+                    {"grant_type": "refresh_token", "refresh_token": tokens.refresh_token},
+                )
+                self._tokens[dni] = tokens
+                return tokens.access_token
+            except HttpEngineError as e:
+                logger.info("No se pudo refrescar el token del DNI %s (%s); se reautentica.", dni, e)
+        tokens = self._login(dni)
+        self._tokens[dni] = tokens
+        return tokens.access_token
+
+    def fetch_items(self, dni):
+        """Descarga todas las novedades del DNI desde el endpoint JSON."""
+        return [item for page_items in self._pages(dni) for item in page_items]
+
+    def _pages(self, dni, params=None):
+        """Páginas de novedades del DNI; cada una se pide recién cuando se consume la anterior."""
+        session = self._session(dni)
+        page = 0
+        reauthenticated = False
+        while True:
+            headers = {"Authorization": f"Bearer {self.access_token(dni)}", "Accept": "application/json"}
+            resp = session.get(
+                PJN_NOVEDADES_API_URL,
+                params=dict(params or {}, page=page, size=PJN_NOVEDADES_PAGE_SIZE),
+                headers=headers,
+                timeout=HTTP_TIMEOUT,
+            )
+            if resp.status_code == 401 and not reauthenticated:
+                # Token revocado del lado del servidor: forzar nuevo login una vez
+                self._tokens.pop(dni, None)
+                reauthenticated = True
+                continue
+            _raise_if_unavailable(resp, "Endpoint de novedades")
+            resp.raise_for_status()
+            payload = resp.json()
+            page_items = _items_from_payload(payload)
+            if page_items:
+                yield page_items
+            if not page_items or _is_last_page(payload, page_items):
+                return
+            page += 1
+
+    def scrape(self, dni, cutoff=None):
+        """Equivalente HTTP de ``scrapingPJN``: devuelve ``(resumen, filas)``.
+
+        Con ``cutoff`` (watermark.Cutoff) se deja de paginar al llegar a la
+        marca de agua del DNI y solo se devuelven las novedades nuevas.
+        """
+        perito_nombre = self._usuarios[dni]["nombre"]
+        scan = DeltaScan(cutoff)
+        params = {}
+        if cutoff is not None and not cutoff.full and PJN_NOVEDADES_DESDE_PARAM:
+            # Desde el día de la marca inclusive: las de ese día se comparan con las conocidas
+            params[PJN_NOVEDADES_DESDE_PARAM] = cutoff.fecha.strftime(PJN_NOVEDADES_DESDE_FORMAT)
+        raw_rows = []
+        pages = 0
+        for page_items in self._pages(dni, params):
+            pages += 1
+            for item in page_items:
+                try:
+                    raw_row = (
+                        str(_pick(item, "tipo") or "").strip(),
+                        _fecha_to_str(_pick(item, "fecha")),
+                        str(_pick(item, "causa") or "").strip(),
+                        str(_pick(item, "nombre") or "").strip(),
+                        str(_pick(item, "link") or ""),
+                    )
+                    verdict = scan.check(raw_row)
+                except Exception as e_row:
+                    logger.error(
+                        "Error procesando una novedad para %s: %s. Novedad: %s", perito_nombre, e_row, item
+                    )
+                    continue
+                if verdict is STOP:
+                    break
+                if verdict is NEW:
+                    raw_rows.append(raw_row)
+            if scan.stopped:
+                break  # Las páginas siguientes son anteriores a la marca: no se piden
+        data_rows = self._build_rows(perito_nombre, raw_rows)
+        summary_text = (
+            f"Scraping HTTP para {perito_nombre}: Se encontraron {scan.read} elementos en {pages} páginas. "
+            f"{scan.describe()}"
+        )
+        logger.info(summary_text)
+        return summary_text, data_rows
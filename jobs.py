@@ -0,0 +1,185 @@
+# jobs.py
+#
+# Cola de trabajos de scraping para la API (POST /scrape): cada pedido
+# devuelve enseguida un id de trabajo, los pedidos que llegan mientras ya hay
+# un scraping equivalente en curso o en cola se fusionan con él, y los
+# trabajos se ejecutan de a uno en un hilo propio. El progreso por DNI queda
+# como una lista de eventos que la API transmite por SSE.
+
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+ALL_USERS = "all"
+
+
+class ScrapeJob:
+    """Un scraping pedido por la API: todos los DNIs (``scope="all"``) o uno solo."""
+
+    def __init__(self, scope, dnis):
+        self.id = uuid.uuid4().hex[:12]
+        self.scope = scope
+        self.dnis = list(dnis)
+        self.status = "queued"  # queued -> running -> done | failed
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {dni: {"status": "pending", "rows": 0, "summary": ""} for dni in self.dnis}
+        self.result = None
+        self.error = None
+        self.merged_requests = 0
+        self.events = []  # (seq, tipo, datos)
+        self._seq = itertools.count(1)
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def covers(self, dni):
+        """True si el trabajo todavía va a scrapear ``dni`` (no empezó con él)."""
+        return dni in self.progress and self.progress[dni]["status"] == "pending"
+
+    def emit(self, kind, data):
+        with self._changed:
+            self.events.append((next(self._seq), kind, data))
+            self._changed.notify_all()
+
+    def finish(self, status, result=None, error=None, seconds=None):
+        """Termina el trabajo y emite ``finished`` a la vez: quien lo vea terminado ya tiene el evento."""
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = datetime.now()
+            self.events.append(
+                (
+                    next(self._seq),
+                    "finished",
+                    {"job_id": self.id, "status": status, "result": result, "error": error, "seconds": seconds},
+                )
+            )
+            self._changed.notify_all()
+
+    def wait_events(self, after_seq, timeout):
+        """Eventos con número mayor a ``after_seq``; espera hasta ``timeout`` si no hay."""
+        with self._changed:
+            if not self.finished and (not self.events or self.events[-1][0] <= after_seq):
+                self._changed.wait(timeout)
+            return [e for e in self.events if e[0] > after_seq]
+
+    def on_progress(self, kind, dni, data):
+        """Callback para run_all_scraping_concurrently."""
+        entry = self.progress.setdefault(dni, {"status": "pending", "rows": 0, "summary": ""})
+        entry["status"] = kind
+        entry.update(data)
+        done = sum(1 for p in self.progress.values() if p["status"] in ("finished", "skipped"))
+        self.emit("progress", {"dni": dni, "status": kind, **data, "done": done, "total": len(self.progress)})
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat(timespec="seconds") if value else None
+
+        return {
+            "job_id": self.id,
+            "scope": self.scope,
+            "status": self.status,
+            "created_at": iso(self.created_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+            "merged_requests": self.merged_requests,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class ScrapeJobManager:
+    """Ejecuta los trabajos de a uno y fusiona los pedidos duplicados.
+
+    ``run_fn(dnis, on_progress)`` hace el scraping (``dnis=None`` = todos) y
+    devuelve un resumen; ``list_dnis()`` da los DNIs configurados.
+    """
+
+    def __init__(self, run_fn, list_dnis, keep_finished=50):
+        self._run_fn = run_fn
+        self._list_dnis = list_dnis
+        self._jobs = {}
+        self._finished_ids = deque()
+        self.keep_finished = keep_finished
+        self._queue = deque()
+        self._current = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._worker, name="scrape-jobs", daemon=True)
+        self._thread.start()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _find_mergeable(self, dni):
+        """Trabajo en curso o en cola que ya incluye el pedido."""
+        candidates = ([self._current] if self._current else []) + list(self._queue)
+        for job in candidates:
+            if job.finished:
+                continue
+            if dni is None:
+                # Un pedido de todos solo se fusiona con otro de todos que no empezó
+                # o que está corriendo (los DNIs ya terminados se harán en el próximo).
+                if job.scope == ALL_USERS:
+                    return job
+            elif job.scope == dni or (job.covers(dni) if job.status == "running" else dni in job.progress):
+                return job
+        return None
+
+    def submit(self, dni=None):
+        """Encola un scraping de todos (``dni=None``) o de un DNI; devuelve ``(job, merged)``."""
+        if dni is not None and dni not in self._list_dnis():
+            raise KeyError(dni)
+        with self._lock:
+            job = self._find_mergeable(dni)
+            if job is not None:
+                job.merged_requests += 1
+                logger.info("Pedido de scraping (%s) fusionado con el trabajo %s.", dni or ALL_USERS, job.id)
+                return job, True
+            dnis = self._list_dnis() if dni is None else [dni]
+            job = ScrapeJob(dni or ALL_USERS, dnis)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._wakeup.notify()
+        logger.info("Trabajo de scraping %s encolado (%s, %d DNIs).", job.id, job.scope, len(job.dnis))
+        job.emit("queued", {"job_id": job.id, "scope": job.scope, "total": len(job.dnis)})
+        return job, False
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wakeup.wait()
+                job = self._queue.popleft()
+                self._current = job
+                job.status = "running"
+                job.started_at = datetime.now()
+            job.emit("started", {"job_id": job.id})
+            start = time.monotonic()
+            result = error = None
+            try:
+                result = self._run_fn(None if job.scope == ALL_USERS else job.dnis, job.on_progress)
+                status = "done"
+            except Exception as e:
+                logger.error("El trabajo de scraping %s falló: %s", job.id, e)
+                error = str(e)
+                status = "failed"
+            job.finish(status, result, error, round(time.monotonic() - start, 1))
+            with self._lock:
+                self._current = None
+                self._finished_ids.append(job.id)
+                while len(self._finished_ids) > self.keep_finished:
+                    self._jobs.pop(self._finished_ids.popleft(), None)
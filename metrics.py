@@ -0,0 +1,270 @@
+# metrics.py
+#
+# Instrumentación del backend: tiempos y contadores por etapa (arranque de
+# Chrome, login SSO, espera de la tabla, parseo, extracción, commits de
+# Firestore...) etiquetados por DNI. Se exponen en formato de texto de
+# Prometheus (GET /metrics) y, opcionalmente, como un log JSON por línea.
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "peritos"
+# Buckets en segundos: desde el parseo (ms) hasta un ciclo completo (minutos)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# Fracción del intervalo a partir de la cual se avisa que el ciclo se acerca al límite
+CYCLE_WARNING_FRACTION = 0.8
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_items(items))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_items(self, items):
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+    def totals(self):
+        """``{labels: (suma, cantidad)}`` para resúmenes en los logs."""
+        with self._lock:
+            return {key: (state[1], state[2]) for key, state in self._values.items()}
+
+
+########################################
+# Métricas del backend
+########################################
+stage_seconds = Histogram("stage_seconds", "Duración de cada etapa del scraping.", ("stage", "dni"))
+stage_errors = Counter("stage_errors_total", "Etapas que terminaron con excepción.", ("stage", "dni"))
+rows_scraped = Counter("rows_scraped_total", "Filas extraídas del portal.", ("dni",))
+rows_skipped = Counter("rows_unchanged_total", "Filas sin cambios que no se reescribieron.")
+rows_written = Counter("rows_written_total", "Documentos confirmados en Firestore.")
+firestore_commits = Counter("firestore_commits_total", "Batches de Firestore confirmados.", ("outcome",))
+firestore_attempts = Counter("firestore_commit_attempts_total", "Intentos de commit, incluidos reintentos.")
+cycle_seconds = Gauge("cycle_seconds", "Duración del último ciclo de scraping.", ("dni",))
+cycle_interval_seconds = Gauge("cycle_interval_seconds", "Intervalo configurado entre ciclos.")
+poll_interval_seconds = Gauge("poll_interval_seconds", "Próximo intervalo de consulta con frecuencia adaptativa.", ("dni",))
+worker_recycles = Counter("worker_recycles_total", "Workers de scraping reemplazados.", ("reason",))
+breaker_open = Gauge("portal_breaker_open", "1 si el breaker del portal está abierto o sondeando.")
+breaker_skips = Counter("breaker_skips_total", "Scrapings evitados por los breakers.", ("dni",))
+wal_pending_rows = Gauge("wal_pending_rows", "Filas en el buffer local esperando a Firestore.")
+wal_oldest_seconds = Gauge("wal_oldest_seconds", "Antigüedad de la fila más vieja del buffer local.")
+
+REGISTRY = (
+    stage_seconds,
+    stage_errors,
+    rows_scraped,
+    rows_skipped,
+    rows_written,
+    firestore_commits,
+    firestore_attempts,
+    cycle_seconds,
+    cycle_interval_seconds,
+    poll_interval_seconds,
+    worker_recycles,
+    breaker_open,
+    breaker_skips,
+    wal_pending_rows,
+    wal_oldest_seconds,
+)
+
+_json_log = None
+_json_log_lock = threading.Lock()
+_interval_seconds = None
+
+
+def configure_json_log(path):
+    """Escribe cada observación como una línea JSON en ``path`` (None = desactivado)."""
+    global _json_log
+    with _json_log_lock:
+        if _json_log is not None:
+            _json_log.close()
+        _json_log = open(path, "a", encoding="utf-8", buffering=1) if path else None
+
+
+def _log_event(event, **fields):
+    if _json_log is None:
+        return
+    record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "event": event, **fields}
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _json_log_lock:
+        if _json_log is not None:
+            _json_log.write(line + "\n")
+
+
+def observe_stage(stage, seconds, dni="", ok=True, **fields):
+    stage_seconds.observe(seconds, stage=stage, dni=dni or "")
+    if not ok:
+        stage_errors.inc(stage=stage, dni=dni or "")
+    _log_event("stage", stage=stage, dni=dni, seconds=round(seconds, 4), ok=ok, **fields)
+
+
+@contextmanager
+def stage(name, dni=""):
+    """Mide el bloque como la etapa ``name``; si lanza una excepción cuenta un error."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe_stage(name, time.perf_counter() - start, dni, ok=False)
+        raise
+    observe_stage(name, time.perf_counter() - start, dni)
+
+
+def record_batch_commit(size, seconds, attempts, ok):
+    """Callback de BatchCommitter para cada batch."""
+    firestore_commits.inc(outcome="ok" if ok else "error")
+    firestore_attempts.inc(attempts)
+    if ok:
+        rows_written.inc(size)
+    observe_stage("firestore_commit", seconds, ok=ok, size=size, attempts=attempts)
+
+
+def set_interval(seconds):
+    """Intervalo entre ciclos, para avisar cuando un ciclo se le acerca."""
+    global _interval_seconds
+    _interval_seconds = seconds
+    cycle_interval_seconds.set(seconds or 0)
+
+
+def record_cycle(dni, seconds):
+    """Registra la duración de un ciclo y avisa si se acerca al intervalo configurado."""
+    cycle_seconds.set(round(seconds, 3), dni=dni)
+    _log_event("cycle", dni=dni, seconds=round(seconds, 4), interval=_interval_seconds)
+    if _interval_seconds and seconds >= _interval_seconds * CYCLE_WARNING_FRACTION:
+        logger.warning(
+            "El ciclo de %s tardó %.1fs, el %.0f%% del intervalo de %.0fs.",
+            f"DNI {dni}" if dni != "all" else "todos los usuarios",
+            seconds,
+            seconds / _interval_seconds * 100,
+            _interval_seconds,
+        )
+
+
+def render():
+    """Todas las métricas en el formato de texto de Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def log_stage_summary():
+    """Resume en el log el tiempo acumulado por etapa (para ver qué domina el ciclo)."""
+    by_stage = {}
+    for (stage_name, _dni), (total, count) in stage_seconds.totals().items():
+        acc = by_stage.setdefault(stage_name, [0.0, 0])
+        acc[0] += total
+        acc[1] += count
+    for stage_name, (total, count) in sorted(by_stage.items(), key=lambda kv: -kv[1][0]):
+        logger.info(
+            "Etapa %s: %d mediciones, %.1fs en total, %.2fs promedio.", stage_name, count, total, total / count
+        )
+
+
+########################################
+# Servidor /metrics
+########################################
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Sirve GET /metrics en un hilo propio y devuelve el servidor."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Métricas disponibles en http://%s:%d/metrics", host, server.server_address[1])
+    return server
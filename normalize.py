@@ -0,0 +1,187 @@
+# normalize.py
+#
+# Normalización de las filas scrapeadas, por lotes: build_rows() arma todas
+# las novedades de una consulta de una vez a partir de los valores crudos del
+# portal. Cada campo de texto se escapa exactamente una vez (acá; después ya
+# no se vuelve a tocar), las fechas y los tipos se resuelven con caché porque
+# se repiten mucho entre filas, y el doc_id de Firestore se calcula en la
+# misma pasada y viaja con la fila.
+#
+# Las filas son objetos Novedad con __slots__ que se comportan como un dict
+# de solo lectura (Mapping): el resto del código las sigue leyendo con
+# row["Causa"] o row.get("Fecha") y dict(row) da el documento a guardar.
+
+import html
+import logging
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("Perito", "Tipo", "Causa", "Nombre", "Fecha", "Link", "ScrapedAt")
+_FIELD_SET = frozenset(FIELDS)
+
+# Quita espacios y unifica separadores de la causa (ver normalize_causa)
+_CAUSA_TABLE = str.maketrans({" ": None, "/": "_", "-": "_"})
+
+
+class Novedad(Mapping):
+    """Fila scrapeada con sus campos en slots y el ``doc_id`` ya calculado."""
+
+    __slots__ = FIELDS + ("doc_id",)
+
+    def __init__(self, Perito, Tipo, Causa, Nombre, Fecha, Link, ScrapedAt, doc_id=None):
+        self.Perito = Perito
+        self.Tipo = Tipo
+        self.Causa = Causa
+        self.Nombre = Nombre
+        self.Fecha = Fecha
+        self.Link = Link
+        self.ScrapedAt = ScrapedAt
+        self.doc_id = doc_id
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        # Viaja entre procesos (workers aislados) sin pasar por __dict__
+        return (Novedad, tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return f"Novedad({dict(self)!r})"
+
+
+########################################
+# Campos
+########################################
+def sanitize_text(value):
+    """Escapa cualquier HTML en los campos de texto."""
+    if not isinstance(value, str):
+        return value
+    return html.escape(value)
+
+
+def parse_fecha(value_str):
+    """Parsea una cadena de fecha en formato DD/MM/YYYY a objeto datetime."""
+    if not isinstance(value_str, str):
+        return None  # O manejar como error
+    return _parse_fecha_key(value_str)[0]
+
+
+@lru_cache(maxsize=4096)
+def _parse_fecha_key(value_str):
+    """``(datetime o None, fecha para el doc_id)``; cada fecha distinta se parsea una sola vez."""
+    try:
+        fecha = datetime.strptime(value_str, "%d/%m/%Y")
+    except ValueError:
+        logger.warning("No se pudo parsear la fecha '%s' con formato DD/MM/YYYY.", value_str)
+        return None, "unknown_date"
+    return fecha, fecha.strftime("%d-%m-%Y")
+
+
+@lru_cache(maxsize=256)
+def map_tipo(tipo_raw):
+    """Tipo de la novedad ya escapado: "d" es NOVEDAD y "n" NOTIFICACION."""
+    lowered = tipo_raw.lower()
+    if lowered == "d":
+        tipo = "NOVEDAD"
+    elif lowered == "n":
+        tipo = "NOTIFICACION"
+    else:  # Otros tipos, usar el valor raw o un default
+        tipo = tipo_raw if tipo_raw else "DESCONOCIDO"
+    return sanitize_text(tipo)
+
+
+def normalize_causa(causa_str):
+    """Normaliza el string de la causa para usarlo en IDs de documento."""
+    if not isinstance(causa_str, str):
+        return "unknown_causa"
+    return causa_str.translate(_CAUSA_TABLE).lower()
+
+
+########################################
+# IDs de documento
+########################################
+def _fecha_key(fecha):
+    if not isinstance(fecha, datetime):
+        return "unknown_date"
+    if fecha.tzinfo is not None:
+        # Dos datetimes con zona pueden ser iguales (misma caché) y formatearse distinto
+        return fecha.strftime("%d-%m-%Y")
+    return _naive_fecha_key(fecha)
+
+
+@lru_cache(maxsize=4096)
+def _naive_fecha_key(fecha):
+    return fecha.strftime("%d-%m-%Y")
+
+
+def make_doc_id(perito, tipo, fecha_key, causa):
+    return f"{perito}_{tipo}_{fecha_key}_{normalize_causa(causa)}".replace(" ", "_").lower()
+
+
+def build_doc_id(row):
+    """Construye el ID de documento de Firestore para una fila scrapeada."""
+    doc_id = getattr(row, "doc_id", None)
+    if doc_id is not None:
+        return doc_id
+    # Filas sueltas (p. ej. recuperadas del buffer local como dict)
+    return make_doc_id(
+        row.get("Perito", "unknown_perito"),
+        row.get("Tipo", "unknown_type"),
+        _fecha_key(row.get("Fecha")),
+        row.get("Causa", ""),
+    )
+
+
+########################################
+# Lotes
+########################################
+def build_rows(perito_nombre, raw_rows, scraped_at=None):
+    """Arma las novedades de una consulta.
+
+    ``raw_rows`` son tuplas ``(tipo, fecha, causa, nombre, link)`` con el texto
+    crudo del portal. Todas las filas del lote comparten ``ScrapedAt``.
+    """
+    perito = sanitize_text(perito_nombre)
+    scraped_at = scraped_at or datetime.now()
+    rows = []
+    for tipo_raw, fecha_str, causa_raw, nombre_raw, link_raw in raw_rows:
+        tipo = map_tipo(tipo_raw)
+        causa = sanitize_text(causa_raw)
+        if isinstance(fecha_str, str):
+            fecha, fecha_key = _parse_fecha_key(fecha_str)
+        else:
+            fecha, fecha_key = None, "unknown_date"
+        if fecha is None:
+            logger.warning(
+                "Fecha inválida '%s' para %s en causa '%s'. La fila se guarda con Fecha=None.",
+                fecha_str,
+                perito_nombre,
+                causa,
+            )
+        rows.append(
+            Novedad(
+                perito,
+                tipo,
+                causa,
+                sanitize_text(nombre_raw),
+                fecha,
+                sanitize_text(link_raw),
+                scraped_at,
+                make_doc_id(perito, tipo, fecha_key, causa),
+            )
+        )
+    return rows
@@ -0,0 +1,83 @@
+# pipeline.py
+#
+# Pipeline productor/consumidor entre los workers de scraping y Firestore:
+# cada worker deja sus filas en una cola acotada apenas termina su usuario y
+# una etapa escritora las agrupa en lotes y las guarda. Si la escritura se
+# atrasa, la cola se llena y los productores esperan (backpressure).
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()  # Marca de fin para el hilo escritor
+
+
+class RowWriter:
+    """Etapa escritora: agrupa filas en lotes y los pasa a ``write_fn``.
+
+    Un lote se escribe al llegar a ``batch_size`` filas o cuando pasaron
+    ``max_wait`` segundos desde la primera fila pendiente.
+    """
+
+    def __init__(self, write_fn, batch_size=200, max_wait=1.0, max_queued=2000):
+        self._write_fn = write_fn
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._run, name="row-writer", daemon=True)
+        self._started_at = time.monotonic()
+        self.first_write_seconds = None
+        self.rows_received = 0
+        self.rows_written = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._thread.start()
+
+    def put_rows(self, rows):
+        """Encola las filas de un usuario; bloquea si la cola está llena."""
+        for row in rows:
+            self._queue.put(row)
+        with self._lock:
+            self.rows_received += len(rows)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            self.rows_written += self._write_fn(batch) or 0
+        except Exception as e:
+            logger.error("Error escribiendo un lote de %d filas en Firestore: %s", len(batch), e)
+        self.batches += 1
+        if self.first_write_seconds is None:
+            self.first_write_seconds = time.monotonic() - self._started_at
+            logger.info("Primera escritura en Firestore a los %.1fs.", self.first_write_seconds)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush(batch)
+                batch, deadline = [], None
+                continue
+            if item is _CLOSE:
+                self._flush(batch)
+                return
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch, deadline = [], None
+
+    def close(self):
+        """Espera a que se escriban todas las filas pendientes."""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        return self.rows_written
@@ -0,0 +1,380 @@
+# process_workers.py
+#
+# Scraping aislado en procesos: cada worker es un subproceso en su propia
+# sesión (setsid), así Chrome y chromedriver quedan en su grupo de procesos
+# aunque se vuelvan huérfanos. El supervisor mide RSS y CPU de toda la
+# sesión, corta los trabajos que superan el tiempo máximo, mata el grupo
+# completo con killpg y recicla cada worker tras ``max_jobs`` trabajos.
+#
+# Protocolo: tramas pickle con prefijo de longitud por stdin/stdout del
+# worker (el stdout original del worker se redirige a stderr).
+
+import importlib
+import logging
+import os
+import pickle
+import queue
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")
+# Cada cuánto se revisan RSS y CPU mientras corre un trabajo
+MONITOR_INTERVAL = 1.0
+# Segundos de gracia entre SIGTERM y SIGKILL
+KILL_GRACE_SECONDS = 5.0
+try:
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _CLOCK_TICKS, _PAGE_SIZE = 100, 4096
+
+
+class WorkerError(Exception):
+    """El worker murió, superó un límite o no respondió a tiempo."""
+
+
+class WorkerTimeout(WorkerError):
+    """El trabajo superó el tiempo máximo de reloj (típicamente, el portal no responde)."""
+
+
+########################################
+# Tramas
+########################################
+def _write_frame(fd, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    view = memoryview(_HEADER.pack(len(data)) + data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _read_exact(fd, size):
+    chunks = []
+    while size:
+        chunk = os.read(fd, size)
+        if not chunk:
+            raise EOFError("El otro extremo cerró el canal")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _read_frame(fd):
+    (size,) = _HEADER.unpack(_read_exact(fd, _HEADER.size))
+    return pickle.loads(_read_exact(fd, size))
+
+
+def _resolve(spec):
+    """``"modulo:funcion"`` -> función."""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+########################################
+# Uso de recursos de una sesión (Linux)
+########################################
+def session_usage(sid):
+    """``(rss_bytes, cpu_segundos, pids)`` de los procesos vivos de la sesión ``sid``.
+
+    Incluye los Chrome huérfanos que ya no cuelgan del worker. Sin /proc
+    devuelve ``(0, 0.0, [])`` y solo se aplica el tiempo máximo.
+    """
+    rss = 0
+    cpu = 0.0
+    pids = []
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0, 0.0, []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read().decode(errors="replace")
+            # Campos después del nombre (que va entre paréntesis): estado, ppid, pgrp, sesión...
+            fields = stat.rsplit(")", 1)[1].split()
+            if int(fields[3]) != sid or fields[0] == "Z":
+                continue
+            cpu += (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+            rss += int(fields[21]) * _PAGE_SIZE
+            pids.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return rss, cpu, pids
+
+
+########################################
+# Lado del worker
+########################################
+def _worker_main():
+    # El canal usa el stdout original; los print() de la librería van a stderr
+    out_fd = os.dup(1)
+    os.dup2(2, 1)
+    in_fd = 0
+    setup = _read_frame(in_fd)
+    if setup.get("initializer"):
+        _resolve(setup["initializer"])(*setup.get("initargs", ()))
+    target = _resolve(setup["target"])
+    while True:
+        try:
+            args = _read_frame(in_fd)
+        except EOFError:
+            return  # El supervisor terminó
+        if args is None:
+            return
+        try:
+            _write_frame(out_fd, ("ok", target(*args)))
+        except Exception as e:
+            _write_frame(out_fd, ("error", f"{type(e).__name__}: {e}"))
+        _reap_children()
+
+
+def _reap_children():
+    """Recoge los hijos que terminaron para no acumular zombies entre trabajos."""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if not pid:
+            return
+
+
+########################################
+# Lado del supervisor
+########################################
+class _Worker:
+    def __init__(self, setup):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            start_new_session=True,  # setsid: el worker lidera su sesión y su grupo
+            close_fds=True,
+        )
+        self.pid = self.process.pid
+        self.jobs = 0
+        self.peak_rss = 0
+        _write_frame(self.process.stdin.fileno(), setup)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill_group(self):
+        """Mata el grupo completo: worker, chromedriver y Chrome (también los huérfanos)."""
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(self.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                self.process.wait(timeout=KILL_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                continue
+            if sig == signal.SIGTERM:
+                # El worker salió; barrer lo que haya quedado en el grupo
+                try:
+                    os.killpg(self.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                break
+        self._close_pipes()
+
+    def stop(self):
+        """Pide al worker que termine y limpia su grupo de procesos."""
+        if self.alive():
+            try:
+                _write_frame(self.process.stdin.fileno(), None)
+                self.process.wait(timeout=KILL_GRACE_SECONDS)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill_group()
+
+    def _close_pipes(self):
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def reap_orphans(self):
+        """Mata los procesos que quedaron en la sesión entre trabajos (Chrome sin quit)."""
+        _, _, pids = session_usage(self.pid)
+        orphans = [pid for pid in pids if pid != self.pid]
+        for pid in orphans:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        return len(orphans)
+
+
+class ProcessWorkerPool:
+    """Ejecuta ``target(*args)`` en workers aislados con límites de recursos.
+
+    ``target`` e ``initializer`` se indican como ``"modulo:funcion"`` y se
+    importan en el worker. Un trabajo que supera ``timeout`` segundos,
+    ``max_rss_mb`` de memoria o ``max_cpu_seconds`` de CPU (sumando todos
+    los procesos de la sesión) se aborta matando el grupo y lanza
+    ``WorkerError``. ``on_recycle(motivo)`` se llama cada vez que se
+    reemplaza un worker.
+    """
+
+    def __init__(
+        self,
+        target,
+        size=1,
+        initializer=None,
+        initargs=(),
+        max_jobs=20,
+        max_rss_mb=None,
+        max_cpu_seconds=None,
+        timeout=None,
+        on_recycle=None,
+    ):
+        self._setup = {"target": target, "initializer": initializer, "initargs": tuple(initargs)}
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.max_cpu_seconds = max_cpu_seconds
+        self.timeout = timeout
+        self._on_recycle = on_recycle
+        self._idle = queue.LifoQueue()  # El worker más reciente sigue "caliente"
+        for _ in range(self.size):
+            self._idle.put(None)  # Lugar libre: el worker se crea al usarlo
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._closed = False
+        self.stats = {"jobs": 0, "started": 0, "recycled": 0, "killed": 0, "orphans": 0, "peak_rss_mb": 0.0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _start_worker(self):
+        worker = _Worker(self._setup)
+        with self._lock:
+            self._workers.add(worker)
+            self.stats["started"] += 1
+        logger.info("Worker de scraping iniciado (pid %d).", worker.pid)
+        return worker
+
+    def _retire(self, worker, reason, kill=False):
+        logger.info("Reciclando worker %d (%s) tras %d trabajos.", worker.pid, reason, worker.jobs)
+        if kill:
+            worker.kill_group()
+        else:
+            worker.stop()
+        with self._lock:
+            self._workers.discard(worker)
+            self.stats["recycled"] += 1
+        if self._on_recycle is not None:
+            self._on_recycle(reason)
+
+    def _wait_result(self, worker, label):
+        """Espera la respuesta vigilando tiempo, RSS y CPU de la sesión."""
+        fd = worker.process.stdout.fileno()
+        start = time.monotonic()
+        _, cpu_start, _ = session_usage(worker.pid)
+        while True:
+            ready, _, _ = select.select([fd], [], [], MONITOR_INTERVAL)
+            if ready:
+                rss, _, _ = session_usage(worker.pid)
+                worker.peak_rss = max(worker.peak_rss, rss)
+                try:
+                    return _read_frame(fd)
+                except (EOFError, OSError, pickle.UnpicklingError) as e:
+                    raise WorkerError(f"el worker de {label} terminó sin responder ({e})") from None
+            if not worker.alive():
+                raise WorkerError(f"el worker de {label} terminó con código {worker.process.returncode}")
+            elapsed = time.monotonic() - start
+            if self.timeout and elapsed > self.timeout:
+                raise WorkerTimeout(f"{label} superó el tiempo máximo de {self.timeout:.0f}s")
+            rss, cpu, _ = session_usage(worker.pid)
+            worker.peak_rss = max(worker.peak_rss, rss)
+            if self.max_rss_bytes and rss > self.max_rss_bytes:
+                raise WorkerError(
+                    f"{label} superó el límite de memoria ({rss / (1024 * 1024):.0f} MB)"
+                )
+            if self.max_cpu_seconds and cpu - cpu_start > self.max_cpu_seconds:
+                raise WorkerError(f"{label} superó el límite de CPU ({cpu - cpu_start:.0f}s)")
+
+    def run(self, *args, label=None):
+        """Ejecuta un trabajo en un worker libre y devuelve el resultado de ``target``."""
+        label = label or repr(args)
+        worker = self._idle.get()
+        try:
+            if self._closed:
+                raise WorkerError("el pool de workers está cerrado")
+            if worker is None or not worker.alive():
+                if worker is not None:
+                    self._retire(worker, "el proceso murió", kill=True)
+                worker = self._start_worker()
+            worker.peak_rss = 0
+            try:
+                # El worker puede morir entre alive() y la escritura: el canal roto se informa como WorkerError
+                _write_frame(worker.process.stdin.fileno(), args)
+                worker.jobs += 1
+                self._count("jobs")
+                status, payload = self._wait_result(worker, label)
+            except WorkerError:
+                self._count("killed")
+                self._retire(worker, "trabajo abortado", kill=True)
+                worker = None
+                raise
+            except BrokenPipeError:
+                self._retire(worker, "canal roto", kill=True)
+                worker = None
+                raise WorkerError(f"el worker de {label} cerró el canal") from None
+
+            with self._lock:
+                self.stats["peak_rss_mb"] = max(self.stats["peak_rss_mb"], worker.peak_rss / (1024 * 1024))
+            orphans = worker.reap_orphans()
+            if orphans:
+                logger.warning("Worker %d: %d procesos huérfanos eliminados tras %s.", worker.pid, orphans, label)
+                self._count("orphans", orphans)
+            if self.max_jobs and worker.jobs >= self.max_jobs:
+                self._retire(worker, f"alcanzó {self.max_jobs} trabajos")
+                worker = None
+            if status == "error":
+                raise WorkerError(f"{label}: {payload}")
+            return payload
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """Detiene todos los workers (espera a que terminen los trabajos en curso)."""
+        self._closed = True
+        for _ in range(self.size):
+            worker = self._idle.get()
+            if worker is not None:
+                worker.stop()
+        with self._lock:
+            self._workers.clear()
+        for _ in range(self.size):
+            self._idle.put(None)  # Los pedidos posteriores fallan en vez de quedar esperando
+
+    def log_stats(self):
+        s = self.stats
+        logger.info(
+            "Workers de scraping: trabajos=%d iniciados=%d reciclados=%d abortados=%d "
+            "huérfanos=%d pico RSS=%.0f MB",
+            s["jobs"],
+            s["started"],
+            s["recycled"],
+            s["killed"],
+            s["orphans"],
+            s["peak_rss_mb"],
+        )
+
+
+if __name__ == "__main__":
+    _worker_main()
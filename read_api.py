@@ -0,0 +1,223 @@
+# read_api.py
+#
+# Lectura de novedades para el frontend (GET /data): paginación por cursor,
+# filtros por Perito, Tipo y rango de Fecha resueltos en Firestore (con los
+# índices compuestos de firestore.indexes.json), caché TTL/LRU en memoria y
+# ETag para que el navegador pueda revalidar sin volver a descargar.
+#
+# La caché se invalida cuando saveToFirestore escribe en este mismo proceso
+# (ver add_write_listener en scraping_backend.py); si el scraping corre en
+# otro proceso, las respuestas se renuevan al vencer el TTL.
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from normalize import sanitize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Orden de la tabla: novedades más recientes primero; el ID desempata
+ORDER_FIELD = "Fecha"
+DOCUMENT_ID = "__name__"
+
+
+class QueryError(ValueError):
+    """Parámetros de consulta inválidos (se responde 400)."""
+
+
+########################################
+# Parámetros y cursor
+########################################
+def _parse_date(value, name):
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise QueryError(f"'{name}' debe tener formato AAAA-MM-DD o DD/MM/AAAA: {value!r}")
+
+
+def encode_cursor(fecha, doc_id):
+    """Cursor opaco con los valores de orden del último documento de la página."""
+    payload = {"f": fecha.isoformat() if isinstance(fecha, datetime) else None, "id": doc_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        fecha = datetime.fromisoformat(payload["f"]) if payload["f"] else None
+        return fecha, str(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise QueryError(f"Cursor inválido: {e}") from None
+
+
+class PageQuery:
+    """Filtros y posición de una página de novedades."""
+
+    __slots__ = ("perito", "tipo", "desde", "hasta", "limit", "cursor")
+
+    def __init__(self, perito=None, tipo=None, desde=None, hasta=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        self.perito = perito
+        self.tipo = tipo
+        self.desde = desde
+        self.hasta = hasta
+        self.limit = limit
+        self.cursor = cursor
+
+    @classmethod
+    def from_params(cls, params, max_limit=MAX_PAGE_SIZE):
+        """Construye la consulta desde los parámetros de la URL (``{nombre: valor}``)."""
+        def text(name):
+            value = (params.get(name) or "").strip()
+            return value or None
+
+        try:
+            limit = int(params.get("limit") or DEFAULT_PAGE_SIZE)
+        except ValueError:
+            raise QueryError(f"'limit' debe ser un entero: {params.get('limit')!r}") from None
+        if not 1 <= limit <= max_limit:
+            raise QueryError(f"'limit' debe estar entre 1 y {max_limit}.")
+
+        desde = _parse_date(params["desde"], "desde") if text("desde") else None
+        hasta = _parse_date(params["hasta"], "hasta") if text("hasta") else None
+        if desde and hasta and desde > hasta:
+            raise QueryError("'desde' no puede ser posterior a 'hasta'.")
+        cursor = decode_cursor(params["cursor"]) if text("cursor") else None
+        return cls(text("perito"), text("tipo"), desde, hasta, limit, cursor)
+
+    def cache_key(self):
+        return (self.perito, self.tipo, self.desde, self.hasta, self.limit, self.cursor)
+
+
+########################################
+# Serialización
+########################################
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _to_item(snapshot):
+    item = snapshot.to_dict()
+    item["id"] = snapshot.id
+    return item
+
+
+########################################
+# Lector con caché
+########################################
+class NovedadesReader:
+    """Consulta paginada de la colección de novedades con caché TTL/LRU.
+
+    ``get_page`` devuelve ``(etag, body)`` con el JSON
+    ``{"items": [...], "next_cursor": str | None}`` ya serializado.
+    """
+
+    def __init__(self, db, collection="novedades", ttl=60.0, max_entries=256, max_limit=MAX_PAGE_SIZE):
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_limit = max_limit
+        self._cache = OrderedDict()  # cache_key -> (expira, etag, body)
+        self._lock = threading.Lock()
+        self._generation = 0  # Se incrementa en cada invalidación
+        self.hits = 0
+        self.misses = 0
+        self.documents_read = 0
+
+    def invalidate(self, *_args):
+        """Descarta todas las páginas en caché (se llama tras escribir en Firestore)."""
+        with self._lock:
+            self._cache.clear()
+            self._generation += 1
+
+    def _build_query(self, query):
+        ref = self.db.collection(self.collection)
+        # Los textos se guardan escapados (build_rows): los filtros se escapan igual
+        if query.perito:
+            ref = ref.where("Perito", "==", sanitize_text(query.perito))
+        if query.tipo:
+            ref = ref.where("Tipo", "==", sanitize_text(query.tipo))
+        if query.desde:
+            ref = ref.where(ORDER_FIELD, ">=", query.desde)
+        if query.hasta:
+            # 'hasta' es inclusivo: se compara con el comienzo del día siguiente
+            ref = ref.where(ORDER_FIELD, "<", query.hasta + timedelta(days=1))
+        ref = ref.order_by(ORDER_FIELD, direction="DESCENDING").order_by(DOCUMENT_ID, direction="DESCENDING")
+        if query.cursor:
+            fecha, doc_id = query.cursor
+            ref = ref.start_after({ORDER_FIELD: fecha, DOCUMENT_ID: doc_id})
+        # Un documento extra indica si hay página siguiente
+        return ref.limit(query.limit + 1)
+
+    def _fetch(self, query):
+        snapshots = list(self._build_query(query).stream())
+        self.documents_read += len(snapshots)
+        has_more = len(snapshots) > query.limit
+        snapshots = snapshots[: query.limit]
+        items = [_to_item(s) for s in snapshots]
+        next_cursor = None
+        if has_more and snapshots:
+            last = snapshots[-1]
+            next_cursor = encode_cursor(last.get(ORDER_FIELD), last.id)
+        body = json.dumps(
+            {"items": items, "next_cursor": next_cursor}, default=_json_default, ensure_ascii=False
+        ).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        return etag, body
+
+    def get_page(self, query):
+        """Devuelve ``(etag, body)`` de la página, desde la caché si sigue vigente."""
+        key = query.cache_key()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            generation = self._generation
+
+        etag, body = self._fetch(query)
+
+        with self._lock:
+            # Si hubo una escritura mientras se consultaba, no se guarda el resultado
+            if generation == self._generation:
+                self._cache[key] = (time.monotonic() + self.ttl, etag, body)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return etag, body
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "documents_read": self.documents_read,
+            }
+
+
+def etag_matches(if_none_match, etag):
+    """Evalúa un encabezado If-None-Match contra el ETag actual."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return etag in candidates
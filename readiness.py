@@ -0,0 +1,170 @@
+# readiness.py
+#
+# Espera basada en eventos a que la tabla de novedades esté lista: un
+# MutationObserver inyectado con execute_async_script avisa cuando existen
+# filas y el DOM dejó de cambiar durante ``quiet_ms``. Devuelve solo el
+# outerHTML de la tabla, sin leer driver.page_source completo.
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_WAIT_FOR_TABLE_JS = r"""
+const selector = arguments[0], quietMs = arguments[1], timeoutMs = arguments[2];
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let quietTimer = null, hardTimer = null, finished = false;
+let observer = null;
+
+function finish(status) {
+  if (finished) return;
+  finished = true;
+  if (observer) observer.disconnect();
+  clearTimeout(quietTimer);
+  clearTimeout(hardTimer);
+  const rows = document.querySelectorAll(selector);
+  const table = rows.length ? (rows[0].closest('table') || rows[0].parentElement) : null;
+  done({
+    status: status,
+    rows: rows.length,
+    html: table ? table.outerHTML : '',
+    waited_ms: performance.now() - start,
+  });
+}
+
+// Cada mutación reinicia la cuenta: solo se termina cuando hay filas y el
+// DOM estuvo quieto durante quietMs.
+function check() {
+  clearTimeout(quietTimer);
+  if (document.querySelector(selector)) {
+    quietTimer = setTimeout(function () { finish('ready'); }, quietMs);
+  }
+}
+
+observer = new MutationObserver(check);
+observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+hardTimer = setTimeout(function () { finish('timeout'); }, timeoutMs);
+check();
+"""
+
+
+class ReadinessStats:
+    """Tiempo de espera de la tabla, tiempo hasta filas y RSS de Chrome por DNI."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_dni = {}
+
+    def _dni_locked(self, dni):
+        return self._by_dni.setdefault(
+            dni,
+            {
+                "waits": 0,
+                "total_seconds": 0.0,
+                "last_seconds": 0.0,
+                "refreshes": 0,
+                "failures": 0,
+                "sessions": 0,
+                "total_rows_seconds": 0.0,
+                "last_rows_seconds": 0.0,
+                "last_rss_mb": 0.0,
+                "peak_rss_mb": 0.0,
+            },
+        )
+
+    def record(self, dni, seconds, refreshes, ready):
+        with self._lock:
+            s = self._dni_locked(dni)
+            s["waits"] += 1
+            s["total_seconds"] += seconds
+            s["last_seconds"] = seconds
+            s["refreshes"] += refreshes
+            if not ready:
+                s["failures"] += 1
+
+    def record_session(self, dni, rows_seconds, rss_bytes):
+        """Tiempo desde abrir el portal hasta tener filas y memoria de Chrome en ese momento."""
+        rss_mb = rss_bytes / (1024 * 1024)
+        with self._lock:
+            s = self._dni_locked(dni)
+            s["sessions"] += 1
+            s["total_rows_seconds"] += rows_seconds
+            s["last_rows_seconds"] = rows_seconds
+            s["last_rss_mb"] = rss_mb
+            s["peak_rss_mb"] = max(s["peak_rss_mb"], rss_mb)
+
+    def snapshot(self):
+        with self._lock:
+            return {dni: dict(s) for dni, s in self._by_dni.items()}
+
+
+stats = ReadinessStats()
+
+
+class TableReadiness:
+    """Espera la tabla de novedades y devuelve su HTML.
+
+    Solo refresca la página ante un fallo real (timeout sin filas o error
+    de JavaScript), hasta ``max_refreshes`` veces.
+    """
+
+    def __init__(self, selector="tr.MuiBox-root", quiet_ms=500, timeout=30, max_refreshes=2):
+        self.selector = selector
+        self.quiet_ms = quiet_ms
+        self.timeout = timeout
+        self.max_refreshes = max_refreshes
+
+    def _wait_once(self, driver):
+        from selenium.common.exceptions import JavascriptException  # Selenium se importa recién al usarlo
+
+        driver.set_script_timeout(self.timeout + 5)
+        for _ in range(2):
+            try:
+                return driver.execute_async_script(
+                    _WAIT_FOR_TABLE_JS, self.selector, self.quiet_ms, int(self.timeout * 1000)
+                )
+            except JavascriptException as e:
+                # La página navegó mientras se esperaba (p. ej. el redirect del SSO)
+                logger.debug("Espera de tabla interrumpida, se reintenta: %s", e)
+        return None
+
+    def wait_for_table(self, driver, dni=None):
+        """Devuelve el outerHTML de la tabla o lanza TimeoutException si nunca aparecieron filas."""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+
+        start = time.monotonic()
+        refreshes = 0
+        while True:
+            try:
+                result = self._wait_once(driver)
+            except (TimeoutException, WebDriverException) as e:
+                logger.debug("Error esperando la tabla de novedades: %s", e)
+                result = None
+
+            if result and result.get("rows"):
+                waited = time.monotonic() - start
+                stats.record(dni, waited, refreshes, ready=True)
+                if result.get("status") != "ready":
+                    logger.info(
+                        "La tabla del DNI %s seguía cambiando tras %ds; se usa el estado actual.",
+                        dni,
+                        self.timeout,
+                    )
+                logger.debug("Tabla lista para DNI %s en %.1fs (%d filas).", dni, waited, result["rows"])
+                return result["html"]
+
+            if refreshes >= self.max_refreshes:
+                stats.record(dni, time.monotonic() - start, refreshes, ready=False)
+                raise TimeoutException(
+                    f"No aparecieron filas '{self.selector}' tras {refreshes + 1} intentos."
+                )
+            refreshes += 1
+            logger.info(
+                "Intento %d/%d: No se encontraron elementos para DNI %s. Refrescando la página...",
+                refreshes,
+                self.max_refreshes + 1,
+                dni,
+            )
+            driver.refresh()  # Refrescar la página puede ayudar
@@ -0,0 +1,186 @@
+# scheduler.py
+#
+# Planificador asyncio: cada DNI tiene su propia próxima ejecución, la
+# concurrencia se limita con un semáforo dimensionado según CPU y RAM, y un
+# limitador global espacia los inicios de scraping para no saturar el PJN.
+
+import asyncio
+import concurrent.futures
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Memoria aproximada que consume un Chrome headless con el portal abierto
+DEFAULT_WORKER_MB = 600
+# Memoria que se deja libre para el sistema y el propio proceso
+DEFAULT_RESERVE_MB = 512
+# Intervalo mínimo entre ejecuciones de un DNI (acota lo que devuelve interval_fn)
+MIN_INTERVAL_SECONDS = 1
+
+
+def available_memory_mb():
+    """Memoria disponible en MB (psutil si está instalado, si no /proc/meminfo)."""
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available // (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def compute_max_concurrency(per_worker_mb=DEFAULT_WORKER_MB, reserve_mb=DEFAULT_RESERVE_MB, upper=None):
+    """Cantidad de scrapings simultáneos que admite la máquina."""
+    limit = os.cpu_count() or 1
+    mem = available_memory_mb()
+    if mem is not None:
+        limit = min(limit, max(1, (mem - reserve_mb) // per_worker_mb))
+    if upper:
+        limit = min(limit, upper)
+    return max(1, int(limit))
+
+
+class RateLimiter:
+    """Limita los inicios de scraping a ``per_minute`` por minuto (espaciados de forma pareja)."""
+
+    def __init__(self, per_minute):
+        self.min_spacing = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.min_spacing:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_spacing
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncScheduler:
+    """Ejecuta ``job(dni)`` (bloqueante) para cada DNI respetando los límites globales.
+
+    ``job`` corre en un pool de hilos propio del tamaño de la concurrencia
+    máxima, así el semáforo nunca queda esperando hilos libres. Con
+    ``interval_fn(dni)`` cada DNI elige su intervalo después de cada ejecución
+    y con ``should_run(dni)`` se saltea el turno sin ocupar un lugar del
+    semáforo ni del limitador (p. ej. DNIs asignados a otro nodo); en ese
+    caso se vuelve a preguntar a los ``skip_interval`` segundos.
+    """
+
+    def __init__(
+        self,
+        dnis,
+        job,
+        interval_seconds=None,
+        max_concurrency=None,
+        per_minute=None,
+        interval_fn=None,
+        should_run=None,
+        skip_interval=None,
+    ):
+        if interval_seconds is not None and interval_seconds <= 0:
+            raise ValueError("interval_seconds debe ser positivo")
+        self.dnis = list(dnis)
+        self.job = job
+        self.interval = interval_seconds
+        self.interval_fn = interval_fn
+        self.should_run = should_run
+        self.skip_interval = skip_interval or interval_seconds
+        self.max_concurrency = max_concurrency or compute_max_concurrency(upper=len(self.dnis) or 1)
+        self.per_minute = per_minute
+        self.next_run = {}  # dni -> datetime de la próxima ejecución
+
+    async def _run_job(self, dni, semaphore, limiter, executor):
+        async with semaphore:
+            await limiter.wait()
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(executor, self.job, dni)
+            except Exception as e_job:
+                # Este error es si la tarea en sí misma falló catastróficamente.
+                logger.error("Error crítico ejecutando scraping para DNI %s: %s", dni, e_job)
+                return None
+
+    async def _dni_loop(self, dni, semaphore, limiter, executor, stop):
+        scheduled = time.monotonic()
+        while not stop.is_set():
+            if self.should_run is not None and not self.should_run(dni):
+                # Turno salteado: se vuelve a mirar en ``skip_interval`` segundos
+                scheduled = time.monotonic() + self.skip_interval
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.skip_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_job(dni, semaphore, limiter, executor)
+            interval = self.interval_fn(dni) if self.interval_fn else self.interval
+            interval = max(interval, MIN_INTERVAL_SECONDS)  # Con 0 o negativo el ciclo no avanzaría
+
+            # Compensación de deriva: la próxima ejecución se calcula desde la
+            # hora planificada, no desde que terminó el scraping. Si el scraping
+            # tardó más que el intervalo se saltean los turnos perdidos.
+            scheduled += interval
+            now = time.monotonic()
+            if scheduled <= now:
+                missed = math.floor((now - scheduled) / interval) + 1
+                scheduled += missed * interval
+                logger.warning(
+                    "El scraping del DNI %s se atrasó más de un intervalo; se saltean %d turno(s).", dni, missed
+                )
+            self.next_run[dni] = datetime.now() + timedelta(seconds=scheduled - now)
+            logger.info(
+                "Siguiente ejecución para DNI %s a las %s",
+                dni,
+                self.next_run[dni].strftime("%H:%M:%S"),
+            )
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=scheduled - now)
+            except asyncio.TimeoutError:
+                pass
+
+    def _limits(self):
+        logger.info(
+            "Usando hasta %d workers concurrentes (límite de %s inicios por minuto).",
+            self.max_concurrency,
+            self.per_minute or "sin",
+        )
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency)
+        return asyncio.Semaphore(self.max_concurrency), RateLimiter(self.per_minute), executor
+
+    async def run_once(self):
+        """Ejecuta una vez cada DNI y devuelve ``{dni: resultado}``."""
+        semaphore, limiter, executor = self._limits()
+        try:
+            results = await asyncio.gather(
+                *(self._run_job(dni, semaphore, limiter, executor) for dni in self.dnis)
+            )
+        finally:
+            executor.shutdown(wait=True)
+        return dict(zip(self.dnis, results))
+
+    async def run_forever(self, stop=None):
+        """Ejecuta cada DNI cada ``interval_seconds`` hasta que se active ``stop``."""
+        if not self.interval and not self.interval_fn:
+            raise ValueError("run_forever requiere interval_seconds o interval_fn")
+        stop = stop or asyncio.Event()
+        semaphore, limiter, executor = self._limits()
+        try:
+            await asyncio.gather(
+                *(self._dni_loop(dni, semaphore, limiter, executor, stop) for dni in self.dnis)
+            )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
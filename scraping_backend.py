@@ -3,33 +3,78 @@
 import time
 import sys
 import argparse
+import contextlib
 import os
 import glob
-import pandas as pd
+import importlib
+import logging
+import subprocess
+import threading
 from datetime import datetime, timedelta
-import html
-
-# Selenium y BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from bs4 import BeautifulSoup
+from urllib.parse import urlencode, urlparse
+
+# Selenium, lxml (extractor.py) y Firebase se importan recién al usarlos:
+# un --once con el motor http, la API o un worker arrancan sin cargarlos.
+
+# Espera de la tabla por eventos del DOM (MutationObserver)
+from readiness import TableReadiness, stats as readiness_stats
 
+# Perfil liviano de Chrome (bloqueo de recursos, caché en disco)
+from browser_profile import BrowserProfile
+
+# Tiempos y contadores por etapa (/metrics y log JSON)
+import metrics
+
+# Frecuencia de consulta adaptativa por DNI
+from adaptive import ActivityTracker, BusinessHours, parse_hours_range
+
 # Cargar variables de entorno desde un archivo .env si está presente
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Firebase
-import firebase_admin
-from firebase_admin import credentials, firestore
-
 # Para ejecutar scraping en paralelo
-import concurrent.futures
+import asyncio
+from scheduler import AsyncScheduler, compute_max_concurrency
+from pipeline import RowWriter
+
+# Detección de cambios para no reescribir novedades idénticas
+from change_index import ChangeIndex, content_hash
+
+# Commits de Firestore en paralelo, con reintentos
+from firestore_writer import BatchCommitter, FIRESTORE_BATCH_LIMIT
+
+# Buffer local durable entre el scraping y Firestore
+from wal import WalFlusher, WriteAheadLog
+
+# Historial columnar (Arrow) de novedades para reportes sin leer Firestore
+from history import HistoryExporter
+
+# Armado de filas por lotes: escape único, fechas con caché y doc_id precalculado
+from normalize import build_doc_id, build_rows
+
+# Pool de navegadores reutilizables entre ciclos
+from driver_pool import DriverPool, driver_rss
+
+# Scraping en subprocesos aislados, con límites de memoria y tiempo
+from process_workers import ProcessWorkerPool, WorkerError, WorkerTimeout
+
+# Circuit breaker del portal y backoff por credenciales rechazadas
+from breaker import (
+    FAILURE_CREDENTIALS,
+    FAILURE_OTHER,
+    FAILURE_PORTAL,
+    CircuitBreakers,
+    CredentialsRejected,
+)
+
+# Reparto de DNIs entre varios nodos con leases en Firestore
+from sharding import DEFAULT_COLLECTION as DEFAULT_LEASE_COLLECTION, DEFAULT_LEASE_TTL, LeaseManager
+
+# Scraping incremental: marca de agua por DNI para leer solo las novedades nuevas
+from watermark import NEW, STOP, DeltaScan, HighWaterMarks
+
+logger = logging.getLogger(__name__)
 
 
 ########################################
@@ -39,26 +84,57 @@ import concurrent.futures
 # variable de entorno FIREBASE_CRED_PATH.
 FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH")
 
-try:
-    if not firebase_admin._apps:  # Solo inicializar si no hay apps existentes
-        if not FIREBASE_CRED_PATH or not os.path.isfile(FIREBASE_CRED_PATH):
-            raise FileNotFoundError(
-                f"Ruta de credenciales no encontrada o inválida: {FIREBASE_CRED_PATH}"
-            )
-        cred = credentials.Certificate(FIREBASE_CRED_PATH)
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-except Exception as e:
-    print(
-        f"Error fatal: No se pudo inicializar Firebase en scraping_backend.py: {e}"
-    )
-    print(
-        "Asegúrate de que la variable de entorno 'FIREBASE_CRED_PATH' apunta "
-        "a un archivo de credenciales válido."
-    )
-    db = None  # Para evitar más errores si Firebase no se inicializa
-    # Podrías querer que el script termine aquí si Firebase es esencial.
-    # sys.exit("Saliendo debido a error de inicialización de Firebase.")
+
+def _init_firestore(quiet=False):
+    """Inicializa Firebase y devuelve el cliente de Firestore, o None si no se puede."""
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        if not firebase_admin._apps:  # Solo inicializar si no hay apps existentes
+            if not FIREBASE_CRED_PATH or not os.path.isfile(FIREBASE_CRED_PATH):
+                raise FileNotFoundError(
+                    f"Ruta de credenciales no encontrada o inválida: {FIREBASE_CRED_PATH}"
+                )
+            cred = credentials.Certificate(FIREBASE_CRED_PATH)
+            firebase_admin.initialize_app(cred)
+        return firestore.client()
+    except Exception as e:
+        if quiet:
+            logger.warning("Firestore sigue sin estar disponible: %s", e)
+            return None
+        print(
+            f"Error fatal: No se pudo inicializar Firebase en scraping_backend.py: {e}"
+        )
+        print(
+            "Asegúrate de que la variable de entorno 'FIREBASE_CRED_PATH' apunta "
+            "a un archivo de credenciales válido."
+        )
+        # Sin Firestore solo se puede scrapear con el buffer local (--wal),
+        # que guarda las filas hasta que el cliente pueda inicializarse.
+        return None
+
+
+# Cliente de Firestore; se crea recién cuando algo lo necesita (ver get_db)
+db = None
+_db_attempted = False
+_db_lock = threading.Lock()
+
+
+def get_db(retry=False):
+    """Devuelve el cliente de Firestore, inicializándolo al primer uso (None si no se puede).
+
+    Si la inicialización ya falló solo se reintenta con ``retry`` (lo hace el
+    hilo del buffer local hasta que Firestore esté disponible).
+    """
+    global db, _db_attempted
+    if db is None and (retry or not _db_attempted):
+        with _db_lock:
+            if db is None and (retry or not _db_attempted):
+                db = _init_firestore(quiet=_db_attempted)
+                _db_attempted = True
+    return db
+
 
 ########################################
 # Carga de credenciales desde variables de entorno
@@ -78,41 +154,38 @@ usuarios_contrasenas = _load_usuarios_contrasenas()
 
 
 ########################################
-# Funciones auxiliares
+# Configuración de WebDriver (similar a acciones_backend)
 ########################################
-def parse_fecha(value_str):
-    """Parsea una cadena de fecha en formato DD/MM/YYYY a objeto datetime."""
-    if not isinstance(value_str, str):
-        return None  # O manejar como error
-    try:
-        return datetime.strptime(value_str, "%d/%m/%Y")
-    except ValueError:
-        # Podrías intentar otros formatos o devolver None/lanzar error
-        logger.warning(
-            "No se pudo parsear la fecha '%s' con formato DD/MM/YYYY.", value_str
+# Perfil de las sesiones de Chrome; se reemplaza con configure_browser_profile()
+_browser_profile = BrowserProfile(cache_dir=os.getenv("CHROME_CACHE_DIR"))
+
+
+def configure_browser_profile(
+    lean=True, blocked_types=None, cache_dir=None, page_load_strategy=None
+):
+    """Define el perfil de Chrome para los navegadores que se creen a partir de ahora."""
+    global _browser_profile
+    kwargs = {"lean": lean, "cache_dir": cache_dir, "page_load_strategy": page_load_strategy}
+    if blocked_types is not None:
+        kwargs["blocked_types"] = blocked_types
+    _browser_profile = BrowserProfile(**kwargs)
+    if lean:
+        logger.info(
+            "Perfil liviano de Chrome: bloqueando %s; caché en %s; page load '%s'.",
+            ", ".join(_browser_profile.blocked_types) or "solo analítica",
+            cache_dir or "(sin caché compartida)",
+            page_load_strategy or "normal",
         )
-        return None
-
-
-def normalize_causa(causa_str):
-    """Normaliza el string de la causa para usarlo en IDs de documento."""
-    if not isinstance(causa_str, str):
-        return "unknown_causa"
-    return causa_str.replace(" ", "").replace("/", "_").replace("-", "_").lower()
-
+    return _browser_profile
 
-def sanitize_text(value):
-    """Escapa cualquier HTML en los campos de texto."""
-    if not isinstance(value, str):
-        return value
-    return html.escape(value)
 
-
-########################################
-# Configuración de WebDriver (similar a acciones_backend)
-########################################
-def _get_scraper_webdriver():
+def _get_scraper_webdriver(dni_usuario=None):
     """Configura y devuelve una instancia de WebDriver para scraping."""
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")  # Modo headless es preferible para scraping
     chrome_options.add_argument("--disable-gpu")
@@ -122,6 +195,7 @@ def _get_scraper_webdriver():
     chrome_options.add_argument("--disable-application-cache")
     chrome_options.add_argument("--log-level=3")  # Menos logs de Chrome
     chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])  # Suprimir logs de DevTools
+    _browser_profile.apply_to_options(chrome_options, dni_usuario)
 
     # IMPORTANTE: ChromeDriver path
     try:
@@ -141,18 +215,146 @@ def _get_scraper_webdriver():
             )
         service = Service(executable_path=chrome_driver_path)
 
-    return webdriver.Chrome(service=service, options=chrome_options)
+    with metrics.stage("driver_start", dni_usuario):
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+        _browser_profile.apply_to_driver(driver)  # Antes de la primera navegación
+    return driver
+
+
+########################################
+# Login SSO y pool de navegadores
+########################################
+# Las URLs pueden redefinirse por entorno para apuntar a un servidor de prueba.
+PJN_SSO_REALM_URL = os.getenv("PJN_SSO_REALM_URL", "https://sso.pjn.gov.ar/auth/realms/pjn")
+PJN_CLIENT_ID = os.getenv("PJN_CLIENT_ID", "pjn-portal")
+PJN_REDIRECT_URI = os.getenv("PJN_REDIRECT_URI", "https://portalpjn.pjn.gov.ar/")
+PJN_LOGIN_URL = (
+    f"{PJN_SSO_REALM_URL}/protocol/openid-connect/auth?"
+    + urlencode(
+        {
+            "client_id": PJN_CLIENT_ID,
+            "redirect_uri": PJN_REDIRECT_URI,
+            "response_mode": "fragment",
+            "response_type": "code",
+            "scope": "openid",
+        }
+    )
+)
+PJN_PORTAL_HOST = urlparse(PJN_REDIRECT_URI).netloc
+
+# Mensaje de error del formulario de Keycloak (usuario o contraseña inválidos)
+KEYCLOAK_ERROR_SELECTOR = "#input-error, .alert-error"
+
+# Pool compartido entre ciclos; None = un navegador nuevo por scraping
+_driver_pool = None
+
+# Espera de la tabla de novedades por eventos del DOM
+_table_readiness = TableReadiness("tr.MuiBox-root")
+
+
+def configure_driver_pool(max_sessions=None, max_uses=50, max_rss_mb=None):
+    """Activa la reutilización de navegadores entre ciclos de scraping."""
+    global _driver_pool
+    if _driver_pool is not None:
+        _driver_pool.close_all()
+    _driver_pool = DriverPool(
+        _get_scraper_webdriver,
+        max_sessions=max_sessions,
+        max_uses=max_uses,
+        max_rss_mb=max_rss_mb,
+    )
+    return _driver_pool
+
+
+def shutdown_driver_pool():
+    """Cierra todos los navegadores del pool (si está activo)."""
+    global _driver_pool
+    if _driver_pool is not None:
+        _driver_pool.log_stats()
+        _driver_pool.close_all()
+        _driver_pool = None
+
+
+def _on_portal(driver):
+    """Condición de espera: el navegador ya está en el portal (no en el SSO)."""
+    # No alcanza con url_contains: la URL del SSO lleva el host del portal en redirect_uri
+    return urlparse(driver.current_url).netloc == PJN_PORTAL_HOST
+
+
+def _open_portal(driver, dni_usuario, contrasena):
+    """Abre el portal de novedades haciendo login SSO solo si hace falta.
+
+    Si el navegador conserva una sesión SSO vigente, Keycloak redirige
+    directamente al portal. Devuelve True si hubo que completar el login.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver.get(PJN_LOGIN_URL)
+
+    # Login con esperas explícitas: aparece el formulario o ya estamos en el portal
+    WebDriverWait(driver, 20).until(
+        EC.any_of(
+            EC.presence_of_element_located((By.ID, "username")),
+            _on_portal,
+        )
+    )
+    logged_in = False
+    username_inputs = driver.find_elements(By.ID, "username")
+    if username_inputs:
+        username_inputs[0].clear()
+        username_inputs[0].send_keys(dni_usuario)
+        driver.find_element(By.ID, "password").send_keys(contrasena)
+        driver.find_element(By.ID, "kc-login").click()
+        logged_in = True
+        # Esperar el redirect del SSO al portal (las filas las espera
+        # TableReadiness) o el mensaje de error de Keycloak
+        WebDriverWait(driver, 30).until(
+            EC.any_of(_on_portal, EC.presence_of_element_located((By.CSS_SELECTOR, KEYCLOAK_ERROR_SELECTOR)))
+        )
+        if not _on_portal(driver):
+            errors = driver.find_elements(By.CSS_SELECTOR, KEYCLOAK_ERROR_SELECTOR)
+            raise CredentialsRejected(errors[0].text.strip() if errors else "Login SSO rechazado")
+    return logged_in
+
+
+def _release_driver(driver, session, pool, failed=False):
+    """Devuelve el navegador al pool o lo cierra si no se reutiliza."""
+    if session is not None:
+        if failed:
+            pool.discard(session)  # El navegador puede haber quedado en mal estado
+        else:
+            pool.release(session)
+    elif driver:
+        driver.quit()
 
 
 ########################################
 # Scraping para un usuario
 ########################################
-def scrapingPJN(dni_usuario):
-    if not db:  # Verificar si Firebase está disponible
-        return (f"Error crítico: Cliente Firestore no disponible para DNI {dni_usuario}. Saltando scraping.", [])
+def scrapingPJN(dni_usuario, pool=None):
+    """Scrapea las novedades del DNI en Chrome y devuelve ``(resumen, filas)``."""
+    summary, rows, _failure = _scrape_browser(dni_usuario, pool)
+    return summary, rows
+
+
+def _scrape_browser(dni_usuario, pool=None, cutoff=None):
+    """Como ``scrapingPJN`` pero devuelve también el tipo de falla (None, FAILURE_*).
+
+    Con ``cutoff`` (watermark.Cutoff) la tabla se recorre solo hasta la marca
+    de agua del DNI y se devuelven únicamente las novedades nuevas.
+    """
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    from extractor import RowFormatError, extract_row, find_rows, row_text  # lxml
+
+    # Sin Firestore ni buffer local no hay dónde guardar (un worker solo devuelve las filas)
+    if not _is_process_worker and _wal is None and not get_db():
+        return (f"Error crítico: Cliente Firestore no disponible para DNI {dni_usuario}. Saltando scraping.", [], FAILURE_OTHER)
 
     if dni_usuario not in usuarios_contrasenas:
-        return (f"Advertencia: No se encontró el DNI {dni_usuario} en la lista de usuarios. Saltando.", [])
+        return (f"Advertencia: No se encontró el DNI {dni_usuario} en la lista de usuarios. Saltando.", [], FAILURE_OTHER)
 
     datos_usuario = usuarios_contrasenas[dni_usuario]
     contrasena = datos_usuario["contrasena"]
@@ -161,323 +363,629 @@ def scrapingPJN(dni_usuario):
     logger.info(
         "Iniciando scraping para %s (DNI: %s)...", perito_nombre, dni_usuario
     )
+    if pool is None:
+        pool = _driver_pool
     driver = None  # Inicializar driver a None
+    session = None  # Sesión del pool, si se reutilizan navegadores
     try:
-        driver = _get_scraper_webdriver()
-        driver.get(
-            "https://sso.pjn.gov.ar/auth/realms/pjn/protocol/openid-connect/"
-            "auth?client_id=pjn-portal&redirect_uri=https%3A%2F%2Fportalpjn.pjn.gov.ar%2F&"
-            "response_mode=fragment&response_type=code&scope=openid"
-        )
-
-        # Login con esperas explícitas
-        WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "username"))).send_keys(dni_usuario)
-        driver.find_element(By.ID, "password").send_keys(contrasena)
-        driver.find_element(By.ID, "kc-login").click()
-
-        # Esperar a que la página de novedades cargue.
-        # El selector 'tr.MuiBox-root' parece ser para las filas de la tabla.
-        # Aumentar el timeout si la página tarda mucho en cargar.
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "tr.MuiBox-root"))
+        if pool is not None:
+            session = pool.acquire(dni_usuario)
+            driver = session.driver
+        else:
+            driver = _get_scraper_webdriver(dni_usuario)
+
+        login_start = time.monotonic()  # También es el inicio del tiempo hasta filas
+        with metrics.stage("sso_login", dni_usuario):
+            logged_in = _open_portal(driver, dni_usuario, contrasena)
+        if logged_in and session is not None:
+            pool.record_login(session, time.monotonic() - login_start)
+
+        # Esperar (por eventos del DOM) a que la tabla tenga filas y deje de
+        # cambiar. Solo se refresca la página si la espera falla; si nunca
+        # aparecen filas se lanza TimeoutException.
+        with metrics.stage("table_wait", dni_usuario):
+            table_html = _table_readiness.wait_for_table(driver, dni_usuario)
+        readiness_stats.record_session(
+            dni_usuario, time.monotonic() - login_start, driver_rss(driver)
         )
-
-        # Reintentos para obtener elementos si la página carga dinámicamente
-        max_retries = 3
-        elements = []
-        for attempt in range(max_retries):
-            html_code = driver.page_source
-            soup = BeautifulSoup(html_code, "lxml")
-            # El selector original era "tr", class_="MuiBox-root".
-            # MuiBox-root podría ser un div dentro del tr, o el tr mismo.
-            # Si MuiBox-root es un div DENTRO de celdas de la tabla, el selector debe ser más específico.
-            # Asumiendo que 'tr.MuiBox-root' es correcto para las filas.
-            elements = soup.select("tr.MuiBox-root")  # Usar select para CSS selectors
-            if elements:
-                break
-            logger.info(
-                "Intento %d/%d: No se encontraron elementos para %s. Reintentando en 5s...",
-                attempt + 1,
-                max_retries,
-                perito_nombre,
-            )
-            time.sleep(5)
-            driver.refresh()  # Refrescar la página puede ayudar
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "tr.MuiBox-root"))
-            )
+        # El selector original era "tr", class_="MuiBox-root".
+        # Asumiendo que 'tr.MuiBox-root' es correcto para las filas.
+        with metrics.stage("parse", dni_usuario):
+            elements = find_rows(table_html)  # XPath precompilado con lxml
 
         if not elements:
             msg = (
-                f"No se encontraron actualizaciones (elementos 'tr.MuiBox-root') para {perito_nombre} después de varios intentos."
+                f"No se encontraron actualizaciones (elementos 'tr.MuiBox-root') para {perito_nombre}."
             )
             logger.info(msg)
-            if driver:
-                driver.quit()
-            return (msg, [])
+            _release_driver(driver, session, pool)
+            return (msg, [], None)
 
-        summary_text = (
-            f"Scraping para {perito_nombre}: Se encontraron {len(elements)} elementos."
-        )
-        logger.info(summary_text)
-        data_rows = []
+        wait_stats = readiness_stats.snapshot().get(dni_usuario, {})
+        raw_rows = []
+        scan = DeltaScan(cutoff)
+        extract_start = time.perf_counter()
 
         for element_tr in elements:
             try:
-                td_tags = element_tr.find_all("td")  # Buscar 'td' dentro de cada 'tr'
-                if len(td_tags) < 3:  # Verificar que haya suficientes celdas
-                    logger.warning(
-                        "Fila con estructura inesperada para %s, se omite: %s",
-                        perito_nombre,
-                        element_tr.get_text(strip=True, separator=" | "),
-                    )
-                    continue
-
-                tipo_raw = td_tags[0].text.strip()
-                # La fecha parece estar en td_tags[2] según el código original
-                fecha_str = td_tags[2].text.strip()
-
-                # Selectores más robustos para Causa y Nombre (ajustar si la estructura HTML cambia)
-                # Estos selectores son cruciales y deben coincidir exactamente con el HTML.
-                causa_elem = element_tr.select_one("p.MuiTypography-root.MuiTypography-body1.w-full.css-11dlpbt")
-                nombre_elem = element_tr.select_one("p.MuiTypography-root.MuiTypography-body1.w-full.italic.css-4icvzy")
-
-                if causa_elem is None or nombre_elem is None:
-                    logger.warning(
-                        "No se encontró 'Causa' o 'Nombre' en una fila para %s. Fila: %s",
-                        perito_nombre,
-                        element_tr.get_text(strip=True, separator=" | "),
-                    )
-                    continue
-
-                causa = sanitize_text(causa_elem.text.strip())
-                nombre = sanitize_text(nombre_elem.text.strip())
-
-                # Extraer link (aria-label='Ver Causa')
-                link_elem = element_tr.find("a", attrs={"aria-label": "Ver Causa"})
-                link_raw = link_elem.get("href", "") if link_elem else ""
-                link = sanitize_text(link_raw)
-
-                # Mapeo de Tipo
-                tipo_mapeado = "NOVEDAD"
-                if tipo_raw.lower() == "d":  # "d" parece ser el valor original para "NOVEDAD"
-                    tipo_mapeado = "NOVEDAD"
-                elif tipo_raw.lower() == "n":  # "n" para "NOTIFICACION"
-                    tipo_mapeado = "NOTIFICACION"
-                else:  # Otros tipos, usar el valor raw o un default
-                    tipo_mapeado = tipo_raw if tipo_raw else "DESCONOCIDO"
-
-                # Parsear la fecha
-                fecha_dt = parse_fecha(fecha_str)  # Usar la función de parseo
-                if not fecha_dt:
-                    logger.warning(
-                        "Fecha inválida '%s' para %s en causa '%s'. Se usará fecha actual como placeholder o se omitirá.",
-                        fecha_str,
-                        perito_nombre,
-                        causa,
-                    )
-                    # Podrías decidir omitir la fila o usar una fecha por defecto.
-                    # Por ahora, la fila se incluirá con Fecha=None, que luego se manejará.
-
-                row = {
-                    "Perito": sanitize_text(perito_nombre),  # Usar el nombre completo del perito
-                    "Tipo": sanitize_text(tipo_mapeado),
-                    "Causa": causa,
-                    "Nombre": nombre,
-                    "Fecha": fecha_dt,  # Guardar como objeto datetime
-                    "Link": link,
-                    "ScrapedAt": datetime.now()  # Timestamp de cuándo se scrapeó
-                }
-                data_rows.append(row)
-
+                # Los selectores de Causa y Nombre están en extractor.py y deben
+                # coincidir exactamente con el HTML del portal.
+                raw_row = extract_row(element_tr)
+                verdict = scan.check(raw_row)
+                if verdict is STOP:
+                    break  # Las filas que siguen son anteriores a la marca de agua
+                if verdict is NEW:
+                    raw_rows.append(raw_row)
+
+            except RowFormatError as e_format:
+                logger.warning(
+                    "%s para %s, se omite. Fila: %s",
+                    e_format,
+                    perito_nombre,
+                    row_text(element_tr),
+                )
+                continue
             except Exception as e_row:
                 logger.error(
                     "Error procesando una fila para %s: %s. Fila: %s",
                     perito_nombre,
                     e_row,
-                    element_tr.get_text(strip=True, separator=" | "),
+                    row_text(element_tr),
                 )
                 continue
+        # Escape, fechas y doc_ids de todas las filas en una sola pasada
+        data_rows = build_rows(perito_nombre, raw_rows)
 
-        if driver: driver.quit()
-        return (summary_text, data_rows)
+        metrics.observe_stage(
+            "extract", time.perf_counter() - extract_start, dni_usuario, rows=len(data_rows)
+        )
+        summary_text = (
+            f"Scraping para {perito_nombre}: Se encontraron {len(elements)} elementos "
+            f"(tabla lista en {wait_stats.get('last_seconds', 0):.1f}s, "
+            f"filas a los {wait_stats.get('last_rows_seconds', 0):.1f}s, "
+            f"Chrome {wait_stats.get('last_rss_mb', 0):.0f} MB). {scan.describe(len(elements))}"
+        )
+        logger.info(summary_text)
+        _release_driver(driver, session, pool)
+        return (summary_text, data_rows, None)
 
+    except CredentialsRejected as e_login:
+        msg = f"Login rechazado para {perito_nombre}: {e_login}"
+        logger.error(msg)
+        _release_driver(driver, session, pool, failed=True)
+        return (msg, [], FAILURE_CREDENTIALS)
     except TimeoutException:
         msg = (
             f"Timeout durante el scraping para {perito_nombre}. La página no cargó a tiempo o un elemento esperado no apareció."
         )
         logger.error(msg)
-        if driver:
-            driver.quit()
-        return (msg, [])
+        _release_driver(driver, session, pool, failed=True)
+        return (msg, [], FAILURE_PORTAL)
     except WebDriverException as e_wd:
         msg = f"Error de WebDriver durante scraping para {perito_nombre}: {e_wd}"
         logger.error(msg)
-        if driver:
-            driver.quit()
-        return (msg, [])
+        _release_driver(driver, session, pool, failed=True)
+        return (msg, [], FAILURE_PORTAL)
     except Exception as e_main:
         msg = f"Error inesperado durante scraping para {perito_nombre}: {e_main}"
         logger.error(msg)
-        if driver:
-            driver.quit()  # Asegurarse de cerrar el driver en caso de error
-        return (msg, [])
+        _release_driver(driver, session, pool, failed=True)  # Asegurarse de cerrar el driver en caso de error
+        return (msg, [], FAILURE_OTHER)
+
+
+########################################
+# Scraping en procesos aislados
+########################################
+# Workers supervisados para el motor 'browser'; None = hilos en este proceso
+_process_workers = None
+# True dentro de un worker: las filas las guarda el proceso principal
+_is_process_worker = False
+
+
+def _init_process_worker(browser_profile, log_level, log_files):
+    """Inicializa un worker: logging y el mismo perfil de Chrome que el proceso principal."""
+    global _browser_profile, _is_process_worker
+    _is_process_worker = True
+    handlers = [logging.StreamHandler()] + [logging.FileHandler(path) for path in log_files]
+    logging.basicConfig(
+        level=log_level,
+        format=f"%(asctime)s [%(levelname)s] [worker {os.getpid()}] %(message)s",
+        handlers=handlers,
+    )
+    _browser_profile = browser_profile
+
+
+def configure_process_workers(size=None, max_jobs=20, max_rss_mb=None, max_cpu_seconds=None, timeout=None):
+    """Ejecuta scrapingPJN en subprocesos supervisados en lugar de hilos."""
+    global _process_workers
+    shutdown_process_workers()
+    root = logging.getLogger()
+    log_files = [h.baseFilename for h in root.handlers if isinstance(h, logging.FileHandler)]
+    _process_workers = ProcessWorkerPool(
+        "scraping_backend:_scrape_browser",
+        size=size or compute_max_concurrency(upper=len(usuarios_contrasenas) or 1),
+        initializer="scraping_backend:_init_process_worker",
+        initargs=(_browser_profile, root.level, log_files),
+        max_jobs=max_jobs,
+        max_rss_mb=max_rss_mb,
+        max_cpu_seconds=max_cpu_seconds,
+        timeout=timeout,
+        on_recycle=lambda reason: metrics.worker_recycles.inc(reason=reason),
+    )
+    logger.info(
+        "Scraping en %d procesos aislados (reciclados cada %d trabajos, límite %s MB, %s s).",
+        _process_workers.size,
+        max_jobs,
+        max_rss_mb or "sin",
+        timeout or "sin límite de",
+    )
+    return _process_workers
+
+
+def shutdown_process_workers():
+    """Detiene los workers de scraping (si están activos)."""
+    global _process_workers
+    if _process_workers is not None:
+        _process_workers.log_stats()
+        _process_workers.close()
+        _process_workers = None
+
+
+def scrapingPJN_isolated(dni_usuario):
+    """``scrapingPJN`` en un worker aislado; si se supera un límite, el worker se mata y se reemplaza."""
+    summary, rows, _failure = _scrape_isolated(dni_usuario)
+    return summary, rows
+
+
+def _scrape_isolated(dni_usuario, cutoff=None):
+    if _process_workers is None:
+        return _scrape_browser(dni_usuario, cutoff=cutoff)
+    try:
+        return _process_workers.run(dni_usuario, None, cutoff, label=f"DNI {dni_usuario}")
+    except WorkerTimeout as e_timeout:
+        # Un worker colgado hasta el límite de reloj es lo que se ve cuando el portal no responde
+        msg = f"Scraping aislado abortado para DNI {dni_usuario}: {e_timeout}"
+        logger.error(msg)
+        return (msg, [], FAILURE_PORTAL)
+    except WorkerError as e_worker:
+        msg = f"Scraping aislado abortado para DNI {dni_usuario}: {e_worker}"
+        logger.error(msg)
+        return (msg, [], FAILURE_OTHER)
+
+
+########################################
+# Scraping por HTTP (sin navegador)
+########################################
+_http_scraper = None
+
+
+def _browser_sso_cookies(dni_usuario):
+    """Hace el login en un navegador y devuelve sus cookies (incluidas las del SSO)."""
+    datos_usuario = usuarios_contrasenas[dni_usuario]
+    session = None
+    driver = None
+    try:
+        if _driver_pool is not None:
+            session = _driver_pool.acquire(dni_usuario)
+            driver = session.driver
+        else:
+            driver = _get_scraper_webdriver(dni_usuario)
+        _open_portal(driver, dni_usuario, datos_usuario["contrasena"])
+        # get_cookies() solo ve el dominio actual; CDP devuelve también las de sso.pjn.gov.ar
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        _release_driver(driver, session, _driver_pool)
+        return cookies
+    except Exception:
+        _release_driver(driver, session, _driver_pool, failed=True)
+        raise
+
+
+def configure_http_engine(auth="oidc"):
+    """Crea el scraper HTTP; ``auth`` es ``oidc`` (login directo) o ``browser``."""
+    global _http_scraper
+    from http_engine import HttpScraper  # Solo se necesita con --engine http
+
+    _http_scraper = HttpScraper(
+        usuarios_contrasenas,
+        build_rows,
+        browser_cookies=_browser_sso_cookies if auth == "browser" else None,
+    )
+    return _http_scraper
+
+
+def scrapingPJN_http(dni_usuario):
+    """Como ``scrapingPJN`` pero consultando el endpoint JSON del portal."""
+    summary, rows, _failure = _scrape_http(dni_usuario)
+    return summary, rows
+
+
+def _scrape_http(dni_usuario, cutoff=None):
+    if dni_usuario not in usuarios_contrasenas:
+        return (f"Advertencia: No se encontró el DNI {dni_usuario} en la lista de usuarios. Saltando.", [], FAILURE_OTHER)
+
+    perito_nombre = usuarios_contrasenas[dni_usuario]["nombre"]
+    logger.info(
+        "Iniciando scraping HTTP para %s (DNI: %s)...", perito_nombre, dni_usuario
+    )
+    from http_engine import NETWORK_ERRORS
+
+    try:
+        scraper = _http_scraper or configure_http_engine()
+        with metrics.stage("http_scrape", dni_usuario):
+            summary, rows = scraper.scrape(dni_usuario, cutoff)
+        return summary, rows, None
+    except Exception as e_http:
+        msg = f"Error durante scraping HTTP para {perito_nombre}: {e_http}"
+        logger.error(msg)
+        if isinstance(e_http, CredentialsRejected):
+            return (msg, [], FAILURE_CREDENTIALS)
+        return (msg, [], FAILURE_PORTAL if isinstance(e_http, NETWORK_ERRORS) else FAILURE_OTHER)
 
 
 ########################################
 # Guardar en Firestore
 ########################################
+# Índice local de hashes de contenido; None = se escriben todas las filas
+_change_index = None
+
+
+def configure_change_index(path, rebuild=False):
+    """Activa la detección de cambios con un índice SQLite en ``path``.
+
+    Si el índice está vacío (o ``rebuild`` es True) se precarga desde Firestore.
+    """
+    global _change_index
+    _change_index = ChangeIndex(path)
+    if (rebuild or not len(_change_index)) and get_db():
+        _change_index.warm_from_firestore(get_db())
+    return _change_index
+
+
+_batch_committer = None
+_batch_committer_lock = threading.Lock()
+_batch_committer_config = {}
+
+
+def configure_batch_committer(max_workers=4, **kwargs):
+    """Configura el escritor de batches paralelo; se crea en la primera escritura."""
+    global _batch_committer
+    with _batch_committer_lock:
+        if _batch_committer is not None:
+            _batch_committer.close()
+            _batch_committer = None
+        _batch_committer_config.clear()
+        _batch_committer_config.update(kwargs, max_workers=max_workers)
+
+
+def _get_batch_committer():
+    """Devuelve el escritor de batches paralelo, creándolo al primer uso."""
+    global _batch_committer
+    with _batch_committer_lock:
+        if _batch_committer is None:
+            kwargs = dict(_batch_committer_config)
+            kwargs.setdefault("on_batch", metrics.record_batch_commit)
+            _batch_committer = BatchCommitter(get_db(), "novedades", **kwargs)
+        return _batch_committer
+
+
+# Funciones a avisar tras cada escritura (p. ej. la caché de lectura de read_api)
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """Registra ``callback(doc_ids)``; se llama después de guardar documentos en Firestore."""
+    _write_listeners.append(callback)
+
+
+def _notify_write_listeners(doc_ids):
+    for callback in list(_write_listeners):
+        try:
+            callback(doc_ids)
+        except Exception as e:
+            logger.error("Error notificando una escritura en Firestore: %s", e)
+
+
+def _prepare_document(row):
+    """Arma el documento a guardar en Firestore a partir de una fila."""
+    # Firestore maneja datetime directamente (Fecha y ScrapedAt). Los textos
+    # ya vienen escapados de build_rows: no se vuelven a escapar.
+    data_to_save = dict(row)
+
+    # Añadir campos de control/estado por defecto si no existen
+    if 'Aceptada' not in data_to_save:
+        data_to_save['Aceptada'] = False
+    if 'EscritoPresentado' not in data_to_save:
+        data_to_save['EscritoPresentado'] = False
+    if 'Resumen' not in data_to_save:  # Para evitar que falte si resumir_pdf no se ha ejecutado
+        data_to_save['Resumen'] = ""
+    return data_to_save
+
+
 def saveToFirestore(rows_data):
-    if not db:  # Verificar si Firebase está disponible
+    if not get_db():  # Verificar si Firebase está disponible
         logger.error(
             "Cliente Firestore no disponible. No se pueden guardar los datos."
         )
         return 0
+    saved_ids, finished = _save_rows(rows_data)
+    _settle_watermarks(rows_data, finished)
+    return len(saved_ids)
 
+
+def _save_rows(rows_data):
+    """Guarda las filas; devuelve ``(doc_ids guardados, doc_ids que no hay que reintentar)``.
+
+    Los que no hay que reintentar incluyen los guardados, los que no cambiaron
+    y los que no se pudieron preparar (reintentarlos daría el mismo error).
+    """
     if not rows_data:
         logger.info("No hay datos para guardar en Firestore.")
-        return 0
+        return [], set()
 
-    batch = db.batch()
-    saved_count = 0
+    documents = []
+    digests = {}  # doc_id -> hash, para el índice de cambios
+    finished = set()
+    skipped_count = 0
     for row in rows_data:
+        doc_id = None
         try:
-            # Asegurar que 'Fecha' es un objeto datetime para strftime, o manejar si es None
-            fecha_dt = row.get("Fecha")
-            if isinstance(fecha_dt, datetime):
-                fecha_key_str = fecha_dt.strftime("%d-%m-%Y")
-            else:  # Si es None o no es datetime (ej. por error de parseo)
-                fecha_key_str = "unknown_date"  # O manejar de otra forma
-
-            norm_causa_str = normalize_causa(row.get("Causa", ""))
-
-            # Construir ID de documento único y consistente
-            # Incluir DNI o un ID único del perito si 'Perito' (nombre) no es siempre único o puede cambiar.
-            # Por ahora, se usa el nombre del perito como en el original.
-            doc_id = f"{row.get('Perito', 'unknown_perito')}_{row.get('Tipo', 'unknown_type')}_{fecha_key_str}_{norm_causa_str}"
-            doc_id = doc_id.replace(" ", "_").lower()  # Normalizar el ID final
-
-            doc_ref = db.collection("novedades").document(doc_id)
-
-            # Convertir datetime a timestamp de Firestore para la serialización correcta
-            data_to_save = row.copy()
-            if isinstance(data_to_save.get("Fecha"), datetime):
-                data_to_save["Fecha"] = data_to_save["Fecha"]  # Firestore maneja datetime directamente
-            if isinstance(data_to_save.get("ScrapedAt"), datetime):
-                data_to_save["ScrapedAt"] = data_to_save["ScrapedAt"]
-
-            # Sanitizar cualquier cadena antes de guardar
-            for k, v in list(data_to_save.items()):
-                if isinstance(v, str):
-                    data_to_save[k] = sanitize_text(v)
-
-            # Añadir campos de control/estado por defecto si no existen
-            if 'Aceptada' not in data_to_save:
-                data_to_save['Aceptada'] = False
-            if 'EscritoPresentado' not in data_to_save:
-                data_to_save['EscritoPresentado'] = False
-            if 'Resumen' not in data_to_save:  # Para evitar que falte si resumir_pdf no se ha ejecutado
-                data_to_save['Resumen'] = ""
-
-            batch.set(doc_ref, data_to_save,
-                      merge=True)  # Usar merge=True para no sobrescribir campos existentes como 'Aceptada' si ya fueron modificados
-            saved_count += 1
-            if saved_count % 499 == 0:  # Firestore batch limit es 500
-                logger.info(
-                    "Realizando commit de batch de %d documentos...",
-                    saved_count % 499 if saved_count % 499 != 0 else 499,
-                )
-                batch.commit()
-                batch = db.batch()  # Nuevo batch
+            doc_id = build_doc_id(row)
+            data_to_save = _prepare_document(row)
+
+            # Omitir las novedades que ya están guardadas con el mismo contenido
+            if _change_index is not None:
+                digest = content_hash(data_to_save)
+                if not _change_index.has_changed(doc_id, digest):
+                    skipped_count += 1
+                    finished.add(doc_id)
+                    continue
+                digests[doc_id] = digest
+
+            documents.append((doc_id, data_to_save))
         except Exception as e:
             logger.error(
                 "Error preparando datos para Firestore para la fila: %s. Error: %s",
                 row,
                 e,
             )
+            finished.add(doc_id)
             # Podrías decidir si continuar con las otras filas o detenerte.
 
-    if saved_count % 499 != 0:  # Commit del último batch si no estaba vacío
-        logger.info(
-            "Realizando commit del batch final de %d documentos...",
-            saved_count % 499,
+    if skipped_count:
+        metrics.rows_skipped.inc(skipped_count)
+        logger.info("%d registros sin cambios no se reescribieron.", skipped_count)
+    if not documents:
+        return [], finished
+
+    logger.info(
+        "Realizando commit de %d documentos en batches de hasta %d...",
+        len(documents),
+        FIRESTORE_BATCH_LIMIT,
+    )
+    # merge=True para no sobrescribir campos existentes como 'Aceptada' si ya fueron modificados
+    with metrics.stage("save"):
+        outcomes = _get_batch_committer().commit(documents)
+    saved_ids = [doc_id for doc_id, outcome in outcomes.items() if outcome.ok]
+    saved_count = len(saved_ids)
+    if _change_index is not None:
+        _change_index.record((doc_id, digests[doc_id]) for doc_id in saved_ids)
+    if saved_ids:
+        _notify_write_listeners(saved_ids)
+    if saved_count < len(outcomes):
+        logger.error(
+            "%d documentos no pudieron guardarse en Firestore.", len(outcomes) - saved_count
         )
-        batch.commit()
 
     logger.info("Total de %d registros procesados para Firestore.", saved_count)
-    return saved_count
+    finished.update(saved_ids)
+    return saved_ids, finished
+
+
+########################################
+# Buffer local (write-ahead log)
+########################################
+# Filas pendientes de Firestore en disco; None = se escribe directo en Firestore
+_wal = None
+_wal_flusher = None
+
+
+def _ensure_db():
+    """Inicializa Firestore (o lo reintenta si no estaba disponible) antes de vaciar el buffer."""
+    if db is None:
+        if get_db(retry=True) is None:
+            raise ConnectionError("Cliente Firestore no disponible")
+        logger.info("Firestore disponible: se vacía el buffer local.")
+    return db
+
+
+def _flush_wal_rows(rows):
+    _ensure_db()
+    return _save_rows(rows)[1]
+
+
+def _record_wal_state(pending, oldest_seconds):
+    metrics.wal_pending_rows.set(pending)
+    metrics.wal_oldest_seconds.set(round(oldest_seconds, 1))
+
+
+def configure_wal(path, batch_size=FIRESTORE_BATCH_LIMIT):
+    """Guarda cada fila scrapeada en ``path`` (SQLite) y la reenvía a Firestore en segundo plano."""
+    global _wal, _wal_flusher
+    shutdown_wal(drain_timeout=0)
+    _wal = WriteAheadLog(path, build_doc_id)
+    pending = len(_wal)
+    if pending:
+        logger.info("Buffer local %s: %d filas pendientes de ciclos anteriores.", path, pending)
+    _record_wal_state(pending, _wal.oldest_age())
+    _wal_flusher = WalFlusher(_wal, _flush_wal_rows, batch_size=batch_size, on_flush=_record_wal_state)
+    return _wal
+
+
+def _append_to_wal(rows):
+    """Etapa escritora con buffer local: guarda en disco y avisa al hilo que vacía a Firestore."""
+    with metrics.stage("wal_append"):
+        count = _wal.append(rows)
+    _wal_flusher.notify()
+    _settle_watermarks(rows)  # En el buffer local ya están a salvo
+    return count
+
+
+def shutdown_wal(drain_timeout=30):
+    """Intenta vaciar el buffer a Firestore y lo cierra; lo pendiente queda en disco."""
+    global _wal, _wal_flusher
+    if _wal is None:
+        return 0
+    pending = _wal_flusher.drain(drain_timeout) if drain_timeout else len(_wal)
+    _wal_flusher.close()
+    _wal.close()
+    if pending:
+        logger.warning("Quedan %d filas en el buffer local; se enviarán en la próxima ejecución.", pending)
+    _wal = _wal_flusher = None
+    return pending
+
+
+########################################
+# Historial columnar
+########################################
+# Exportador al historial Arrow; None = no se exporta
+_history = None
+
+
+def configure_history(root):
+    """Agrega las filas de cada ciclo al historial columnar en ``root`` (requiere pyarrow).
+
+    Si el historial está vacío se exportan primero las novedades que ya están en Firestore.
+    """
+    global _history
+    shutdown_history()
+    _history = HistoryExporter(root, build_doc_id)
+    if not len(_history) and get_db():
+        _history.backfill_from_firestore(get_db())
+    return _history
+
+
+def _export_history(rows):
+    """Exporta las filas nuevas al historial; un error acá nunca frena el guardado."""
+    try:
+        with metrics.stage("history_export"):
+            _history.export(rows)
+    except Exception as e:
+        logger.error("No se pudieron exportar %d filas al historial: %s", len(rows), e)
+
+
+def shutdown_history():
+    global _history
+    if _history is not None:
+        _history.log_stats()
+        _history.close()
+        _history = None
+
+
+def _new_row_writer():
+    """Etapa escritora del ciclo: al buffer local si está activo, si no directo a Firestore."""
+    save = _append_to_wal if _wal is not None else saveToFirestore
+    if _history is None:
+        return RowWriter(save)
+
+    def export_and_save(rows):
+        _export_history(rows)
+        return save(rows)
+
+    return RowWriter(export_and_save)
 
 
 ########################################
 # Scraping en paralelo para todos
 ########################################
-def run_all_scraping_concurrently():
+# Cada motor devuelve ``(resumen, filas, falla)``; falla es None o un FAILURE_* de breaker.py
+SCRAPING_ENGINES = {
+    "browser": _scrape_browser,
+    "http": _scrape_http,
+}
+
+
+def run_all_scraping_concurrently(
+    engine="browser", max_workers=None, per_minute=None, dnis=None, on_progress=None
+):
+    """Scrapea una vez todos los DNIs (o solo ``dnis``) y guarda las filas en Firestore.
+
+    ``on_progress(evento, dni, datos)`` se llama al empezar y terminar cada DNI.
+    Devuelve ``{"rows": filas obtenidas, "saved": filas guardadas}``.
+    """
     start_time_total = datetime.now()
     logger.info(
         "Inicio de scraping concurrente a las %s",
         start_time_total.strftime("%d/%m/%Y %H:%M:%S"),
     )
 
-    if not db:
+    if _wal is None and not get_db():
         logger.error("Scraping abortado: Cliente Firestore no disponible.")
-        return
+        return {"rows": 0, "saved": 0}
 
-    all_user_dnis = list(usuarios_contrasenas.keys())
-    all_scraped_data = []
+    if dnis is not None:
+        all_user_dnis = list(dnis)
+    elif _lease_manager is not None:
+        all_user_dnis = _lease_manager.owned()  # Solo la parte de este nodo
+    else:
+        all_user_dnis = list(usuarios_contrasenas.keys())
 
-    # Ajustar max_workers según los recursos de tu máquina y los límites del sitio web.
-    # Un número muy alto puede sobrecargar tu sistema o el servidor web.
-    num_workers = min(4, len(all_user_dnis))  # No más de 4 workers o el número de usuarios
-    logger.info("Usando hasta %d workers concurrentes.", num_workers)
+    if _change_index is not None:
+        _change_index.reset_stats()
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-        future_to_dni = {executor.submit(scrapingPJN, dni): dni for dni in all_user_dnis}
-        for future in concurrent.futures.as_completed(future_to_dni):
-            dni = future_to_dni[future]
-            try:
-                summary_msg, user_rows = future.result()
-                # summary_msg ya se imprime dentro de scrapingPJN o al retornar
-                if user_rows:
-                    all_scraped_data.extend(user_rows)
-            except Exception as e_future:
-                # Este error es si la tarea en sí misma (el future) falló catastróficamente.
-                logger.error(
-                    "Error crítico ejecutando scraping para DNI %s: %s", dni, e_future
-                )
+    # Cada usuario entrega sus filas al escritor apenas termina, sin esperar
+    # al resto: el escritor las agrupa en lotes y las guarda en Firestore.
+    writer = _new_row_writer()
+    try:
+        # Si no se indica max_workers, el planificador lo dimensiona según CPU y RAM.
+        scheduler = AsyncScheduler(
+            all_user_dnis,
+            lambda dni: _scrape_and_save(dni, engine, writer, on_progress),
+            max_concurrency=max_workers,
+            per_minute=per_minute,
+        )
+        asyncio.run(scheduler.run_once())
+    finally:
+        writer.close()
 
-    if not all_scraped_data:
+    if not writer.rows_received:
         logger.info("No se obtuvieron datos de ningún usuario después del scraping.")
     else:
         logger.info(
-            "Scraping completado. Total de %d filas obtenidas de todos los usuarios.",
-            len(all_scraped_data),
+            "Scraping completado. Total de %d filas obtenidas de todos los usuarios "
+            "(%d guardadas en %d lotes).",
+            writer.rows_received,
+            writer.rows_written,
+            writer.batches,
         )
 
-        # Convertir a DataFrame para filtrado y ordenamiento (opcional, pero útil)
-        df = pd.DataFrame(all_scraped_data)
-
-        if not df.empty:
-            # Filtrar por fecha si es necesario (ej. solo últimos 30 días)
-            # Asegurarse que 'Fecha' es datetime
-            df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce')
-
-            # Ejemplo de filtro: mantener solo novedades de los últimos 60 días
-            # cutoff_date = datetime.now() - timedelta(days=60)
-            # df = df[df['Fecha'] >= cutoff_date] # Mantener NaT si se desea, o filtrar con .notna()
+    if _change_index is not None:
+        _change_index.log_stats()
+    if _driver_pool is not None:
+        _driver_pool.log_stats()
+    if _process_workers is not None:
+        _process_workers.log_stats()
+    if _breakers is not None:
+        _breakers.log_stats()
+    if _history is not None:
+        _history.log_stats()
+    if _watermarks is not None:
+        _watermarks.log_stats()
+    for dni, wait in sorted(readiness_stats.snapshot().items()):
+        logger.info(
+            "Espera de tabla DNI %s: última %.1fs, promedio %.1fs, refrescos=%d, fallos=%d; "
+            "hasta filas %.1fs (promedio %.1fs); RSS Chrome %.0f MB (pico %.0f MB)",
+            dni,
+            wait["last_seconds"],
+            wait["total_seconds"] / wait["waits"],
+            wait["refreshes"],
+            wait["failures"],
+            wait["last_rows_seconds"],
+            wait["total_rows_seconds"] / wait["sessions"] if wait["sessions"] else 0.0,
+            wait["last_rss_mb"],
+            wait["peak_rss_mb"],
+        )
 
-            # Ordenar por fecha (más recientes primero)
-            df = df.sort_values('Fecha', ascending=False, na_position='last')
-
-            final_data_to_save = df.to_dict(orient='records')
-            logger.info(
-                "Guardando %d filas filtradas/ordenadas en Firestore...",
-                len(final_data_to_save),
-            )
-            saveToFirestore(final_data_to_save)
-        else:
-            logger.info(
-                "El DataFrame resultante del scraping está vacío. No se guardará nada."
-            )
+    metrics.log_stage_summary()
 
     end_time_total = datetime.now()
     logger.info(
@@ -487,11 +995,663 @@ def run_all_scraping_concurrently():
     logger.info(
         "Duración total del proceso: %s", end_time_total - start_time_total
     )
+    metrics.record_cycle("all", (end_time_total - start_time_total).total_seconds())
+    return {"rows": writer.rows_received, "saved": writer.rows_written}
+
+
+# Seguimiento de actividad por DNI; None = todos cada --interval
+_activity_tracker = None
+
+
+def configure_adaptive_polling(
+    state_path,
+    min_minutes,
+    max_minutes,
+    default_minutes,
+    business_hours="07:30-13:30",
+    off_hours_weight=0.25,
+):
+    """Activa la frecuencia adaptativa: cada DNI se consulta según su actividad reciente."""
+    global _activity_tracker
+    start, end = parse_hours_range(business_hours)
+    _activity_tracker = ActivityTracker(
+        state_path,
+        BusinessHours(start, end, off_weight=off_hours_weight),
+        min_interval=min_minutes * 60,
+        max_interval=max_minutes * 60,
+        default_interval=default_minutes * 60,
+    )
+    if get_db():
+        names_to_dni = {datos["nombre"]: dni for dni, datos in usuarios_contrasenas.items()}
+        try:
+            _activity_tracker.warm_from_firestore(get_db(), names_to_dni)
+        except Exception as e:
+            logger.warning("No se pudo estimar la actividad inicial desde Firestore: %s", e)
+    return _activity_tracker
+
+
+def _observe_activity(dni, user_rows):
+    """Registra cuántas filas nuevas trajo la consulta (antes de guardarlas)."""
+    doc_ids = [build_doc_id(row) for row in user_rows]
+    is_known = None
+    if _change_index is not None:
+        # Con el buffer local, una fila ya vista puede seguir esperando a Firestore
+        is_known = _change_index.contains
+        if _wal is not None:
+            is_known = lambda doc_id: _change_index.contains(doc_id) or _wal.contains(doc_id)  # noqa: E731
+    new_rows = _activity_tracker.observe(dni, doc_ids, is_known)
+    if new_rows:
+        logger.info("DNI %s: %d novedades nuevas.", dni, new_rows)
+
+
+def _next_poll_interval(dni):
+    """Intervalo (segundos) hasta la próxima consulta del DNI según su actividad."""
+    seconds = _activity_tracker.next_interval(dni)
+    metrics.poll_interval_seconds.set(round(seconds), dni=dni)
+    logger.info("DNI %s: próxima consulta en %.0f minutos (frecuencia adaptativa).", dni, seconds / 60)
+    return seconds
+
+
+# Breaker del portal y backoff por DNI; None = se scrapea aunque el portal falle
+_breakers = None
+
+
+def configure_breakers(state_path, threshold=3, cooldown=60, max_cooldown=1800, credentials_backoff=900):
+    """Activa el circuit breaker del portal y el backoff de credenciales rechazadas."""
+    global _breakers
+    _breakers = CircuitBreakers(
+        state_path,
+        threshold=threshold,
+        base_cooldown=cooldown,
+        max_cooldown=max_cooldown,
+        credentials_backoff=credentials_backoff,
+    )
+    metrics.breaker_open.set(0 if _breakers.is_closed() else 1)
+    return _breakers
+
+
+def _record_breaker(dni, failure, summary):
+    _breakers.record(dni, failure, summary)
+    metrics.breaker_open.set(0 if _breakers.is_closed() else 1)
+
+
+# Marcas de agua por DNI; None = cada consulta lee la tabla completa
+_watermarks = None
+
+
+def configure_watermarks(state_path, collection=None, full_every_hours=24):
+    """Scraping incremental: cada DNI se lee solo hasta su marca de agua (``collection`` = en Firestore)."""
+    global _watermarks
+    db_client = None
+    if collection:
+        db_client = get_db()
+        if not db_client:
+            raise RuntimeError("Guardar las marcas de agua en Firestore (--watermark-collection) necesita Firestore.")
+    _watermarks = HighWaterMarks(state_path, db_client, collection, full_every=full_every_hours * 3600)
+    return _watermarks
+
+
+def _settle_watermarks(rows, finished=None):
+    """Avisa qué filas ya están a salvo (``finished``; None = todas) para avanzar las marcas de agua."""
+    if _watermarks is not None:
+        _watermarks.settle([build_doc_id(row) for row in rows], finished)
+
+
+# Leases de DNIs compartidos con otros nodos; None = este proceso scrapea todos
+_lease_manager = None
+
+
+def configure_sharding(node_id=None, ttl=DEFAULT_LEASE_TTL, collection=DEFAULT_LEASE_COLLECTION, settle=0.0):
+    """Modo distribuido: este nodo solo scrapea los DNIs cuyo lease tiene en Firestore."""
+    global _lease_manager
+    shutdown_sharding()
+    _lease_manager = LeaseManager(get_db(), list(usuarios_contrasenas), node_id=node_id, collection=collection, ttl=ttl)
+    _lease_manager.start(settle=settle)
+    return _lease_manager
+
+
+def shutdown_sharding():
+    """Libera los leases de este nodo (si el modo distribuido está activo)."""
+    global _lease_manager
+    if _lease_manager is not None:
+        _lease_manager.log_stats()
+        _lease_manager.close()
+        _lease_manager = None
+
+
+def _lease_guard(dni):
+    """Contexto que produce True si este nodo puede scrapear el DNI (y fija su lease)."""
+    if _lease_manager is None:
+        return contextlib.nullcontext(True)
+    return _lease_manager.hold(dni)
+
+
+# DNIs que se están scrapeando ahora (ciclo periódico o pedidos de la API)
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _scrape_and_save(dni, engine, writer, on_progress=None):
+    """Scrapea un DNI y entrega sus filas al escritor sin esperar al resto de los usuarios."""
+    with _in_flight_lock:
+        if dni in _in_flight:
+            # Nunca dos navegadores para la misma cuenta a la vez
+            msg = f"El DNI {dni} ya se está scrapeando; se omite este turno."
+            logger.info(msg)
+            if on_progress:
+                on_progress("skipped", dni, {"summary": msg, "rows": 0})
+            return msg, 0
+        _in_flight.add(dni)
+    try:
+        with _lease_guard(dni) as leased:
+            if not leased:
+                # En modo distribuido cada cuenta la scrapea solo el nodo que tiene su lease
+                msg = f"El DNI {dni} está asignado a otro nodo; se omite."
+                logger.info(msg)
+                if on_progress:
+                    on_progress("skipped", dni, {"summary": msg, "rows": 0})
+                return msg, 0
+            if _breakers is not None and not _breakers.acquire(dni):
+                # Portal caído o cuenta con credenciales rechazadas: no se lanza el navegador
+                msg = f"Se omite el DNI {dni}: {_breakers.blocked_reason(dni) or 'portal del PJN en sondeo'}."
+                logger.info(msg)
+                metrics.breaker_skips.inc(dni=dni)
+                if on_progress:
+                    on_progress("skipped", dni, {"summary": msg, "rows": 0})
+                return msg, 0
+            if on_progress:
+                on_progress("started", dni, {})
+            start = time.monotonic()
+            scrape = _scrape_isolated if engine == "browser" and _process_workers is not None else SCRAPING_ENGINES[engine]
+            cutoff = _watermarks.cutoff(dni) if _watermarks is not None else None
+            failure = FAILURE_OTHER
+            summary_msg = ""
+            try:
+                summary_msg, user_rows, failure = scrape(dni, cutoff=cutoff)
+            finally:
+                if _breakers is not None:
+                    _record_breaker(dni, failure, summary_msg)
+            if _lease_manager is not None:
+                _lease_manager.mark_scraped(dni)
+        # summary_msg ya se imprime dentro de scrapingPJN o al retornar
+        metrics.rows_scraped.inc(len(user_rows), dni=dni)
+        metrics.record_cycle(dni, time.monotonic() - start)
+        # Toda consulta exitosa cuenta, también la que no trajo nada nuevo (con la
+        # marca de agua es lo habitual): así un DNI sin actividad se consulta menos
+        if failure is None and _activity_tracker is not None:
+            _observe_activity(dni, user_rows)
+        if failure is None and _watermarks is not None:
+            # La marca avanza cuando la etapa escritora confirma estas filas
+            _watermarks.begin(
+                dni, user_rows, [build_doc_id(row) for row in user_rows], full=cutoff is None or cutoff.full
+            )
+        if user_rows:
+            writer.put_rows(user_rows)
+        if on_progress:
+            on_progress("finished", dni, {"summary": summary_msg, "rows": len(user_rows)})
+        return summary_msg, len(user_rows)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(dni)
+
+
+# Cada cuánto se revisa si un DNI salteado por los breakers ya puede scrapearse
+BREAKER_RECHECK_SECONDS = 30
+
+
+def run_periodic_scraping(interval_minutes, engine="browser", max_workers=None, per_minute=None):
+    """Scraping periódico: cada DNI tiene su propio turno cada ``interval_minutes``."""
+    if _wal is None and not get_db():
+        logger.error("Scraping abortado: Cliente Firestore no disponible.")
+        return
+
+    metrics.set_interval(interval_minutes * 60)
+    writer = _new_row_writer()
+    should_run = skip_interval = None
+    if _lease_manager is not None or _breakers is not None:
+        # Un DNI recién tomado de otro nodo espera a que se cumpla su intervalo
+        min_gap = _activity_tracker.min_interval if _activity_tracker is not None else interval_minutes * 60
+
+        def should_run(dni):
+            if _breakers is not None and _breakers.blocked_reason(dni) is not None:
+                return False
+            if _lease_manager is None:
+                return True
+            return _lease_manager.holds(dni) and not _lease_manager.scraped_elsewhere_within(dni, min_gap)
+
+        # Se vuelve a mirar seguido para retomar apenas vuelve el portal o llega un lease
+        skip_interval = BREAKER_RECHECK_SECONDS if _breakers is not None else _lease_manager.renew_every
+        if _lease_manager is not None:
+            skip_interval = min(skip_interval, _lease_manager.renew_every)
+    scheduler = AsyncScheduler(
+        list(usuarios_contrasenas.keys()),
+        lambda dni: _scrape_and_save(dni, engine, writer),
+        interval_seconds=interval_minutes * 60,
+        max_concurrency=max_workers,
+        per_minute=per_minute,
+        interval_fn=_next_poll_interval if _activity_tracker is not None else None,
+        should_run=should_run,
+        skip_interval=skip_interval,
+    )
+    try:
+        asyncio.run(scheduler.run_forever())
+    finally:
+        writer.close()
 
 
 ########################################
 # MAIN
 ########################################
+def positive_int(value):
+    """Tipo de argparse para intervalos: entero mayor que cero."""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"debe ser un entero positivo (se recibió {value})")
+    return number
+
+
+def add_runtime_arguments(parser):
+    """Opciones de motor, Firestore y navegador (compartidas con api_server.py)."""
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        help="Máximo de scrapings simultáneos (por defecto se calcula según CPU y RAM disponibles).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=20,
+        help="Máximo de inicios de scraping por minuto contra el PJN (0 = sin límite).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(SCRAPING_ENGINES),
+        default="browser",
+        help="Motor de scraping: 'browser' renderiza el portal en Chrome; 'http' usa el navegador "
+        "u OIDC solo para obtener los tokens y consulta el endpoint JSON de novedades.",
+    )
+    parser.add_argument(
+        "--http-auth",
+        choices=["oidc", "browser"],
+        default="oidc",
+        help="Con --engine http: obtener los tokens con el flujo OIDC directo o con un login en Chrome.",
+    )
+    parser.add_argument(
+        "--commit-workers",
+        type=int,
+        default=4,
+        help="Cantidad de batches de Firestore que se confirman en paralelo.",
+    )
+    parser.add_argument(
+        "--change-index",
+        default=os.getenv("CHANGE_INDEX_PATH", "novedades_index.sqlite3"),
+        help="Archivo SQLite con los hashes de las novedades ya guardadas (solo se escriben las nuevas o modificadas).",
+    )
+    parser.add_argument(
+        "--no-change-index",
+        action="store_true",
+        help="Escribir todas las filas en cada ciclo, aunque no hayan cambiado.",
+    )
+    parser.add_argument(
+        "--rebuild-change-index",
+        action="store_true",
+        help="Volver a precargar el índice de cambios desde Firestore al iniciar.",
+    )
+    parser.add_argument(
+        "--wal",
+        default=os.getenv("WAL_PATH", "novedades_wal.sqlite3"),
+        help="Buffer local (SQLite) donde se guardan las filas antes de enviarlas a Firestore; "
+        "sobrevive caídas de Firestore y reinicios sin volver a scrapear.",
+    )
+    parser.add_argument(
+        "--no-wal",
+        action="store_true",
+        help="Escribir directo en Firestore, sin buffer local (las filas se pierden si Firestore falla).",
+    )
+    parser.add_argument(
+        "--history-dir",
+        default=os.getenv("HISTORY_DIR"),
+        help="Directorio del historial columnar (Arrow, particionado por mes y perito) al que se "
+        "agregan las novedades nuevas de cada ciclo; requiere pyarrow. Por defecto no se exporta.",
+    )
+    parser.add_argument(
+        "--no-driver-pool",
+        action="store_true",
+        help="No reutilizar navegadores entre ciclos (un Chrome nuevo por scraping).",
+    )
+    parser.add_argument(
+        "--pool-max-uses",
+        type=int,
+        default=50,
+        help="Reciclar cada navegador del pool tras esta cantidad de usos.",
+    )
+    parser.add_argument(
+        "--pool-max-rss-mb",
+        type=int,
+        default=1024,
+        help="Reciclar un navegador del pool si su memoria residente supera este límite (MB).",
+    )
+    parser.add_argument(
+        "--process-workers",
+        action="store_true",
+        help="Con --engine browser: scrapear en subprocesos aislados (cada uno en su propio grupo de "
+        "procesos) que se matan si superan los límites y se reciclan tras --worker-max-jobs trabajos.",
+    )
+    parser.add_argument(
+        "--worker-max-jobs",
+        type=int,
+        default=20,
+        help="Con --process-workers: reemplazar cada worker tras esta cantidad de scrapings.",
+    )
+    parser.add_argument(
+        "--worker-max-rss-mb",
+        type=int,
+        default=1536,
+        help="Con --process-workers: memoria máxima (MB) del worker más su Chrome (0 = sin límite).",
+    )
+    parser.add_argument(
+        "--worker-max-cpu",
+        type=int,
+        default=0,
+        help="Con --process-workers: segundos de CPU máximos por scraping (0 = sin límite).",
+    )
+    parser.add_argument(
+        "--worker-timeout",
+        type=int,
+        default=300,
+        help="Con --process-workers: segundos máximos de reloj por scraping antes de matar el worker.",
+    )
+    parser.add_argument(
+        "--browser-profile",
+        choices=["lean", "default"],
+        default="lean",
+        help="'lean' bloquea imágenes, fuentes, estilos y analítica y desactiva servicios de fondo "
+        "de Chrome; 'default' usa el navegador sin cambios (para comparar memoria y tiempos).",
+    )
+    parser.add_argument(
+        "--block-resources",
+        default=",".join(BrowserProfile().blocked_types),
+        help="Tipos de recurso a bloquear con el perfil liviano, separados por coma "
+        "(image, font, stylesheet, media; vacío = solo analítica).",
+    )
+    parser.add_argument(
+        "--chrome-cache-dir",
+        default=os.getenv("CHROME_CACHE_DIR"),
+        help="Directorio base de la caché de disco de Chrome (un subdirectorio por DNI).",
+    )
+    parser.add_argument(
+        "--page-load-eager",
+        action="store_true",
+        help="Usar la estrategia de carga 'eager' (no esperar imágenes ni subrecursos en driver.get).",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Frecuencia adaptativa: consultar más seguido los DNIs con novedades frecuentes y "
+        "menos los inactivos (entre --min-interval y --max-interval; --interval es el valor inicial).",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=positive_int,
+        default=5,
+        help="Con --adaptive: intervalo mínimo en minutos entre consultas de un DNI.",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=positive_int,
+        default=240,
+        help="Con --adaptive: intervalo máximo en minutos entre consultas de un DNI.",
+    )
+    parser.add_argument(
+        "--business-hours",
+        default="07:30-13:30",
+        help="Con --adaptive: horario judicial (hora argentina, lunes a viernes) en formato HH:MM-HH:MM.",
+    )
+    parser.add_argument(
+        "--off-hours-weight",
+        type=float,
+        default=0.25,
+        help="Con --adaptive: peso de las horas fuera del horario judicial (0-1; menor = menos consultas).",
+    )
+    parser.add_argument(
+        "--activity-state",
+        default=os.getenv("ACTIVITY_STATE_PATH", "actividad_dni.json"),
+        help="Con --adaptive: archivo JSON donde se guarda la actividad estimada de cada DNI.",
+    )
+    parser.add_argument(
+        "--no-delta",
+        action="store_true",
+        help="Leer siempre la tabla completa de novedades, sin marca de agua por DNI.",
+    )
+    parser.add_argument(
+        "--watermark-state",
+        default=os.getenv("WATERMARK_STATE_PATH", "marcas_dni.json"),
+        help="Archivo JSON con la marca de agua de cada DNI (la novedad más nueva ya guardada).",
+    )
+    parser.add_argument(
+        "--watermark-collection",
+        default=os.getenv("WATERMARK_COLLECTION"),
+        help="Colección de Firestore donde guardar también las marcas de agua (compartidas entre nodos).",
+    )
+    parser.add_argument(
+        "--full-scan-hours",
+        type=float,
+        default=24,
+        help="Cada cuántas horas se lee la tabla completa de un DNI aunque tenga marca de agua, para "
+        "reconciliar cambios en novedades viejas (0 = nunca).",
+    )
+    parser.add_argument(
+        "--no-breaker",
+        action="store_true",
+        help="Desactivar el circuit breaker del portal y el backoff por credenciales rechazadas.",
+    )
+    parser.add_argument(
+        "--breaker-threshold",
+        type=int,
+        default=3,
+        help="Fallas seguidas (timeouts, errores de WebDriver o de red) que abren el breaker del portal.",
+    )
+    parser.add_argument(
+        "--breaker-cooldown",
+        type=int,
+        default=60,
+        help="Segundos con el breaker abierto antes de sondear el portal (se duplica si el sondeo falla).",
+    )
+    parser.add_argument(
+        "--breaker-max-cooldown",
+        type=int,
+        default=1800,
+        help="Tope en segundos de la espera entre sondeos del portal.",
+    )
+    parser.add_argument(
+        "--credentials-backoff",
+        type=int,
+        default=15,
+        help="Minutos sin reintentar un DNI tras un login rechazado (se duplica en cada rechazo, hasta 24 h).",
+    )
+    parser.add_argument(
+        "--breaker-state",
+        default=os.getenv("BREAKER_STATE_PATH", "breakers.json"),
+        help="Archivo JSON donde se guarda el estado de los breakers entre reinicios.",
+    )
+    parser.add_argument(
+        "--shard",
+        action="store_true",
+        help="Modo distribuido: varios nodos se reparten los DNIs con leases en Firestore; cada nodo "
+        "scrapea solo los suyos y toma los de los nodos caídos.",
+    )
+    parser.add_argument(
+        "--node-id",
+        default=os.getenv("SCRAPER_NODE_ID"),
+        help="Con --shard: identificador de este nodo (por defecto host-PID-aleatorio).",
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        type=int,
+        default=DEFAULT_LEASE_TTL,
+        help="Con --shard: segundos sin renovar tras los que el lease de un nodo caído se puede tomar.",
+    )
+    parser.add_argument(
+        "--lease-collection",
+        default=os.getenv("LEASE_COLLECTION", DEFAULT_LEASE_COLLECTION),
+        help="Con --shard: colección de Firestore con los leases (los latidos van en <colección>_nodes).",
+    )
+    parser.add_argument(
+        "--shard-settle",
+        type=float,
+        default=5.0,
+        help="Con --shard: segundos que se espera a los demás nodos antes del primer reparto.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=int(os.getenv("METRICS_PORT", "0")),
+        help="Puerto local donde servir GET /metrics en formato Prometheus (0 = desactivado).",
+    )
+    parser.add_argument(
+        "--metrics-json-log",
+        default=os.getenv("METRICS_JSON_LOG"),
+        help="Archivo donde registrar cada medición por etapa como una línea JSON.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Medir el arranque (imports en un intérprete nuevo, dependencias diferidas y cliente de "
+        "Firestore) y salir.",
+    )
+
+
+def configure_runtime(args, driver_pool=True):
+    """Aplica las opciones de add_runtime_arguments() antes de scrapear."""
+    if args.metrics_json_log:
+        metrics.configure_json_log(args.metrics_json_log)
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+    configure_batch_committer(args.commit_workers)
+    if not args.no_wal:
+        configure_wal(args.wal)
+    if args.history_dir:
+        configure_history(args.history_dir)
+    configure_browser_profile(
+        lean=args.browser_profile == "lean",
+        blocked_types=[t.strip() for t in args.block_resources.split(",") if t.strip()],
+        cache_dir=args.chrome_cache_dir,
+        page_load_strategy="eager" if args.page_load_eager else None,
+    )
+    if args.engine == "http":
+        configure_http_engine(args.http_auth)
+    if not args.no_change_index:
+        configure_change_index(args.change_index, rebuild=args.rebuild_change_index)
+    if args.adaptive:
+        configure_adaptive_polling(
+            args.activity_state,
+            args.min_interval,
+            args.max_interval,
+            getattr(args, "interval", None) or 15,
+            args.business_hours,
+            args.off_hours_weight,
+        )
+    if not args.no_delta:
+        configure_watermarks(args.watermark_state, args.watermark_collection, args.full_scan_hours)
+    if not args.no_breaker:
+        configure_breakers(
+            args.breaker_state,
+            threshold=args.breaker_threshold,
+            cooldown=args.breaker_cooldown,
+            max_cooldown=args.breaker_max_cooldown,
+            credentials_backoff=args.credentials_backoff * 60,
+        )
+    if args.shard:
+        if not get_db():
+            raise RuntimeError("El modo distribuido (--shard) necesita Firestore para los leases.")
+        configure_sharding(args.node_id, args.lease_ttl, args.lease_collection, args.shard_settle)
+    if args.process_workers and args.engine == "browser":
+        # Cada worker abre y cierra su propio Chrome: no se usa el pool de navegadores
+        configure_process_workers(
+            size=args.max_workers,
+            max_jobs=args.worker_max_jobs,
+            max_rss_mb=args.worker_max_rss_mb or None,
+            max_cpu_seconds=args.worker_max_cpu or None,
+            timeout=args.worker_timeout or None,
+        )
+    elif driver_pool and not args.no_driver_pool:
+        configure_driver_pool(
+            max_sessions=len(usuarios_contrasenas),
+            max_uses=args.pool_max_uses,
+            max_rss_mb=args.pool_max_rss_mb,
+        )
+
+
+########################################
+# Perfil de arranque
+########################################
+# Dependencias que se importan recién al usarlas: (descripción, módulo)
+LAZY_IMPORTS = (
+    ("Selenium (motor browser)", "selenium.webdriver"),
+    ("lxml (extractor.py)", "extractor"),
+    ("requests (motor http)", "http_engine"),
+    ("Firebase / Firestore", "firebase_admin.firestore"),
+    ("pyarrow (--history-dir)", "pyarrow"),
+)
+
+
+def _import_times(module):
+    """``(segundos, [(segundos, import directo)])`` de importar ``module`` en un intérprete nuevo."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    pending = []
+    for line in proc.stderr.splitlines():
+        # "import time: <propio us> | <acumulado us> | <sangría de 2 por nivel><módulo>"
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip(" ")) - 1) // 2
+        seconds = int(parts[1]) / 1e6
+        name = parts[2].strip()
+        if depth == 1:
+            pending.append((seconds, name))
+        elif depth == 0:
+            if name == module:
+                return seconds, sorted(pending, reverse=True)
+            pending = []
+    return None, []
+
+
+def profile_startup(modules=("scraping_backend", "api_server"), top=8):
+    """Informa cuánto tarda el arranque: imports en frío, dependencias diferidas y cliente de Firestore."""
+    for module in modules:
+        total, children = _import_times(module)
+        if total is None:
+            logger.error("No se pudo importar %s para medir el arranque.", module)
+            continue
+        logger.info("import %s: %.0f ms en un intérprete nuevo; imports directos más lentos:", module, total * 1000)
+        for seconds, name in children[:top]:
+            logger.info("  %-40s %8.1f ms", name, seconds * 1000)
+
+    logger.info("Dependencias que se cargan recién al usarlas (en este proceso, en este orden):")
+    for label, module in LAZY_IMPORTS:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.info("  %-40s no disponible (%s)", label, e)
+            continue
+        logger.info("  %-40s %8.1f ms", label, (time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    client = get_db()
+    logger.info(
+        "Cliente de Firestore %s en %.0f ms.",
+        "inicializado" if client else "no disponible",
+        (time.perf_counter() - start) * 1000,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Script de Scraping PJN y subida a Firestore")
     parser.add_argument(
@@ -501,10 +1661,11 @@ def main():
     )
     parser.add_argument(
         "--interval",
-        type=int,
+        type=positive_int,
         default=15,  # Intervalo por defecto de 15 minutos
         help="Intervalo en minutos para ejecuciones periódicas (si --once no está presente). Ejemplo: 60",
     )
+    add_runtime_arguments(parser)
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -526,33 +1687,42 @@ def main():
         handlers=handlers,
     )
 
-    if not db:  # Chequeo final antes de empezar
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    # Con el buffer local no hace falta esperar a Firestore: el hilo que lo
+    # vacía lo inicializa (y reintenta) mientras se scrapea.
+    if args.no_wal and not get_db():  # Chequeo final antes de empezar
         logger.error("No se puede ejecutar main(): Cliente Firestore no disponible.")
         return
 
+    configure_runtime(args, driver_pool=not args.once)
+
     if args.once:
-        run_all_scraping_concurrently()
-    else:
-        logger.info(
-            "Iniciando scraping periódico cada %d minutos. Presiona Ctrl+C para detener.",
-            args.interval,
-        )
-        while True:
-            try:
-                run_all_scraping_concurrently()
-                logger.info(
-                    "Siguiente ejecución programada en %d minutos...", args.interval
-                )
-                time.sleep(args.interval * 60)
-            except KeyboardInterrupt:
-                logger.info("\nScraping periódico detenido por el usuario.")
-                break
-            except Exception as e_loop:
-                logger.error(
-                    "Error inesperado en el bucle principal de scraping: %s", e_loop
-                )
-                logger.info("Reintentando en %d minutos...", args.interval)
-                time.sleep(args.interval * 60)
+        try:
+            run_all_scraping_concurrently(args.engine, args.max_workers, args.rate_limit)
+        finally:
+            shutdown_process_workers()
+            shutdown_sharding()
+            shutdown_wal()
+            shutdown_history()
+        return
+
+    logger.info(
+        "Iniciando scraping periódico cada %d minutos. Presiona Ctrl+C para detener.",
+        args.interval,
+    )
+    try:
+        run_periodic_scraping(args.interval, args.engine, args.max_workers, args.rate_limit)
+    except KeyboardInterrupt:
+        logger.info("\nScraping periódico detenido por el usuario.")
+    finally:
+        shutdown_driver_pool()
+        shutdown_process_workers()
+        shutdown_sharding()
+        shutdown_wal()
+        shutdown_history()
 
 
 if __name__ == "__main__":
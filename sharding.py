@@ -0,0 +1,298 @@
+# sharding.py
+#
+# Modo distribuido: varias instancias de scraping_backend.py se reparten los
+# DNIs con documentos de lease en Firestore (o en el emulador). Cada nodo
+# publica un latido, reclama su parte de los DNIs libres o vencidos, renueva
+# sus leases y libera los que le sobran cuando se suma otro nodo. Los leases
+# de un nodo caído vencen y los toman los demás.
+#
+# Toda escritura de un lease lleva la precondición de que el documento no
+# cambió desde que se leyó (create o update con last_update_time), así dos
+# nodos nunca se quedan con el mismo DNI aunque lo reclamen a la vez.
+
+import logging
+import math
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = "scraper_leases"
+DEFAULT_LEASE_TTL = 90
+# Parte del TTL que se descuenta al decidir si un lease propio sigue vigente:
+# cubre la demora de la escritura y diferencias de reloj entre nodos
+SAFETY_FRACTION = 0.2
+
+
+class LeaseConflict(Exception):
+    """Otro nodo modificó el lease entre la lectura y la escritura."""
+
+
+@lru_cache(maxsize=None)
+def conflict_errors():
+    """Excepciones de precondición fallida (las de google-api-core si está instalado).
+
+    Se resuelven en el primer lease y no al importar, igual que
+    firestore_writer.transient_errors().
+    """
+    errors = [LeaseConflict]
+    try:
+        from google.api_core import exceptions as gexc
+
+        errors += [gexc.AlreadyExists, gexc.FailedPrecondition, gexc.NotFound]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def default_node_id():
+    """Identificador único del proceso: host, PID y un sufijo aleatorio."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class LeaseManager:
+    """Reparte ``dnis`` entre los nodos vivos con leases en ``collection``.
+
+    Cada nodo se queda con a lo sumo ``ceil(DNIs / nodos vivos)`` leases y los
+    renueva cada ``renew_every`` segundos; un lease sin renovar vence a los
+    ``ttl`` segundos. ``holds(dni)`` dice si este nodo puede scrapear el DNI
+    ahora y ``hold(dni)`` además evita que se libere mientras dura el scraping.
+    """
+
+    def __init__(self, db, dnis, node_id=None, collection=DEFAULT_COLLECTION, ttl=DEFAULT_LEASE_TTL, renew_every=None):
+        if renew_every is not None and renew_every >= ttl * (1 - SAFETY_FRACTION):
+            raise ValueError("renew_every debe ser bastante menor que ttl")
+        self._db = db
+        self.dnis = list(dnis)
+        self.node_id = node_id or default_node_id()
+        self.collection = collection
+        self.nodes_collection = f"{collection}_nodes"
+        self.ttl = ttl
+        self.renew_every = renew_every or ttl / 3
+        self._lock = threading.Lock()
+        self._valid_until = {}  # dni -> time.monotonic() hasta el que el lease es propio
+        self._last_scraped = {}  # dni -> (datetime UTC, nodo) del último scraping conocido
+        self._busy = set()  # DNIs que se están scrapeando: no se liberan
+        self._stop = threading.Event()
+        self._thread = None
+        self.claimed = 0
+        self.released = 0
+        self.lost = 0
+
+    ########################################
+    # Consultas locales
+    ########################################
+    def holds(self, dni):
+        """True si este nodo tiene el lease del DNI vigente."""
+        with self._lock:
+            return self._valid_until.get(dni, 0) > time.monotonic()
+
+    @contextmanager
+    def hold(self, dni):
+        """Fija el lease mientras dura el bloque; produce False si el DNI no es de este nodo."""
+        with self._lock:
+            held = self._valid_until.get(dni, 0) > time.monotonic()
+            if held:
+                self._busy.add(dni)
+        try:
+            yield held
+        finally:
+            if held:
+                with self._lock:
+                    self._busy.discard(dni)
+
+    def owned(self):
+        """DNIs con lease vigente de este nodo, en el orden de configuración."""
+        now = time.monotonic()
+        with self._lock:
+            return [dni for dni in self.dnis if self._valid_until.get(dni, 0) > now]
+
+    def mark_scraped(self, dni):
+        """Registra el scraping; se publica en el lease con la próxima escritura."""
+        with self._lock:
+            self._last_scraped[dni] = (_utcnow(), self.node_id)
+
+    def scraped_elsewhere_within(self, dni, seconds):
+        """True si otro nodo scrapeó el DNI hace menos de ``seconds`` (p. ej. antes de pasarnos el lease)."""
+        with self._lock:
+            last = self._last_scraped.get(dni)
+        return last is not None and last[1] != self.node_id and _utcnow() - last[0] < timedelta(seconds=seconds)
+
+    ########################################
+    # Firestore
+    ########################################
+    def _heartbeat(self, now):
+        self._db.collection(self.nodes_collection).document(self.node_id).set(
+            {"expires_at": now + timedelta(seconds=self.ttl), "host": socket.gethostname(), "leases": len(self.owned())}
+        )
+
+    def _live_nodes(self, now):
+        query = self._db.collection(self.nodes_collection).where("expires_at", ">", now)
+        nodes = {snapshot.id for snapshot in query.stream()}
+        nodes.add(self.node_id)
+        return len(nodes)
+
+    def _write_lease(self, dni, snapshot, owner, now):
+        """Escribe el lease con precondición; devuelve False si otro nodo se adelantó."""
+        ref = self._db.collection(self.collection).document(dni)
+        with self._lock:
+            last_scraped, scraped_by = self._last_scraped.get(dni, (None, None))
+        data = {
+            "owner": owner,
+            "expires_at": now + timedelta(seconds=self.ttl) if owner else now,
+            "renewed_at": now,
+            "last_scraped_at": last_scraped,
+            "last_scraped_by": scraped_by,
+        }
+        try:
+            if snapshot is None or not snapshot.exists:
+                ref.create(data)
+            else:
+                ref.update(data, option=self._db.write_option(last_update_time=snapshot.update_time))
+        except conflict_errors():
+            return False
+        return True
+
+    def _grant(self, dni, started):
+        with self._lock:
+            self._valid_until[dni] = started + self.ttl * (1 - SAFETY_FRACTION)
+
+    def _revoke(self, dni, force=False):
+        """Deja de considerar propio el lease; no lo hace si se está scrapeando (salvo ``force``)."""
+        with self._lock:
+            if dni in self._busy and not force:
+                return False
+            self._valid_until.pop(dni, None)
+            return True
+
+    def rebalance(self):
+        """Un turno: latido, renovación de los leases propios y reparto de los libres."""
+        started = time.monotonic()
+        now = _utcnow()
+        self._heartbeat(now)
+        nodes = self._live_nodes(now)
+        target = math.ceil(len(self.dnis) / nodes)
+        wanted = set(self.dnis)
+        leases = {s.id: s for s in self._db.collection(self.collection).stream() if s.id in wanted}
+
+        owned, free = [], []
+        for dni in self.dnis:
+            snapshot = leases.get(dni)
+            data = (snapshot.to_dict() or {}) if snapshot is not None else {}
+            if data.get("last_scraped_at"):
+                with self._lock:
+                    current = self._last_scraped.get(dni)
+                    if current is None or data["last_scraped_at"] > current[0]:
+                        self._last_scraped[dni] = (data["last_scraped_at"], data.get("last_scraped_by"))
+            if data.get("owner") == self.node_id:
+                owned.append(dni)
+            elif not data.get("owner") or data["expires_at"] <= now:
+                free.append(dni)
+            else:
+                self._revoke(dni, force=True)  # Lo tomó otro nodo (p. ej. tras una pausa larga)
+
+        # Con un nodo nuevo sobran leases: se liberan los que no se están scrapeando
+        excess = len(owned) - target
+        for dni in reversed(list(owned)):
+            if excess <= 0:
+                break
+            if self._revoke(dni):
+                owned.remove(dni)
+                excess -= 1
+                if self._write_lease(dni, leases.get(dni), None, now):
+                    self.released += 1
+                    logger.info("Lease del DNI %s liberado para otro nodo (%d nodos vivos).", dni, nodes)
+
+        for dni in owned:
+            if self._write_lease(dni, leases.get(dni), self.node_id, now):
+                self._grant(dni, started)
+            else:
+                self._revoke(dni, force=True)
+                self.lost += 1
+                logger.warning("Se perdió el lease del DNI %s: lo tomó otro nodo.", dni)
+
+        # Orden aleatorio para que los nodos que arrancan juntos no compitan por los mismos DNIs
+        random.shuffle(free)
+        holding = len(self.owned())
+        for dni in free:
+            if holding >= target:
+                break
+            if self._write_lease(dni, leases.get(dni), self.node_id, now):
+                self._grant(dni, started)
+                holding += 1
+                self.claimed += 1
+                previous = (leases[dni].to_dict() or {}).get("owner") if dni in leases else None
+                if previous:
+                    logger.info("Lease del DNI %s tomado del nodo caído %s.", dni, previous)
+                else:
+                    logger.info("Lease del DNI %s reclamado.", dni)
+        return self.owned()
+
+    ########################################
+    # Ciclo de vida
+    ########################################
+    def _run(self):
+        while not self._stop.wait(self.renew_every):
+            try:
+                self.rebalance()
+            except Exception as e:
+                # Sin renovar, los leases vencen solos y holds() pasa a False
+                logger.error("Error renovando los leases del nodo %s: %s", self.node_id, e)
+
+    def start(self, settle=0.0):
+        """Se anuncia, espera ``settle`` segundos a los demás nodos, reclama su parte y renueva en un hilo."""
+        self._heartbeat(_utcnow())
+        if settle:
+            time.sleep(settle)
+        owned = self.rebalance()
+        logger.info(
+            "Nodo %s: %d de %d DNIs asignados (leases de %ds).", self.node_id, len(owned), len(self.dnis), self.ttl
+        )
+        self._thread = threading.Thread(target=self._run, name="leases", daemon=True)
+        self._thread.start()
+        return owned
+
+    def close(self, release=True):
+        """Detiene la renovación y libera los leases para que otro nodo los tome enseguida.
+
+        Con ``release=False`` los leases quedan hasta vencer, como si el nodo se cayera.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not release:
+            with self._lock:
+                self._valid_until.clear()
+            return
+        now = _utcnow()
+        wanted = set(self.owned())
+        try:
+            for snapshot in self._db.collection(self.collection).stream():
+                if snapshot.id in wanted and self._write_lease(snapshot.id, snapshot, None, now):
+                    self.released += 1
+            self._db.collection(self.nodes_collection).document(self.node_id).delete()
+        except Exception as e:
+            logger.warning("No se pudieron liberar los leases del nodo %s (vencerán solos): %s", self.node_id, e)
+        with self._lock:
+            self._valid_until.clear()
+
+    def log_stats(self):
+        logger.info(
+            "Leases del nodo %s: %d vigentes, %d reclamados, %d liberados, %d perdidos.",
+            self.node_id,
+            len(self.owned()),
+            self.claimed,
+            self.released,
+            self.lost,
+        )
@@ -0,0 +1,11 @@
+# tests/conftest.py
+#
+# Los tests importan los módulos del repo y los dobles de benchmarks/
+# (stub_pjn.py, fake_firestore.py) igual que los benchmarks.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,22 @@
+# tests/test_adaptive.py
+
+from datetime import datetime, timedelta
+
+from adaptive import ActivityTracker
+from fake_firestore import InMemoryFirestore
+from normalize import build_rows
+
+PERITO = "GÓMEZ, ANA & ASOC."
+
+
+def test_warm_from_firestore_matches_escaped_perito_names():
+    db = InMemoryFirestore()
+    fecha = (datetime.now() - timedelta(days=2)).strftime("%d/%m/%Y")
+    rows = build_rows(PERITO, [("d", fecha, f"CIV {i}/2024", "", "") for i in range(6)])
+    for row in rows:
+        db.collection("novedades").document(row.doc_id).set(dict(row))
+    tracker = ActivityTracker()
+
+    assert tracker.warm_from_firestore(db, {PERITO: "1", "OTRO PERITO": "2"}) == 2
+    assert tracker._state["1"]["rate"] > 0
+    assert tracker._state["2"]["rate"] == 0
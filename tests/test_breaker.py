@@ -0,0 +1,68 @@
+# tests/test_breaker.py
+
+from breaker import CLOSED, FAILURE_CREDENTIALS, FAILURE_OTHER, FAILURE_PORTAL, HALF_OPEN, OPEN, CircuitBreakers
+
+
+def open_breaker(breakers, dni="1"):
+    for _ in range(breakers.threshold):
+        assert breakers.acquire(dni)
+        breakers.record(dni, FAILURE_PORTAL)
+    assert breakers.state() == OPEN
+
+
+def test_other_failures_do_not_reset_consecutive_portal_failures():
+    breakers = CircuitBreakers(threshold=3)
+    for failure in (FAILURE_PORTAL, FAILURE_OTHER, FAILURE_PORTAL, FAILURE_OTHER, FAILURE_PORTAL):
+        breakers.acquire("1")
+        breakers.record("1", failure)
+    assert breakers.state() == OPEN
+
+
+def test_other_failure_does_not_close_an_open_breaker():
+    breakers = CircuitBreakers(threshold=1, base_cooldown=0)
+    open_breaker(breakers)
+    # DNI sin credenciales configuradas: nunca se contactó el portal
+    assert breakers.acquire("2")
+    assert breakers.state() == HALF_OPEN
+    breakers.record("2", FAILURE_OTHER)
+    assert breakers.state() == HALF_OPEN
+    # El sondeo quedó libre: el siguiente DNI sondea de verdad
+    assert breakers.acquire("3")
+    breakers.record("3", None)
+    assert breakers.state() == CLOSED
+
+
+def test_rejected_credentials_reach_the_portal_and_close_it():
+    breakers = CircuitBreakers(threshold=1, base_cooldown=0)
+    open_breaker(breakers)
+    assert breakers.acquire("2")
+    breakers.record("2", FAILURE_CREDENTIALS, "bad password")
+    assert breakers.state() == CLOSED
+    assert breakers.blocked_reason("2")
+
+
+def test_only_the_probe_dni_decides_a_half_open_breaker():
+    breakers = CircuitBreakers(threshold=1, base_cooldown=0)
+    assert breakers.acquire("late")  # Arrancó antes de que se abriera el breaker
+    open_breaker(breakers)
+    assert breakers.acquire("probe")
+    assert not breakers.acquire("other")
+    breakers.record("late", None)
+    assert breakers.state() == HALF_OPEN
+    assert breakers.blocked_reason("other") == "portal del PJN en sondeo"
+    breakers.record("probe", FAILURE_PORTAL)
+    assert breakers.state() == OPEN
+
+
+def test_late_portal_failure_does_not_count_as_a_failed_probe():
+    breakers = CircuitBreakers(threshold=1, base_cooldown=5)
+    assert breakers.acquire("late")
+    open_breaker(breakers)
+    breakers._portal["open_until"] = None  # Espera vencida
+    assert breakers.acquire("probe")
+    breakers.record("late", FAILURE_PORTAL)
+    assert breakers.state() == HALF_OPEN
+    assert breakers.snapshot()["portal"]["cooldown"] == 5
+    breakers.record("probe", None)
+    assert breakers.state() == CLOSED
+    assert breakers.acquire("other")
@@ -0,0 +1,72 @@
+# tests/test_driver_pool.py
+
+import threading
+
+import pytest
+
+from driver_pool import DriverPool, PoolExhausted
+
+
+class FakeDriver:
+    live = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, dni):
+        self.dni = dni
+        self.current_url = "about:blank"
+        with FakeDriver.lock:
+            FakeDriver.live += 1
+            FakeDriver.peak = max(FakeDriver.peak, FakeDriver.live)
+
+    def quit(self):
+        with FakeDriver.lock:
+            FakeDriver.live -= 1
+
+
+@pytest.fixture(autouse=True)
+def reset_counters():
+    FakeDriver.live = FakeDriver.peak = 0
+
+
+def test_acquire_waits_for_a_free_session_instead_of_growing():
+    pool = DriverPool(FakeDriver, max_sessions=2, acquire_timeout=5)
+    a = pool.acquire("a")
+    pool.acquire("b")
+    acquired = threading.Event()
+
+    def third():
+        pool.acquire("c")
+        acquired.set()
+
+    thread = threading.Thread(target=third)
+    thread.start()
+    assert not acquired.wait(0.2)  # Los dos navegadores están en uso
+    pool.release(a)
+    assert acquired.wait(5)
+    thread.join()
+
+    assert FakeDriver.peak == 2
+    assert not pool.stats()["a"]["alive"]  # Se desalojó para abrir el de "c"
+    pool.close_all()
+    assert FakeDriver.live == 0
+
+
+def test_acquire_fails_when_no_session_is_released_in_time():
+    pool = DriverPool(FakeDriver, max_sessions=1, acquire_timeout=0.1)
+    pool.acquire("a")
+    with pytest.raises(PoolExhausted):
+        pool.acquire("b")
+    assert FakeDriver.peak == 1
+
+
+def test_failed_browser_start_frees_its_slot():
+    def factory(dni):
+        if dni == "roto":
+            raise RuntimeError("chromedriver no arrancó")
+        return FakeDriver(dni)
+
+    pool = DriverPool(factory, max_sessions=1, acquire_timeout=0.1)
+    with pytest.raises(RuntimeError):
+        pool.acquire("roto")
+    assert pool.acquire("a").driver.dni == "a"
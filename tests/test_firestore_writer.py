@@ -0,0 +1,88 @@
+# tests/test_firestore_writer.py
+
+from fake_firestore import InMemoryFirestore, TransientError
+from firestore_writer import BatchCommitter
+
+
+def documents(count):
+    return [(f"doc-{i:04d}", {"n": i, "Causa": f"CIV {i}/2024"}) for i in range(count)]
+
+
+def committer(db, **kwargs):
+    kwargs.setdefault("base_delay", 0)
+    return BatchCommitter(db, batch_size=10, max_workers=4, **kwargs)
+
+
+def test_transient_failures_are_retried_without_losing_or_duplicating_writes():
+    db = InMemoryFirestore(failure_rate=0.3, seed=7)
+    batches = []
+    writer = committer(db, max_retries=20, on_batch=lambda size, secs, attempts, ok: batches.append((size, attempts, ok)))
+    try:
+        docs = documents(205)
+        outcomes = writer.commit(docs)
+    finally:
+        writer.close()
+
+    assert set(outcomes) == {doc_id for doc_id, _ in docs}
+    assert all(outcome.ok and outcome.error is None for outcome in outcomes.values())
+    assert db.data["novedades"] == {doc_id: data for doc_id, data in docs}
+    assert db.writes == len(docs)  # Un batch fallido no escribe nada: sin duplicados
+    assert db.failed_commits > 0
+    assert writer.retries == db.failed_commits
+    assert writer.commits == db.commits == 21
+    assert sorted(size for size, _, _ in batches) == [5] + [10] * 20
+    assert sum(attempts - 1 for _, attempts, _ in batches) == writer.retries
+    # Cada documento informa los intentos de su batch
+    assert sum(outcome.attempts - 1 for outcome in outcomes.values()) == sum(
+        size * (attempts - 1) for size, attempts, _ in batches
+    )
+
+
+def test_repeated_doc_ids_keep_the_last_version():
+    db = InMemoryFirestore()
+    writer = committer(db)
+    docs = documents(25)
+    # Misma fila scrapeada dos veces: la primera versión cae en otro batch
+    docs.append(("doc-0003", {"n": 3, "Causa": "CIV 3/2024", "Resumen": "nuevo"}))
+    try:
+        outcomes = writer.commit(docs)
+    finally:
+        writer.close()
+
+    assert len(outcomes) == 25
+    assert db.writes == 25
+    assert db.data["novedades"]["doc-0003"]["Resumen"] == "nuevo"
+
+
+def test_batches_are_given_up_after_max_retries():
+    db = InMemoryFirestore(failure_rate=1.0)
+    writer = committer(db, max_retries=2)
+    try:
+        outcomes = writer.commit(documents(25))
+    finally:
+        writer.close()
+
+    assert len(outcomes) == 25
+    for outcome in outcomes.values():
+        assert not outcome.ok
+        assert outcome.attempts == 3
+        assert isinstance(outcome.error, TransientError)
+    assert db.failed_commits == 3 * 3
+    assert writer.retries == 2 * 3
+    assert db.writes == 0 and "novedades" not in db.data
+
+
+def test_non_transient_errors_are_not_retried():
+    class BrokenFirestore(InMemoryFirestore):
+        def _commit(self, ops):
+            raise ValueError("documento inválido")
+
+    db = BrokenFirestore()
+    writer = committer(db, max_retries=5)
+    try:
+        outcomes = writer.commit(documents(3))
+    finally:
+        writer.close()
+
+    assert [(o.ok, o.attempts, type(o.error)) for o in outcomes.values()] == [(False, 1, ValueError)] * 3
+    assert writer.retries == 0
@@ -0,0 +1,119 @@
+# tests/test_http_engine.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import http_engine
+from breaker import CredentialsRejected
+from http_engine import NETWORK_ERRORS, HttpEngineError, HttpScraper, LoginRejected, PortalUnavailable
+from normalize import build_rows
+from stub_pjn import DESDE_PARAM, LOGIN_ACTION_PATH, REALM_PATH, start_stub_server
+from watermark import Cutoff, row_key
+
+DNI = "20111111111"
+TOKEN_PATH = f"{REALM_PATH}/protocol/openid-connect/token"
+NEWEST = datetime(2025, 3, 1)
+
+
+def items(count):
+    """Una novedad por día, de la más nueva a la más vieja."""
+    return [
+        {
+            "tipo": "d",
+            "fecha": (NEWEST - timedelta(days=i)).strftime("%d/%m/%Y"),
+            "causa": f"CIV {10000 + i}/2024",
+            "caratula": f"PEREZ C/ EMPRESA {i} S.A.",
+            "link": f"/causa/{i}",
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, state = start_stub_server(items(25), passwords={DNI: "secreta"})
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(http_engine, "PJN_SSO_REALM_URL", f"{base}{REALM_PATH}")
+    monkeypatch.setattr(http_engine, "PJN_REDIRECT_URI", f"{base}/")
+    monkeypatch.setattr(http_engine, "PJN_NOVEDADES_API_URL", f"{base}/api/novedades")
+    monkeypatch.setattr(http_engine, "PJN_NOVEDADES_PAGE_SIZE", 10)
+    monkeypatch.setattr(http_engine, "PJN_NOVEDADES_DESDE_PARAM", "")
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def scraper(password="secreta"):
+    return HttpScraper({DNI: {"contrasena": password, "nombre": "PERITO TEST"}}, build_rows)
+
+
+def test_login_and_paging(stub):
+    _summary, rows = scraper().scrape(DNI)
+    assert [row["Causa"] for row in rows] == [item["causa"] for item in items(25)]
+    assert stub.hits["/api/novedades"] == 3
+    assert stub.hits[LOGIN_ACTION_PATH] == 1
+    assert stub.queries["/api/novedades"] == {"page": "2", "size": "10"}
+
+
+def test_expired_token_is_refreshed_without_logging_in_again(stub):
+    http = scraper()
+    http.scrape(DNI)
+    first = http._tokens[DNI].access_token
+    http._tokens[DNI].expires_at = 0  # Venció el access token, no el refresh
+    http.scrape(DNI)
+    assert http._tokens[DNI].access_token != first
+    assert stub.hits[TOKEN_PATH] == 2
+    assert stub.hits[LOGIN_ACTION_PATH] == 1
+
+
+def test_rejected_password_raises_login_rejected(stub):
+    with pytest.raises(LoginRejected) as excinfo:
+        scraper(password="otra").scrape(DNI)
+    assert isinstance(excinfo.value, CredentialsRejected)
+    assert "/api/novedades" not in stub.hits
+
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_sso_outage_is_a_portal_failure_not_rejected_credentials(stub, status):
+    stub.login_status = status
+    with pytest.raises(PortalUnavailable) as excinfo:
+        scraper().scrape(DNI)
+    assert not isinstance(excinfo.value, CredentialsRejected)
+    assert isinstance(excinfo.value, NETWORK_ERRORS)  # _scrape_http lo registra como FAILURE_PORTAL
+
+
+def cutoff_at(index):
+    item = items(25)[index]
+    fecha, causa, tipo = row_key(item["tipo"], item["fecha"], item["causa"])
+    return Cutoff(fecha, causa, tipo, [(causa, tipo)])
+
+
+def test_watermark_stops_paging(stub):
+    _summary, rows = scraper().scrape(DNI, cutoff_at(5))
+    assert len(rows) == 5
+    assert stub.hits["/api/novedades"] == 1
+    assert DESDE_PARAM not in stub.queries["/api/novedades"]
+
+
+def test_watermark_sends_the_delta_parameter(stub, monkeypatch):
+    monkeypatch.setattr(http_engine, "PJN_NOVEDADES_DESDE_PARAM", DESDE_PARAM)
+    _summary, rows = scraper().scrape(DNI, cutoff_at(15))
+    assert len(rows) == 15
+    assert stub.queries["/api/novedades"][DESDE_PARAM] == "2025-02-14"
+    assert stub.hits["/api/novedades"] == 2  # 16 novedades desde la marca, no 25
+
+
+def test_full_reconciliation_ignores_the_delta_parameter(stub, monkeypatch):
+    monkeypatch.setattr(http_engine, "PJN_NOVEDADES_DESDE_PARAM", DESDE_PARAM)
+    cutoff = cutoff_at(5)
+    cutoff.full = True
+    _summary, rows = scraper().scrape(DNI, cutoff)
+    assert len(rows) == 25
+    assert DESDE_PARAM not in stub.queries["/api/novedades"]
+
+
+def test_scraper_requires_the_novedades_endpoint(monkeypatch):
+    monkeypatch.setattr(http_engine, "PJN_NOVEDADES_API_URL", "")
+    with pytest.raises(HttpEngineError, match="PJN_NOVEDADES_API_URL"):
+        scraper()
@@ -0,0 +1,60 @@
+# tests/test_jobs.py
+
+import threading
+
+from jobs import ScrapeJobManager
+
+
+def collect_events(job, timeout=5):
+    events, last_seq = [], 0
+    while not events or events[-1][1] != "finished":
+        batch = job.wait_events(last_seq, timeout)
+        assert batch or not job.finished, "el trabajo terminó sin emitir 'finished'"
+        events.extend(batch)
+        last_seq = events[-1][0] if events else 0
+    return events
+
+
+def test_finished_status_and_event_are_published_together():
+    release = threading.Event()
+    seen = []
+
+    def run(dnis, on_progress):
+        on_progress("finished", "1", {"rows": 3, "summary": "ok"})
+        release.wait(5)
+        return {"rows": 3}
+
+    manager = ScrapeJobManager(run, lambda: ["1"])
+    job, merged = manager.submit()
+    assert not merged
+
+    def watch():
+        # Quien ve el trabajo terminado tiene que ver también el evento
+        while True:
+            with job._changed:
+                if job.finished:
+                    seen.append(job.events[-1][1])
+                    return
+                job._changed.wait(1)
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    release.set()
+    events = collect_events(job)
+    watcher.join(5)
+
+    assert [kind for _, kind, _ in events] == ["queued", "started", "progress", "finished"]
+    assert events[-1][2]["status"] == "done" and events[-1][2]["result"] == {"rows": 3}
+    assert seen == ["finished"]
+    assert job.to_dict()["status"] == "done"
+
+
+def test_failed_job_reports_the_error():
+    def run(dnis, on_progress):
+        raise RuntimeError("portal caído")
+
+    manager = ScrapeJobManager(run, lambda: ["1", "2"])
+    job, _ = manager.submit("2")
+    events = collect_events(job)
+    assert events[-1][2]["status"] == "failed"
+    assert job.error == "portal caído" and job.finished_at is not None
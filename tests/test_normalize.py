@@ -0,0 +1,36 @@
+# tests/test_normalize.py
+
+import html
+
+import pytest
+
+from bench_normalize import PERITO, check_equivalence, legacy_build_doc_id, legacy_build_row, raw_rows
+from normalize import build_doc_id, build_rows
+from scraping_backend import _prepare_document
+
+
+def strip_scraped_at(row):
+    return {k: v for k, v in dict(row).items() if k != "ScrapedAt"}
+
+
+def test_batch_rows_match_the_legacy_path():
+    assert check_equivalence(raw_rows(2000)) == []
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        ("d", "03/03/2025", "CIV 12345/2024", "PEREZ C/ GOMEZ & CIA", "/causa/1?a=1&b=2"),
+        ("n", "31/02/2024", "COM - 7 / 2024 <script>", '"Q" <i>', ""),
+        ("X <b>", "", None, None, None),
+        ("", "01/01/2025", "CAF 1/2025", "", "/causa/2"),
+    ],
+)
+def test_each_field_is_escaped_once_and_doc_ids_match(raw):
+    legacy = legacy_build_row(PERITO, *raw)
+    (row,) = build_rows(PERITO, [raw])
+    assert strip_scraped_at(row) == strip_scraped_at(legacy)
+    assert build_doc_id(row) == row.doc_id == legacy_build_doc_id(legacy)
+    document = _prepare_document(row)
+    assert document["Perito"] == html.escape(PERITO)
+    assert (document["Aceptada"], document["EscritoPresentado"], document["Resumen"]) == (False, False, "")
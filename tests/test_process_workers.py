@@ -0,0 +1,26 @@
+# tests/test_process_workers.py
+
+import pytest
+
+from process_workers import ProcessWorkerPool, WorkerError
+
+
+def test_worker_dying_before_the_job_is_sent_is_retired():
+    pool = ProcessWorkerPool("operator:add", size=1)
+    try:
+        assert pool.run(1, 2) == 3
+        (worker,) = pool._workers
+        worker.process.kill()
+        worker.process.wait()
+        worker.alive = lambda: True  # Muere justo después del chequeo de run()
+
+        with pytest.raises(WorkerError, match="cerró el canal"):
+            pool.run(2, 3)
+        assert worker not in pool._workers
+        assert pool.stats["recycled"] == 1
+
+        # El lugar vuelve al pool vacío: el próximo trabajo arranca otro worker
+        assert pool.run(3, 4) == 7
+        assert pool.stats["started"] == 2
+    finally:
+        pool.close()
@@ -0,0 +1,23 @@
+# tests/test_read_api.py
+
+import json
+from datetime import datetime
+
+from fake_firestore import InMemoryFirestore
+from normalize import build_rows
+from read_api import NovedadesReader, PageQuery
+
+
+def test_perito_and_tipo_filters_match_escaped_fields():
+    db = InMemoryFirestore()
+    for perito, tipo in (("GÓMEZ, ANA & ASOC.", "x<y"), ("PEREZ", "d")):
+        for row in build_rows(perito, [(tipo, "03/03/2025", f"CIV {perito[:3]}/2024", "", "")]):
+            db.collection("novedades").document(row.doc_id).set(dict(row, ScrapedAt=datetime(2025, 3, 3)))
+    reader = NovedadesReader(db)
+
+    _etag, body = reader.get_page(PageQuery(perito="GÓMEZ, ANA & ASOC."))
+    items = json.loads(body)["items"]
+    assert [item["Perito"] for item in items] == ["GÓMEZ, ANA &amp; ASOC."]
+
+    _etag, body = reader.get_page(PageQuery(tipo="x<y"))
+    assert len(json.loads(body)["items"]) == 1
@@ -0,0 +1,39 @@
+# tests/test_scheduler.py
+
+import argparse
+import asyncio
+
+import pytest
+
+import scheduler
+from scheduler import AsyncScheduler
+from scraping_backend import positive_int
+
+
+@pytest.mark.parametrize("returned", [0, -5])
+def test_non_positive_interval_fn_is_clamped(monkeypatch, returned):
+    monkeypatch.setattr(scheduler, "MIN_INTERVAL_SECONDS", 0.05)
+    runs = []
+
+    async def main():
+        stop = asyncio.Event()
+
+        def job(dni):
+            runs.append(dni)
+            if len(runs) == 3:
+                loop.call_soon_threadsafe(stop.set)
+
+        loop = asyncio.get_running_loop()
+        sched = AsyncScheduler(["1"], job, interval_fn=lambda dni: returned, max_concurrency=1)
+        await asyncio.wait_for(sched.run_forever(stop), timeout=5)
+
+    asyncio.run(main())
+    assert runs == ["1"] * 3
+
+
+def test_non_positive_interval_is_rejected():
+    with pytest.raises(ValueError):
+        AsyncScheduler(["1"], print, interval_seconds=0)
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_int("0")
+    assert positive_int("15") == 15
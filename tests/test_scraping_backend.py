@@ -0,0 +1,70 @@
+# tests/test_scraping_backend.py
+
+from datetime import datetime
+
+import pytest
+
+import scraping_backend as sb
+from adaptive import ActivityTracker
+from watermark import HighWaterMarks
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def put_rows(self, rows):
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    tracker = ActivityTracker(min_interval=60, max_interval=4 * 3600, default_interval=900)
+    marks = HighWaterMarks(str(tmp_path / "marcas.json"))
+    # Un DNI con marca de agua vigente: cada consulta es incremental
+    marks.begin("1", sb.build_rows("PERITO", [("d", "10/01/2025", "CIV 1/2024", "X", "/l")]), ["x"], full=True)
+    marks.settle(["x"])
+    monkeypatch.setattr(sb, "_activity_tracker", tracker)
+    monkeypatch.setattr(sb, "_watermarks", marks)
+    monkeypatch.setattr(sb, "_change_index", None)
+    monkeypatch.setattr(sb, "_breakers", None)
+    monkeypatch.setattr(sb, "_lease_manager", None)
+    return tracker, marks
+
+
+def test_empty_delta_scan_counts_as_poll_without_activity(backend, monkeypatch):
+    tracker, marks = backend
+    cutoffs = []
+
+    def engine(dni, cutoff=None):
+        cutoffs.append(cutoff)
+        return "sin novedades nuevas", [], None
+
+    monkeypatch.setitem(sb.SCRAPING_ENGINES, "http", engine)
+    for _ in range(3):
+        sb._scrape_and_save("1", "http", ListWriter())
+
+    assert all(cutoff is not None and not cutoff.full for cutoff in cutoffs)
+    state = tracker.snapshot()["1"]
+    assert state["polls"] == 3
+    assert state["new_rows"] == 0
+    # Sin novedades la tasa baja y el intervalo se alarga respecto del inicial
+    assert state["rate"] < 1 / (900 / 3600)
+    assert tracker.next_interval("1") > 900
+
+
+def test_failed_scrape_is_not_observed(backend, monkeypatch):
+    tracker, _ = backend
+    monkeypatch.setitem(sb.SCRAPING_ENGINES, "http", lambda dni, cutoff=None: ("timeout", [], sb.FAILURE_PORTAL))
+    sb._scrape_and_save("1", "http", ListWriter())
+    assert "1" not in tracker.snapshot()
+
+
+def test_new_rows_are_observed_and_written(backend, monkeypatch):
+    tracker, _ = backend
+    rows = sb.build_rows("PERITO", [("d", "11/01/2025", "CIV 2/2024", "X", "/l")], scraped_at=datetime(2025, 1, 11))
+    monkeypatch.setitem(sb.SCRAPING_ENGINES, "http", lambda dni, cutoff=None: ("ok", rows, None))
+    writer = ListWriter()
+    sb._scrape_and_save("1", "http", writer)
+    assert writer.rows == rows
+    assert tracker.snapshot()["1"]["polls"] == 1
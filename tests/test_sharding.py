@@ -0,0 +1,95 @@
+# tests/test_sharding.py
+
+import threading
+from datetime import timedelta
+
+import pytest
+
+import sharding
+from fake_firestore import InMemoryFirestore
+from sharding import LeaseManager
+
+DNIS = [str(20000000 + i) for i in range(10)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj UTC de los leases, que el test adelanta a mano."""
+    now = [sharding._utcnow()]
+    monkeypatch.setattr(sharding, "_utcnow", lambda: now[0])
+    return now
+
+
+def owners(db):
+    return {doc_id: data["owner"] for doc_id, data in db.data.get("scraper_leases", {}).items() if data["owner"]}
+
+
+def assert_disjoint(db, *managers):
+    held = [set(manager.owned()) for manager in managers]
+    for i, mine in enumerate(held):
+        for other in held[i + 1:]:
+            assert not mine & other
+        # Lo que un nodo cree propio figura a su nombre en el store
+        assert all(owners(db).get(dni) == managers[i].node_id for dni in mine)
+
+
+def test_two_nodes_split_the_dnis_and_hand_over_on_close(clock):
+    db = InMemoryFirestore()
+    a = LeaseManager(db, DNIS, node_id="a")
+    b = LeaseManager(db, DNIS, node_id="b")
+
+    assert len(a.rebalance()) == 10  # Todavía solo
+    b._heartbeat(clock[0])
+    steps = [b.rebalance, a.rebalance, b.rebalance, a.rebalance, b.rebalance]
+    for step in steps:
+        step()
+        assert_disjoint(db, a, b)
+    assert len(a.owned()) == len(b.owned()) == 5
+    assert a.released == 5
+
+    a.close()
+    assert a.owned() == []
+    assert set(owners(db).values()) == {"b"}
+    b.rebalance()
+    assert b.owned() == DNIS
+    assert_disjoint(db, a, b)
+
+
+def test_leases_of_a_stopped_node_are_taken_after_they_expire(clock):
+    db = InMemoryFirestore()
+    a = LeaseManager(db, DNIS, node_id="a", ttl=60)
+    b = LeaseManager(db, DNIS, node_id="b", ttl=60)
+    b._heartbeat(clock[0])
+    a.rebalance()
+    b.rebalance()
+    assert len(a.owned()) == len(b.owned()) == 5
+
+    a.close(release=False)  # Como si el nodo se cayera
+    b.rebalance()
+    assert len(b.owned()) == 5  # Los leases de "a" siguen vigentes en el store
+    clock[0] += timedelta(seconds=61)
+    b.rebalance()
+    assert b.owned() == DNIS
+    assert set(owners(db).values()) == {"b"}
+
+
+def test_concurrent_rebalances_never_share_a_dni():
+    db = InMemoryFirestore()
+    managers = [LeaseManager(db, DNIS, node_id=f"n{i}") for i in range(3)]
+    for manager in managers:
+        manager._heartbeat(sharding._utcnow())
+
+    for _ in range(10):
+        barrier = threading.Barrier(len(managers))
+
+        def turn(manager):
+            barrier.wait()
+            manager.rebalance()
+
+        threads = [threading.Thread(target=turn, args=(manager,)) for manager in managers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert_disjoint(db, *managers)
+    assert sum(len(manager.owned()) for manager in managers) == len(DNIS)
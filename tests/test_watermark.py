@@ -0,0 +1,68 @@
+# tests/test_watermark.py
+
+import json
+import threading
+from datetime import datetime
+
+from fake_firestore import InMemoryFirestore
+from normalize import build_rows
+from watermark import HighWaterMarks
+
+DNI = "20111111111"
+
+
+def rows(*causas, fecha="03/03/2025"):
+    return build_rows("PERITO TEST", [("d", fecha, causa, "", "") for causa in causas])
+
+
+class SlowFirestore(InMemoryFirestore):
+    """Firestore cuyas escrituras quedan colgadas hasta que el test las libera."""
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def _apply(self, ops):
+        self.writing.set()
+        assert self.release.wait(5)
+        super()._apply(ops)
+
+
+def test_marks_are_persisted_outside_the_lock(tmp_path):
+    db = SlowFirestore()
+    marks = HighWaterMarks(path=str(tmp_path / "marcas.json"), db=db, collection="marcas")
+    batch = rows("CIV 1/2024")
+
+    def scrape():
+        marks.begin(DNI, batch, [batch[0].doc_id], True)
+        marks.settle([batch[0].doc_id])
+
+    writer = threading.Thread(target=scrape)
+    writer.start()
+    assert db.writing.wait(5)
+    try:
+        # Mientras Firestore no responde, los demás DNIs siguen consultando y registrando marcas
+        snapshot = marks.snapshot()
+        other = rows("CIV 2/2024")
+        marks.begin("20222222222", other, [other[0].doc_id], True)
+        marks.cutoff("20222222222")
+    finally:
+        db.release.set()
+        writer.join()
+    assert snapshot[DNI]["causa"] == "CIV 1/2024"
+    assert db.data["marcas"][DNI]["causa"] == "CIV 1/2024"
+    with open(tmp_path / "marcas.json", encoding="utf-8") as f:
+        assert json.load(f)[DNI]["causa"] == "CIV 1/2024"
+
+
+def test_the_latest_state_wins_on_disk(tmp_path):
+    path = tmp_path / "marcas.json"
+    marks = HighWaterMarks(path=str(path))
+    for day, causa in ((3, "CIV 1/2024"), (4, "CIV 2/2024")):
+        batch = rows(causa, fecha=f"0{day}/03/2025")
+        marks.begin(DNI, batch, [batch[0].doc_id], True)
+        marks.settle([batch[0].doc_id])
+    reloaded = HighWaterMarks(path=str(path))
+    assert reloaded.cutoff(DNI).fecha == datetime(2025, 3, 4)
+    assert reloaded.cutoff(DNI).causa == "CIV 2/2024"
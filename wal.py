@@ -0,0 +1,213 @@
+# wal.py
+#
+# Buffer local durable (write-ahead log en SQLite) entre el scraping y
+# Firestore: cada fila scrapeada se guarda primero acá, indexada por su
+# doc_id, y un hilo la reenvía a Firestore en lotes. Si Firestore no está
+# disponible las filas esperan en disco (también entre reinicios) y nunca
+# hace falta volver a abrir el navegador para recuperarlas. Las filas
+# confirmadas se borran y el archivo se compacta cuando queda vacío.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_DATETIME_TAG = "$dt"
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, Mapping):  # Filas normalize.Novedad
+        return dict(value)
+    raise TypeError(f"Valor no serializable: {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1 and _DATETIME_TAG in obj:
+        return datetime.fromisoformat(obj[_DATETIME_TAG])
+    return obj
+
+
+def dumps_row(row):
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=_encode)
+
+
+def loads_row(payload):
+    return json.loads(payload, object_hook=_decode)
+
+
+class WriteAheadLog:
+    """Filas pendientes de Firestore, una por ``doc_id`` (la más reciente gana)."""
+
+    def __init__(self, path, key_fn):
+        self.path = path
+        self._key_fn = key_fn
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum solo se aplica si se define antes de crear las tablas
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # Con WAL sigue siendo durable ante caídas del proceso
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT NOT NULL UNIQUE, "
+            "row TEXT NOT NULL, queued_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.appended = 0
+        self.acked = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def append(self, rows):
+        """Guarda las filas en disco; devuelve cuántas se guardaron."""
+        items = []
+        for row in rows:
+            try:
+                items.append((self._key_fn(row), dumps_row(row), time.time()))
+            except Exception as e:
+                logger.error("Fila descartada del buffer local: %s. Error: %s", row, e)
+        if not items:
+            return 0
+        with self._lock:
+            # REPLACE borra la versión pendiente anterior y le da un seq nuevo
+            self._conn.executemany("INSERT OR REPLACE INTO pending (doc_id, row, queued_at) VALUES (?, ?, ?)", items)
+            self._conn.commit()
+            self.appended += len(items)
+        return len(items)
+
+    def contains(self, doc_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM pending WHERE doc_id = ?", (doc_id,)).fetchone() is not None
+
+    def peek(self, limit):
+        """Las ``limit`` filas más antiguas como ``[(seq, doc_id, fila)]``."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT seq, doc_id, row FROM pending ORDER BY seq LIMIT ?", (limit,))
+            return [(seq, doc_id, loads_row(row)) for seq, doc_id, row in cursor]
+
+    def ack(self, seqs):
+        """Borra las filas confirmadas (por seq: una versión más nueva del mismo doc_id queda)."""
+        seqs = list(seqs)
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending WHERE seq = ?", [(seq,) for seq in seqs])
+            self._conn.commit()
+            self.acked += len(seqs)
+
+    def oldest_age(self):
+        """Segundos que lleva esperando la fila más antigua (0 si no hay)."""
+        with self._lock:
+            queued_at = self._conn.execute("SELECT MIN(queued_at) FROM pending").fetchone()[0]
+        return time.time() - queued_at if queued_at else 0.0
+
+    def compact(self):
+        """Devuelve al sistema el espacio de las filas borradas y trunca el -wal de SQLite."""
+        with self._lock:
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WalFlusher:
+    """Hilo que reenvía el buffer a Firestore en lotes, con backoff si falla.
+
+    ``save_fn(filas)`` guarda las filas y devuelve los doc_ids que ya no hay
+    que reintentar (guardados, sin cambios o descartados por inválidos).
+    """
+
+    def __init__(self, wal, save_fn, batch_size=500, idle_wait=1.0, max_backoff=300.0, on_flush=None):
+        self.wal = wal
+        self._save_fn = save_fn
+        self.batch_size = batch_size
+        self.idle_wait = idle_wait
+        self.max_backoff = max_backoff
+        self._on_flush = on_flush
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._backoff = 0.0
+        self._compacted_at = 0
+        self.flushed = 0
+        self.failures = 0
+        self._thread = threading.Thread(target=self._run, name="wal-flusher", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Avisa que hay filas nuevas (no espera a ``idle_wait``)."""
+        self._wakeup.set()
+
+    def _flush_once(self):
+        """Envía un lote; devuelve True si quedó algo por enviar."""
+        batch = self.wal.peek(self.batch_size)
+        if not batch:
+            return False
+        try:
+            done = self._save_fn([row for _, _, row in batch])
+        except Exception as e:
+            logger.error("No se pudo vaciar el buffer local en Firestore: %s", e)
+            done = set()
+        acked = [seq for seq, doc_id, _ in batch if doc_id in done]
+        self.wal.ack(acked)
+        self.flushed += len(acked)
+        if len(acked) < len(batch):
+            self.failures += 1
+            self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+            logger.warning(
+                "%d filas siguen en el buffer local; se reintenta en %.0fs.", len(batch) - len(acked), self._backoff
+            )
+        else:
+            self._backoff = 0.0
+        if self._on_flush is not None:
+            self._on_flush(len(self.wal), self.wal.oldest_age())
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._idle.clear()
+            try:
+                pending = self._flush_once()
+            except Exception as e:
+                logger.error("Error en el hilo del buffer local: %s", e)
+                pending = False
+                self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+            if self._backoff:
+                self._stop.wait(self._backoff)
+                continue
+            if pending:
+                continue
+            # Buffer vacío: compactar (si se borró algo) y esperar filas nuevas
+            if self.wal.acked != self._compacted_at:
+                self.wal.compact()
+                self._compacted_at = self.wal.acked
+            self._idle.set()
+            self._wakeup.wait(self.idle_wait)
+            self._wakeup.clear()
+
+    def drain(self, timeout=None):
+        """Espera a que el buffer quede vacío; devuelve las filas que siguen pendientes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self.wal):
+            self.notify()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._idle.wait(min(0.5, remaining) if remaining is not None else 0.5)
+        return len(self.wal)
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
@@ -0,0 +1,327 @@
+# watermark.py
+#
+# Scraping incremental por DNI. La "marca de agua" de cada cuenta es la
+# novedad más nueva ya guardada (Fecha, Causa, Tipo), junto con las claves
+# (Causa, Tipo) de todas las novedades de ese mismo día. El portal lista las
+# novedades de la más nueva a la más vieja, así que al recorrer la tabla de
+# arriba hacia abajo:
+#
+# - las filas con fecha posterior a la de la marca son nuevas;
+# - las del mismo día se comparan con las claves conocidas;
+# - la primera fila anterior a la fecha de la marca corta la lectura.
+#
+# Solo se corta si la última lectura completa del DNI vino ordenada por
+# fecha; si no, se sigue leyendo la tabla entera. La marca avanza recién
+# cuando todas las filas nuevas de la consulta quedaron guardadas (en
+# Firestore o en el buffer local): si alguna falla, la próxima consulta
+# vuelve a leer desde la marca anterior. Cada ``full_every`` segundos se lee
+# la tabla completa para reconciliar cambios en novedades viejas.
+#
+# El estado se guarda en JSON o, si se indica una colección, en Firestore
+# (un documento por DNI) para compartirlo entre nodos.
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from normalize import map_tipo, parse_fecha, sanitize_text
+
+logger = logging.getLogger(__name__)
+
+# Veredictos de DeltaScan.check()
+NEW = "new"  # Fila nueva: se procesa
+KNOWN = "known"  # Ya guardada (mismo día que la marca): se omite
+STOP = "stop"  # Anterior a la marca: esta fila y las siguientes ya se conocen
+
+
+def row_key(tipo_raw, fecha_str, causa_raw):
+    """``(Fecha, Causa, Tipo)`` de una fila cruda, con los mismos valores que arma build_rows."""
+    return parse_fecha(fecha_str), sanitize_text(causa_raw), map_tipo(tipo_raw)
+
+
+def is_descending(fechas):
+    """True si las fechas (sin las inválidas) no aumentan nunca, como lista el portal."""
+    fechas = [fecha for fecha in fechas if isinstance(fecha, datetime)]
+    return all(newer >= older for newer, older in zip(fechas, fechas[1:]))
+
+
+class Cutoff:
+    """Marca de un DNI tal como la usa una consulta (viaja a los workers aislados).
+
+    Con ``full`` la consulta lee la tabla completa igual (reconciliación
+    periódica o tabla sin orden) y la marca solo se informa en el resumen.
+    """
+
+    def __init__(self, fecha, causa, tipo, known=(), full=False):
+        self.fecha = fecha
+        self.causa = causa
+        self.tipo = tipo
+        self.known = frozenset(known)
+        self.full = full
+
+    def describe(self):
+        return f"{self.fecha:%d/%m/%Y} · {self.causa} · {self.tipo}"
+
+
+class DeltaScan:
+    """Recorre las filas crudas de una consulta en el orden del portal y decide cuáles procesar."""
+
+    def __init__(self, cutoff=None):
+        self.cutoff = cutoff
+        self.read = 0  # Filas examinadas (incluida la que cortó)
+        self.new = 0
+        self.known = 0
+        self.stopped = False
+        self.unordered = False
+        self._previous = None
+
+    def check(self, raw_row):
+        """NEW, KNOWN o STOP para la tupla ``(tipo, fecha, causa, nombre, link)``."""
+        self.read += 1
+        cutoff = self.cutoff
+        if cutoff is None or cutoff.full:
+            self.new += 1
+            return NEW
+        fecha, causa, tipo = row_key(raw_row[0], raw_row[1], raw_row[2])
+        if fecha is None:  # Sin fecha no se puede ubicar respecto de la marca
+            self.new += 1
+            return NEW
+        if self._previous is not None and fecha > self._previous and not self.unordered:
+            logger.warning("La tabla de novedades no viene ordenada por fecha: se lee completa.")
+            self.unordered = True
+        self._previous = fecha
+        if fecha > cutoff.fecha or (fecha < cutoff.fecha and self.unordered):
+            self.new += 1
+            return NEW
+        if fecha == cutoff.fecha:
+            if (causa, tipo) in cutoff.known:
+                self.known += 1
+                return KNOWN
+            self.new += 1
+            return NEW
+        self.stopped = True
+        return STOP
+
+    def describe(self, total=None):
+        """Texto para el resumen del scraping: la marca usada y cuánto se leyó."""
+        cutoff = self.cutoff
+        if cutoff is None:
+            return "Lectura completa (el DNI todavía no tiene marca de agua)."
+        if cutoff.full:
+            return f"Lectura completa (reconciliación); marca de agua previa: {cutoff.describe()}."
+        read = f"{self.read} de {total}" if total is not None else str(self.read)
+        text = (
+            f"Marca de agua {cutoff.describe()}: {read} filas leídas, {self.new} nuevas, "
+            f"{self.known} ya conocidas"
+        )
+        if self.stopped:
+            text += "; lectura cortada en la marca"
+        if self.unordered:
+            text += "; tabla sin orden por fecha, sin corte"
+        return text + "."
+
+
+class _Pending:
+    """Marca candidata de una consulta, a la espera de que se guarden sus filas."""
+
+    __slots__ = ("dni", "state", "outstanding", "failed")
+
+    def __init__(self, dni, state, doc_ids):
+        self.dni = dni
+        self.state = state
+        self.outstanding = set(doc_ids)
+        self.failed = 0
+
+
+class HighWaterMarks:
+    """Marcas de agua por DNI, persistidas en ``path`` (JSON) o en la colección ``collection`` de ``db``."""
+
+    def __init__(self, path=None, db=None, collection=None, full_every=24 * 3600):
+        if collection and db is None:
+            raise ValueError("Guardar las marcas en Firestore requiere un cliente (db)")
+        self.path = path
+        self.db = db
+        self.collection = collection
+        self.full_every = full_every
+        self._lock = threading.Lock()
+        # Serializa las escrituras del JSON y de Firestore, que se hacen fuera de _lock
+        self._save_lock = threading.Lock()
+        # dni -> {"fecha", "causa", "tipo", "dia", "ordered", "full_at", "updated_at"}
+        self._state = {}
+        self._loaded = set()  # DNIs ya leídos de Firestore
+        self._pending = {}  # dni -> _Pending
+        self._owners = {}  # doc_id -> _Pending
+        self.delta_reads = 0
+        self.full_reads = 0
+        self.advanced = 0
+        self.held_back = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("No se pudo leer el estado de las marcas de agua %s: %s", path, e)
+
+    def _now(self):
+        return datetime.now()
+
+    def _persist(self, dnis):
+        """Guarda las marcas de ``dnis`` sin tener tomado ``_lock`` (se escribe la última versión)."""
+        if not dnis or not (self.path or self.collection):
+            return
+        with self._save_lock:
+            with self._lock:
+                state = {dni: dict(value) for dni, value in self._state.items()} if self.path else None
+                documents = {dni: dict(self._state[dni]) for dni in dnis} if self.collection else {}
+            if state is not None:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(state, f, indent=1, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            for dni, document in documents.items():
+                try:
+                    self.db.collection(self.collection).document(dni).set(document)
+                except Exception as e:
+                    logger.warning("No se pudo guardar la marca de agua del DNI %s en Firestore: %s", dni, e)
+
+    def _get(self, dni):
+        """Estado del DNI; con Firestore se lee una vez por proceso (si falla, se usa el local)."""
+        if self.collection and dni not in self._loaded:
+            try:
+                snapshot = self.db.collection(self.collection).document(dni).get()
+            except Exception as e:
+                logger.warning("No se pudo leer la marca de agua del DNI %s desde Firestore: %s", dni, e)
+            else:
+                with self._lock:
+                    if snapshot.exists:
+                        self._state[dni] = snapshot.to_dict()
+                    self._loaded.add(dni)
+        with self._lock:
+            state = self._state.get(dni)
+            return dict(state) if state else None
+
+    def cutoff(self, dni):
+        """Marca para la próxima consulta del DNI; None si todavía no tiene (lectura completa)."""
+        state = self._get(dni)
+        if not state or not state.get("fecha"):
+            with self._lock:
+                self.full_reads += 1
+            return None
+        full_at = datetime.fromisoformat(state["full_at"]) if state.get("full_at") else None
+        full = (
+            not state.get("ordered")
+            or full_at is None
+            or (self.full_every and self._now() - full_at >= timedelta(seconds=self.full_every))
+        )
+        with self._lock:
+            if full:
+                self.full_reads += 1
+            else:
+                self.delta_reads += 1
+        return Cutoff(
+            datetime.fromisoformat(state["fecha"]),
+            state["causa"],
+            state["tipo"],
+            ((key["causa"], key["tipo"]) for key in state.get("dia", ())),
+            full=bool(full),
+        )
+
+    def _advance(self, previous, rows, full):
+        """Estado nuevo del DNI a partir de las filas (en el orden del portal) de una consulta."""
+        state = dict(previous or {})
+        now = self._now().isoformat(timespec="seconds")
+        descending = is_descending(row.get("Fecha") for row in rows)
+        if full:
+            state["ordered"] = descending
+            state["full_at"] = now
+        elif not descending:
+            state["ordered"] = False
+        dated = [row for row in rows if isinstance(row.get("Fecha"), datetime)]
+        if dated:
+            newest = max(row["Fecha"] for row in dated)
+            day = [{"causa": row["Causa"], "tipo": row["Tipo"]} for row in dated if row["Fecha"] == newest]
+            fecha = newest.date().isoformat()
+            current = state.get("fecha")
+            if current is None or fecha >= current:
+                if fecha == current:
+                    known = state.get("dia", [])
+                    day = known + [key for key in day if key not in known]
+                # La primera fila del día en la tabla es la más nueva
+                top = next(row for row in dated if row["Fecha"] == newest)
+                state.update(fecha=fecha, causa=top["Causa"], tipo=top["Tipo"], dia=day)
+        state["updated_at"] = now
+        return state
+
+    def begin(self, dni, rows, doc_ids, full):
+        """Registra el resultado de una consulta; la marca avanza cuando se guardan ``doc_ids``."""
+        with self._lock:
+            pending = _Pending(dni, self._advance(self._state.get(dni), rows, full), doc_ids)
+            self._pending[dni] = pending
+            for doc_id in pending.outstanding:
+                self._owners[doc_id] = pending
+            if pending.outstanding:
+                return
+            del self._pending[dni]
+            self._commit_locked(pending)
+        self._persist([dni])
+
+    def settle(self, doc_ids, finished=None):
+        """Filas que ya pasaron por la etapa escritora; ``finished`` son las que quedaron a salvo (None = todas)."""
+        committed = []
+        with self._lock:
+            for doc_id in doc_ids:
+                pending = self._owners.pop(doc_id, None)
+                if pending is None or doc_id not in pending.outstanding:
+                    continue
+                pending.outstanding.discard(doc_id)
+                if finished is not None and doc_id not in finished:
+                    pending.failed += 1
+                if pending.outstanding or self._pending.get(pending.dni) is not pending:
+                    continue
+                del self._pending[pending.dni]
+                if pending.failed:
+                    self.held_back += 1
+                    logger.warning(
+                        "DNI %s: %d novedades no se pudieron guardar; la marca de agua no avanza.",
+                        pending.dni,
+                        pending.failed,
+                    )
+                else:
+                    self._commit_locked(pending)
+                    committed.append(pending.dni)
+        self._persist(committed)
+
+    def _commit_locked(self, pending):
+        dni, state = pending.dni, pending.state
+        previous = self._state.get(dni) or {}
+        self._state[dni] = state
+        if (previous.get("fecha"), previous.get("causa"), previous.get("tipo")) != (
+            state.get("fecha"),
+            state.get("causa"),
+            state.get("tipo"),
+        ):
+            self.advanced += 1
+            logger.info("DNI %s: marca de agua en %s.", dni, self.describe_state(state))
+
+    @staticmethod
+    def describe_state(state):
+        if not state or not state.get("fecha"):
+            return "sin marca"
+        return f"{datetime.fromisoformat(state['fecha']):%d/%m/%Y} · {state['causa']} · {state['tipo']}"
+
+    def snapshot(self):
+        with self._lock:
+            return {dni: dict(state) for dni, state in self._state.items()}
+
+    def log_stats(self):
+        logger.info(
+            "Marcas de agua: %d consultas incrementales, %d completas, %d marcas avanzadas, "
+            "%d retenidas por filas sin guardar.",
+            self.delta_reads,
+            self.full_reads,
+            self.advanced,
+            self.held_back,
+        )
+